@@ -2,60 +2,59 @@ import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog
 import asyncio
 import threading
-from bleak import BleakClient, BleakScanner
 
-import struct
-import math
 import os
 from datetime import datetime
 import time  # For latency measurements
 
-# Standard ST P2P UUIDs
-LED_WRITE_UUID   = "0000fe41-8e22-4541-9d4c-21edae82ed19"   # Write to control LED
-NOTIFY_UUID      = "0000fe42-8e22-4541-9d4c-21edae82ed19"   # Notifications from device
-
-# --- OTA-specific UUIDs and flash layout ---
-REBOOT_CHAR_UUID      = "0000fe11-8e22-4541-9d4c-21edae82ed19"   # reboot to BLE_Ota
-OTA_SERVICE_UUID      = "0000fe20-cc7a-482a-984a-7f2ed5b3e58f"
-OTA_BASE_ADDR_UUID    = "0000fe22-8e22-4541-9d4c-21edae82ed19"
-OTA_REBOOT_CONF_UUID  = "0000fe23-8e22-4541-9d4c-21edae82ed19"
-OTA_DATA_UUID         = "0000fe24-8e22-4541-9d4c-21edae82ed19"
-
-FLASH_BASE_ADDR       = 0x08000000
-APP_BASE_ADDR         = 0x08007000     # your p2p app base
-FLASH_PAGE_SIZE       = 2048          # 2KB
-OTA_CHUNK_SIZE        = 100           # bytes per BLE write
-
-ACTION_START_USER_APP = 0x02
-ACTION_FILE_FINISHED  = 0x07
-
-
-SENSOR_CMD_PREFIX       = 0x10
-
-SENSOR_LSM6DSO          = 0x01
-SENSOR_STTSH22H         = 0x02
-SENSOR_STRAIN_GAUGE     = 0x03
-SENSOR_ALL              = 0x04
-
-SENSOR_START            = 0x01
-SENSOR_STOP             = 0x00
-
-NOTIF_SENSOR_DATA       = 0x20
-NOTIF_SENSOR_STATUS     = 0x21
-VERSION_REQUEST_PREFIX  = 0x30
-NOTIF_VERSION_RESPONSE  = 0x30
-RSSI_REQUEST_PREFIX     = 0x40  
-NOTIF_RSSI_RESPONSE     = 0x40  
-
-# Sensor Command Protocol
-# Format: [Device_Selection, Sensor_ID, Action]
-# Device_Selection: 0x10 = Sensor commands
-# Sensor_ID:
-# 0x01 = LSM6DSO
-# 0x02 = STT22H
-# 0x03 = STRAIN
-# 0x04 = ALL
-# Action: 0x01 = Start, 0x00 = Stop
+import numpy as np
+
+from bolt_protocol import (
+    LED_WRITE_UUID, NOTIFY_UUID,
+    SENSOR_LSM6DSO, SENSOR_STTSH22H, SENSOR_STRAIN_GAUGE, SENSOR_ALL, SENSOR_START, SENSOR_STOP,
+    NOTIF_SENSOR_DATA, NOTIF_SENSOR_STATUS, VERSION_REQUEST_PREFIX, NOTIF_VERSION_RESPONSE,
+    RSSI_REQUEST_PREFIX, NOTIF_RSSI_RESPONSE, NOTIF_LINK_PARAM_RESPONSE, NOTIF_PHY_RESPONSE,
+    PHY_2M, SENSOR_NAMES,
+    decode_sensor_data, decode_rssi, sensor_command, format_payload, find_bolt,
+    request_ota_reboot, transfer_ota_image, SCAN_TIMEOUT,
+)
+from bolt_gatt_cache import GattCache, connect as connect_cached
+from bolt_link import LinkManager, link_summary
+from bolt_state import StateStore, WidgetBinder
+from bolt_spectrum import VibrationSpectrum, LSM6DSO_SAMPLE_RATE_HZ
+from bolt_store import TimeSeriesStore, DEFAULT_STORE_DIR
+from bolt_bus import SampleBus, POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_EVERY_NTH
+from bolt_shm import SharedMemoryPublisher
+from bolt_server import StreamServer
+from bolt_profile import PROFILER, sample_stacks, write_folded, DEFAULT_PROFILE_DIR
+from bolt_capture import CaptureManager, Trigger, DEFAULT_CAPTURE_DIR, DEFAULT_TRIGGER_FILE, load_capture_config
+from bolt_soak import SoakMonitor, SimulatedStream, call_and_time, profiler_probe
+from bolt_watchdog import LoopWatchdog, run_blocking, set_offload, OFFLOAD_BLOCKING
+from bolt_calibration import CalibrationStore, UnitConverter, CalibrationRoutine, STEPS as CALIBRATION_STEPS
+
+# Vibration band alert thresholds per band index, g^2 for accel and dps^2 for gyro.
+# A scalar applies to all six axes, a 6-tuple sets accel x/y/z + gyro x/y/z separately.
+VIBRATION_BAND_LIMITS = {
+    1: (6.0e-4, 6.0e-4, 6.0e-4, 19.0, 19.0, 19.0),
+    2: (3.0e-4, 3.0e-4, 3.0e-4, 11.5, 11.5, 11.5),
+}
+SPECTROGRAM_REFRESH_MS  = 500
+SPECTROGRAM_PIXELS      = 4
+SAMPLE_LOG_EVERY        = 10     # log every Nth sample per sensor
+FLAME_GRAPH_SECONDS     = 10
+LOG_MAX_LINES           = 5000   # oldest lines of the log window are dropped beyond this
+
+# Trigger capture defaults, written to ~/ScrewSystem/capture_triggers.json on first
+# use; edit that file and turn capture mode on again to apply (raw counts)
+CAPTURE_PRE_MS  = 2000
+CAPTURE_POST_MS = 3000
+CAPTURE_TRIGGERS = [
+    Trigger("strain", SENSOR_STRAIN_GAUGE, 0, 3000, "above"),  # 12-bit ADC, 0-4095
+    Trigger("accel-spike", SENSOR_LSM6DSO, "magnitude", 8000, "delta"),
+]
+RECORDER_QUEUE_SIZE     = 65536  # ~36 min of all sensors at 10 Hz before the BLE thread waits on disk
+RECORDER_FLUSH_MS       = 5000   # also writes an open chunk older than bolt_chunks.DEFAULT_MAX_CHUNK_AGE
+
 
 class SimpleBOLTController:
     def clear_logs(self):
@@ -71,24 +70,94 @@ class SimpleBOLTController:
 
 
         self.client = None
-        self.is_connected = False
         self.disconnect_in_progress = False
-
-        self.lsm6dso_active = False
-        self.sttsh22h_active = False
-        self.all_sensors_active = False
-        self.strain_gauge_active = False
-        self.strain_gauge_count = 0
-        self.lsm6dso_count = 0
-        self.sttsh22h_count = 0
+        # Held while a finished session is written out; connects wait for it
+        self._session_lock = asyncio.Lock()
+
+        # Everything the widgets show; written from the BLE thread, rendered on the Tk thread
+        self.ui_state = StateStore(
+            connected=False,
+            connect_phase=None,
+            status="Status: Disconnected",
+            status_color="red",
+            lsm6dso_active=False,
+            sttsh22h_active=False,
+            strain_gauge_active=False,
+            all_sensors_active=False,
+            version=None,
+            rssi=None,
+            latency_ms=None,
+            mtu=None,
+            link_text=None,
+            link_color="gray",
+            ota_bin_path=None,
+            ota_busy=False,
+            capture_mode=False,
+            captures=0,
+            last_capture=None,
+            soak_text=None,
+            loop_text=None,
+            loop_color="gray",
+            calibration_text=None,
+        )
 
         self.last_ping_start = None  # For latency measurement
-        
-        # Sensor states
-        self.lsm6dso_active = False
-        self.sttsh22h_active = False
-        self.all_sensors_active = False
-        self.ota_bin_path = None
+        self.rssi_requested = False
+
+        # Periodic RSSI polling and connection-parameter/PHY tuning
+        self.link = LinkManager(self.log_device, self._active_sensor_ids, on_stats=self._on_link_stats)
+
+        self.vibration = VibrationSpectrum(
+            sample_rate=LSM6DSO_SAMPLE_RATE_HZ,
+            band_limits=VIBRATION_BAND_LIMITS,
+        )
+        self._spectrogram_image = None
+        self._spectrogram_palette = self._build_palette()
+
+        # Raw + rollup recording of every decoded sample, one session per connection
+        self.store = TimeSeriesStore(DEFAULT_STORE_DIR)
+        self.recorder = None
+        self._link_history = []
+
+        # Resolved services / version / MTU per device for fast reconnects
+        self.gatt_cache = GattCache()
+
+        # Decoded samples fan out to consumers with their own queues and threads;
+        # only the recorder blocks the BLE handler instead of dropping, everything
+        # else sheds load (drops show in the bus stats logged on disconnect)
+        self.bus = SampleBus(on_error=lambda name, e: self.log_device(f"✗ {name} consumer error: {e}"))
+        self.bus.subscribe("recorder", self._record_samples, policy=POLICY_BLOCK, maxsize=RECORDER_QUEUE_SIZE)
+
+        # Engineering units: one vectorised conversion per batch feeds a second bus for
+        # the analysis and display consumers. Recorder, captures, shm and export keep
+        # raw counts in their integer formats; sessions store the profile to convert them.
+        self.calibrations = CalibrationStore()
+        self.units_bus = SampleBus(on_error=lambda name, e: self.log_device(f"✗ {name} consumer error: {e}"))
+        self.units = UnitConverter(self.calibrations, forward=self.units_bus.forward)
+        self.bus.subscribe("units", self.units.push, policy=POLICY_DROP_OLDEST, maxsize=RECORDER_QUEUE_SIZE)
+        self.units_bus.subscribe("vibration", self._analyse_samples, policy=POLICY_DROP_OLDEST,
+                                 sensors=(SENSOR_LSM6DSO,))
+        self.units_bus.subscribe("gui", self._log_samples, policy=POLICY_EVERY_NTH, every=SAMPLE_LOG_EVERY,
+                                 maxsize=64)
+        self.calibration = None  # CalibrationRoutine while the guided calibration runs
+        self.calibration_address = None
+        self.calibration_window = None
+
+        # Pre/post-trigger windows instead of continuous recording when capture mode is on
+        self.capture = CaptureManager(
+            TimeSeriesStore(DEFAULT_CAPTURE_DIR), CAPTURE_TRIGGERS,
+            pre_ms=CAPTURE_PRE_MS, post_ms=CAPTURE_POST_MS,
+            log=self.log_device, on_capture=self._on_capture,
+        )
+        self.bus.subscribe("capture", self.capture.push, policy=POLICY_DROP_OLDEST, maxsize=RECORDER_QUEUE_SIZE)
+
+        # Live samples for other local processes (bolt_shm.SampleReader)
+        try:
+            self.shm = SharedMemoryPublisher()
+            self.bus.subscribe("shm", self.shm.write_batch, policy=POLICY_DROP_OLDEST)
+        except OSError as e:
+            self.shm = None
+            self.log_device(f"⚠ Shared-memory publisher unavailable: {e}")
 
         # === UI Elements ===
         # Status label
@@ -135,6 +204,14 @@ class SimpleBOLTController:
         )
         self.mtu_label.grid(row=0, column=2, padx=15)
 
+        self.link_label = ttk.Label(
+            info_frame,
+            text="Link: N/A",
+            font=("Arial", 11, "bold"),
+            foreground="gray"
+        )
+        self.link_label.grid(row=0, column=3, padx=15)
+
         # Connection button
         control_frame = ttk.Frame(root)
         control_frame.pack(pady=(8, 12))   # some breathing room above/below
@@ -302,6 +379,101 @@ class SimpleBOLTController:
         self.all_sensors_status = ttk.Label(all_frame, text="●", foreground="red", font=("Arial", 16))
         self.all_sensors_status.pack(side="left", padx=5)
 
+        capture_frame = ttk.LabelFrame(sensor_frame, text="Trigger Capture", padding=10)
+        capture_frame.pack(fill="x", pady=(10, 0))
+
+        self.capture_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            capture_frame, text="Capture mode (replaces continuous recording)",
+            variable=self.capture_var, command=self.toggle_capture_mode
+        ).pack(side="left", padx=5)
+        self.manual_trigger_button = ttk.Button(
+            capture_frame, text="Manual Trigger", command=self.manual_trigger, state="disabled"
+        )
+        self.manual_trigger_button.pack(side="left", padx=10)
+        self.capture_label = ttk.Label(capture_frame, text="Captures: 0", foreground="gray")
+        self.capture_label.pack(side="left", padx=10)
+
+        calibration_frame = ttk.LabelFrame(sensor_frame, text="Calibration", padding=10)
+        calibration_frame.pack(fill="x", pady=(10, 0))
+
+        self.calibrate_button = ttk.Button(
+            calibration_frame, text="Calibrate...", command=self.open_calibration, state="disabled"
+        )
+        self.calibrate_button.pack(side="left", padx=5)
+        self.calibration_label = ttk.Label(calibration_frame, text="Calibration: defaults", foreground="gray")
+        self.calibration_label.pack(side="left", padx=10)
+
+        # === Vibration Tab ===
+        vib_tab = ttk.Frame(self.notebook)
+        self.notebook.add(vib_tab, text="Vibration")
+
+        vib_frame = ttk.LabelFrame(vib_tab, text="LSM6DSO Spectrogram", padding=10)
+        vib_frame.pack(padx=10, pady=10, fill="both", expand=True)
+
+        vib_controls = ttk.Frame(vib_frame)
+        vib_controls.pack(fill="x", pady=(0, 6))
+
+        self.spectrum_axes_var = tk.StringVar(value="Accel")
+        for col, name in enumerate(("Accel", "Gyro")):
+            ttk.Radiobutton(
+                vib_controls, text=name, value=name, variable=self.spectrum_axes_var,
+                command=self._refresh_spectrogram_view
+            ).grid(row=0, column=col, padx=8)
+
+        self.spectrogram_canvas = tk.Canvas(vib_frame, height=160, bg="black", highlightthickness=0)
+        self.spectrogram_canvas.pack(fill="x", expand=False)
+
+        self.band_energy_label = ttk.Label(
+            vib_frame, text="Band energy: N/A", font=("Consolas", 10), justify="left"
+        )
+        self.band_energy_label.pack(anchor="w", pady=(6, 0))
+
+        # ---------- Diagnostics Tab ----------
+        diag_tab = ttk.Frame(self.notebook)
+        self.notebook.add(diag_tab, text="Diagnostics")
+
+        prof_frame = ttk.LabelFrame(diag_tab, text="Hot-path Profiling", padding=10)
+        prof_frame.pack(padx=10, pady=10, fill="x")
+
+        self.profiling_var = tk.BooleanVar(value=PROFILER.enabled)
+        ttk.Checkbutton(
+            prof_frame, text="Stage timing", variable=self.profiling_var,
+            command=lambda: PROFILER.enable(self.profiling_var.get())
+        ).grid(row=0, column=0, padx=8)
+        ttk.Button(prof_frame, text="Report", command=self.dump_profile_report).grid(row=0, column=1, padx=8)
+        ttk.Button(prof_frame, text="Reset", command=PROFILER.reset).grid(row=0, column=2, padx=8)
+        self.flame_button = ttk.Button(
+            prof_frame, text=f"Flame Graph ({FLAME_GRAPH_SECONDS} s)", command=self.capture_flame_graph
+        )
+        self.flame_button.grid(row=0, column=3, padx=8)
+
+        soak_frame = ttk.LabelFrame(diag_tab, text="Soak Test", padding=10)
+        soak_frame.pack(padx=10, pady=(0, 10), fill="x")
+
+        self.soak_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            soak_frame, text="Soak monitor", variable=self.soak_var, command=self.toggle_soak
+        ).grid(row=0, column=0, padx=8, sticky="w")
+        self.simulate_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            soak_frame, text="Simulated stream", variable=self.simulate_var, command=self.toggle_simulation
+        ).grid(row=0, column=1, padx=8, sticky="w")
+        self.soak_label = ttk.Label(soak_frame, text="Soak: off", foreground="gray", font=("Consolas", 10))
+        self.soak_label.grid(row=1, column=0, columnspan=4, padx=8, pady=(6, 0), sticky="w")
+
+        loop_frame = ttk.LabelFrame(diag_tab, text="BLE Event Loop", padding=10)
+        loop_frame.pack(padx=10, pady=(0, 10), fill="x")
+
+        self.offload_var = tk.BooleanVar(value=OFFLOAD_BLOCKING)
+        ttk.Checkbutton(
+            loop_frame, text="Offload blocking calls", variable=self.offload_var,
+            command=lambda: set_offload(self.offload_var.get())
+        ).grid(row=0, column=0, padx=8, sticky="w")
+        ttk.Button(loop_frame, text="Slow Callbacks", command=self.dump_loop_report).grid(row=0, column=1, padx=8)
+        self.loop_label = ttk.Label(loop_frame, text="Loop lag: N/A", foreground="gray", font=("Consolas", 10))
+        self.loop_label.grid(row=1, column=0, columnspan=4, padx=8, pady=(6, 0), sticky="w")
+
         # Separator
         # ttk.Separator(sensor_frame, orient="horizontal").pack(fill="x", pady=15)
 
@@ -345,6 +517,136 @@ class SimpleBOLTController:
         self.async_thread = threading.Thread(target=self._run_async_loop, daemon=True)
         self.async_thread.start()
 
+        # Lag percentiles and stack snapshots of whatever blocks the BLE loop
+        self.watchdog = LoopWatchdog(self.loop, self.async_thread, self.log_device, on_update=self._on_loop_stats)
+        self.watchdog.start()
+
+        # Soak test: periodic resource/latency rows, optional synthetic device
+        self.soak = SoakMonitor(
+            [self._soak_probe_tk, self._soak_probe_loop, self._soak_probe_bus,
+             profiler_probe(PROFILER, ("receive", "ui_apply"))],
+            self.log_device, on_row=self._on_soak_row,
+        )
+        self.simulation = SimulatedStream(self.loop, self._notification_handler)
+
+        # Remote dashboards, served from the BLE loop (bolt_server.py)
+        self.stream_server = StreamServer(self.log_device, self.loop, on_trigger=self.capture.fire)
+        self.bus.subscribe("export", self.stream_server.publish, policy=POLICY_DROP_OLDEST)
+        asyncio.run_coroutine_threadsafe(self._start_stream_server(), self.loop)
+
+        self.root.after(SPECTROGRAM_REFRESH_MS, self._refresh_spectrogram)
+        self.root.after(RECORDER_FLUSH_MS, self._flush_recorder)
+
+        self._log_pending = []
+        self._log_lock = threading.Lock()
+        self._load_capture_config()
+
+        self.ui_binder = WidgetBinder(self.root.after, self.ui_state, self._render_ui)
+        self.ui_binder.request_frame()
+
+    # === UI State ===
+    @property
+    def is_connected(self):
+        return self.ui_state["connected"]
+
+    @property
+    def lsm6dso_active(self):
+        return self.ui_state["lsm6dso_active"]
+
+    @property
+    def sttsh22h_active(self):
+        return self.ui_state["sttsh22h_active"]
+
+    @property
+    def strain_gauge_active(self):
+        return self.ui_state["strain_gauge_active"]
+
+    @property
+    def all_sensors_active(self):
+        return self.ui_state["all_sensors_active"]
+
+    @property
+    def ota_bin_path(self):
+        return self.ui_state["ota_bin_path"]
+
+    def _render_ui(self, s):
+        """Widget options for a state snapshot, WidgetBinder only applies what changed"""
+        connected = s["connected"]
+        on = "normal" if connected else "disabled"
+        phase = s["connect_phase"]
+        all_active = s["all_sensors_active"]
+        # Individual sensors are locked while ALL is running
+        single = "normal" if connected and not all_active else "disabled"
+
+        def led(active):
+            return {"foreground": "green" if active else "red"}
+
+        version = s["version"]
+        rssi = s["rssi"]
+        latency = s["latency_ms"]
+        mtu = s["mtu"]
+        mtu_text = f"MTU: {mtu} bytes" if mtu else "MTU: N/A bytes"
+        if mtu == 23:
+            mtu_text += " (may be limited by OS/BlueZ)"
+        path = s["ota_bin_path"]
+
+        return {
+            self.connect_button: {
+                "text": phase or ("Disconnect" if connected else "Connect to BOLT"),
+                "state": "disabled" if phase else "normal",
+            },
+            self.status_label: {"text": s["status"], "foreground": s["status_color"]},
+            self.version_label: {
+                "text": f"Firmware Version: {version or 'Unknown'}",
+                "foreground": "black" if version else "gray",
+            },
+            self.rssi_label: {
+                "text": f"RSSI: {'N/A' if rssi is None else rssi} dBm",
+                "foreground": "gray" if rssi is None else
+                              "black" if rssi > -70 else "orange" if rssi > -90 else "red",
+            },
+            self.latency_label: {
+                "text": "Latency: N/A ms" if latency is None else f"Latency: {latency:.0f} ms",
+                "foreground": "gray" if latency is None else "black",
+            },
+            self.mtu_label: {"text": mtu_text, "foreground": "black" if mtu and mtu > 23 else "gray"},
+            self.link_label: {"text": s["link_text"] or "Link: N/A", "foreground": s["link_color"]},
+            self.fetch_version_button: {"state": on},
+            self.fetch_rssi_button: {"state": on},
+            self.led_on_button: {"state": on},
+            self.led_off_button: {"state": on},
+            self.lsm6dso_button: {"text": "STOP" if s["lsm6dso_active"] else "START", "state": single},
+            self.lsm6dso_status: led(s["lsm6dso_active"]),
+            self.sttsh22h_button: {"text": "STOP" if s["sttsh22h_active"] else "START", "state": single},
+            self.sttsh22h_status: led(s["sttsh22h_active"]),
+            self.strain_gauge_button: {"text": "STOP" if s["strain_gauge_active"] else "START", "state": single},
+            self.strain_gauge_status: led(s["strain_gauge_active"]),
+            self.all_sensors_button: {"text": "STOP ALL" if all_active else "START ALL", "state": on},
+            self.all_sensors_status: led(all_active),
+            self.select_fw_button: {
+                "text": os.path.basename(path) if path else "Select Firmware (.bin)",
+                "state": on,
+            },
+            self.start_fw_button: {
+                "state": "normal" if connected and path and not s["ota_busy"] else "disabled",
+            },
+            self.manual_trigger_button: {"state": "normal" if connected and s["capture_mode"] else "disabled"},
+            self.loop_label: {"text": s["loop_text"] or "Loop lag: N/A", "foreground": s["loop_color"]},
+            self.calibrate_button: {"state": on},
+            self.calibration_label: {
+                "text": s["calibration_text"] or "Calibration: defaults",
+                "foreground": "black" if s["calibration_text"] else "gray",
+            },
+            self.soak_label: {
+                "text": s["soak_text"] or "Soak: off",
+                "foreground": "black" if s["soak_text"] else "gray",
+            },
+            self.capture_label: {
+                "text": f"Captures: {s['captures']}" + (f" | last: {s['last_capture']}" if s["last_capture"] else ""),
+                "foreground": "black" if s["capture_mode"] else "gray",
+            },
+        }
+
     def fetch_version(self):
         """Send a version request command to the device"""
         async def _fetch():
@@ -371,6 +673,7 @@ class SimpleBOLTController:
                 return
             try:
                 payload = bytes([RSSI_REQUEST_PREFIX])  # Simple 1-byte request: 0x40
+                self.rssi_requested = True
                 await self.client.write_gatt_char(LED_WRITE_UUID, payload, response=False)
                 self.log_device("→ RSSI request sent (0x40)")
             except Exception as e:
@@ -382,62 +685,80 @@ class SimpleBOLTController:
             if self.client and self.client.is_connected:
                 try:
                     mtu = self.client.mtu_size
-                    color = "black" if mtu > 23 else "gray"
-                    text = f"MTU: {mtu} bytes"
-                    if mtu == 23:
-                        text += " (may be limited by OS/BlueZ)"
-                    self.root.after(0, lambda: self.mtu_label.config(
-                        text=text,
-                        foreground=color
-                    ))
+                    self.ui_state.set(mtu=mtu)
                     self.log_device(f"Negotiated MTU: {mtu} bytes")
                 except Exception as e:
                     self.log_device(f"✗ Could not read MTU: {e}")
-                    self.root.after(0, lambda: self.mtu_label.config(
-                        text="MTU: N/A bytes",
-                        foreground="gray"
-                    ))
+                    self.ui_state.set(mtu=None)
             else:
-                self.root.after(0, lambda: self.mtu_label.config(
-                    text="MTU: N/A bytes",
-                    foreground="gray"
-                ))
+                self.ui_state.set(mtu=None)
 
         # This line schedules the async function correctly
         asyncio.run_coroutine_threadsafe(_get_mtu(), self.loop)
 
+    async def _start_stream_server(self):
+        try:
+            await self.stream_server.start()
+        except OSError as e:
+            self.log_device(f"✗ Streaming server not started: {e}")
+
     def _run_async_loop(self):
         asyncio.set_event_loop(self.loop)
         self.loop.run_forever()
 
     def toggle_connection(self):
         if self.is_connected:
-            self.connect_button.config(state="disabled", text="Disconnecting...")
+            self.ui_state.set(connect_phase="Disconnecting...")
             asyncio.run_coroutine_threadsafe(self._disconnect(), self.loop)
         else:
             asyncio.run_coroutine_threadsafe(self._connect(), self.loop)
 
     async def _connect(self):
+        # The previous session may still be written out
+        async with self._session_lock:
+            pass
         try:
-            self.root.after(0, lambda: self.status_label.config(text="Scanning...", foreground="orange"))
-            self.root.after(0, lambda: self.connect_button.config(state="disabled", text="Scanning..."))
+            self.client = None
+            # Fast path: straight to the last device with its cached services
+            address = self.gatt_cache.last_address()
+            if address:
+                self.ui_state.set(status=f"Reconnecting to {address[-8:]}...", status_color="blue",
+                                  connect_phase="Connecting...")
+                try:
+                    started = time.perf_counter()
+                    self.client, cached = await connect_cached(
+                        address, self.gatt_cache, disconnected_callback=self._on_disconnect
+                    )
+                    self.log_device(
+                        f"✓ Reconnected in {(time.perf_counter() - started) * 1000:.0f} ms"
+                        + (" (cached services)" if cached else "")
+                    )
+                except Exception as e:
+                    self.log_device(f"⚠ Fast reconnect failed, scanning: {e}")
+                    await run_blocking(self.gatt_cache.invalidate, address)
+                    self.client = None
 
-            devices = await BleakScanner.discover(timeout=8.0)
-            target = next((d for d in devices if d.name == "BOLT"), None)
+            if not self.client:
+                self.ui_state.set(status="Scanning...", status_color="orange", connect_phase="Scanning...")
 
-            if not target:
-                self._update_ui_disconnected("BOLT not found")
-                self.root.after(0, lambda: messagebox.showerror("Error", "BOLT device not found"))
-                return
+                target = await find_bolt()
+
+                if not target:
+                    self._update_ui_disconnected("BOLT not found")
+                    self.root.after(0, lambda: messagebox.showerror("Error", "BOLT device not found"))
+                    return
             
-            self.root.after(0, lambda: self.status_label.config(
-                text=f"Connecting to {target.address[-8:]}...", foreground="blue"))
+                self.ui_state.set(status=f"Connecting to {target.address[-8:]}...", status_color="blue",
+                                  connect_phase="Connecting...")
 
-            self.client = BleakClient(target.address, disconnected_callback=self._on_disconnect)
-            await self.client.connect()
+                self.client, _ = await connect_cached(
+                    target.address, self.gatt_cache, disconnected_callback=self._on_disconnect, timeout=SCAN_TIMEOUT
+                )
 
             # Enable notifications
+            await self._start_session(self.client.address)
             await self.client.start_notify(NOTIFY_UUID, self._notification_handler)
+            self.link.start(self.client)
             
             await asyncio.sleep(0.3)
             self.root.after(0, self.update_mtu)    
@@ -485,222 +806,90 @@ class SimpleBOLTController:
             self.log_device(f"✗ Disconnect error: {e}")
             self._update_ui_disconnected("Disconnect error")
         finally:
+            self.link.stop()
+            await self._finish_session()
             self.disconnect_in_progress = False
             self.client = None
 
     def _on_disconnect(self, client):
         """Callback when device disconnects unexpectedly"""
         if not self.disconnect_in_progress:
+            self.link.stop()
+            asyncio.run_coroutine_threadsafe(self._finish_session(), self.loop)
             self.log_device("⚠ Device disconnected unexpectedly")
             self._update_ui_disconnected("Connection lost")
 
     def _update_ui_connected(self):
-        def _update():
-            self.is_connected = True
-            self.connect_button.config(text="Disconnect", state="normal")
-            self.led_on_button.config(state="normal")
-            self.led_off_button.config(state="normal")
-            self.lsm6dso_button.config(state="normal")
-            self.sttsh22h_button.config(state="normal")
-            self.strain_gauge_button.config(state="normal")
-            self.all_sensors_button.config(state="normal")
-            self.fetch_version_button.config(state="normal")
-            self.fetch_rssi_button.config(state="normal")
-            self.status_label.config(text="Connected to BOLT", foreground="green")
-            self.select_fw_button.config(state="normal")
-            self.start_fw_button.config(
-                state="normal" if self.ota_bin_path else "disabled"
-            )
-            self.update_mtu()
-        self.root.after(0, _update)
+        self.ui_state.set(
+            connected=True,
+            connect_phase=None,
+            status="Connected to BOLT",
+            status_color="green",
+        )
+        self.update_mtu()
 
     def _update_ui_disconnected(self, msg="Disconnected"):
-        def _update():
-            self.is_connected = False
-            self.connect_button.config(text="Connect to BOLT", state="normal")
-            self.led_on_button.config(state="disabled")
-            self.led_off_button.config(state="disabled")
-            self.lsm6dso_button.config(state="disabled")
-            self.sttsh22h_button.config(state="disabled")
-            self.all_sensors_button.config(state="disabled")
-            self.fetch_version_button.config(state="disabled")
-            self.fetch_rssi_button.config(state="disabled")
-            self.status_label.config(text=f"Status: {msg}", foreground="red")
-            
+        self.last_ping_start = None
+        self.ui_state.set(
+            connected=False,
+            connect_phase=None,
+            status=f"Status: {msg}",
+            status_color="red",
             # Reset sensor states
-            self.lsm6dso_active = False
-            self.sttsh22h_active = False
-            self.strain_gauge_active = False
-            self.all_sensors_active = False
-            self._update_sensor_button_states()
-            self.version_label.config(text="Firmware Version: Unknown", foreground="gray")
-            
-            self.ota_bin_path = None
-            self.select_fw_button.config(state="disabled", text="Select Firmware (.bin)")
-            self.start_fw_button.config(state="disabled")
-
-            self.rssi_label.config(text="RSSI: N/A dBm", foreground="gray")
-            self.latency_label.config(text="Latency: N/A ms", foreground="gray")
-            self.last_ping_start = None
-            self.mtu_label.config(text="MTU: N/A bytes", foreground="gray")
-
-        self.root.after(0, _update)
-
-    def _compute_sector_info(self, app_addr, size_bytes):
-        offset = app_addr - FLASH_BASE_ADDR
-        first_sector = offset // FLASH_PAGE_SIZE
-        num_sectors = math.ceil(size_bytes / FLASH_PAGE_SIZE)
-        return first_sector, num_sectors
-    
+            lsm6dso_active=False,
+            sttsh22h_active=False,
+            strain_gauge_active=False,
+            all_sensors_active=False,
+            version=None,
+            ota_bin_path=None,
+            rssi=None,
+            latency_ms=None,
+            mtu=None,
+            link_text=None,
+            link_color="gray",
+        )
+
     async def _do_firmware_update(self):
         """Async OTA: reboot into BLE_Ota, reconnect, send binary, finish."""
         try:
             # 1) Read file
             try:
-                with open(self.ota_bin_path, "rb") as f:
-                    fw_data = f.read()
+                fw_data = await run_blocking(self._read_firmware, self.ota_bin_path)
             except Exception as e:
                 self.log_device(f"✗ Could not read firmware file: {e}")
                 return
 
-            first_sec, num_sec = self._compute_sector_info(APP_BASE_ADDR, len(fw_data))
-            self.log_device(
-                f"→ OTA erase plan: first_sector={first_sec}, num_sectors={num_sec}"
-            )
-
             # 2) Send reboot command over existing user-app connection
             if not self.client or not self.client.is_connected:
                 self.log_device("✗ Not connected to user app, aborting OTA")
                 return
 
-            reboot_payload = bytes([
-                0x01,                 # boot mode: jump to OTA app
-                first_sec & 0xFF,     # first sector index
-                num_sec & 0xFF,       # number of sectors
-            ])
-
-            try:
-                await self.client.write_gatt_char(
-                    REBOOT_CHAR_UUID, reboot_payload, response=False
-                )
-                self.log_device(
-                    f"→ Reboot to OTA sent: "
-                    f"{' '.join(f'{b:02X}' for b in reboot_payload)}"
-                )
-            except Exception as e:
-                self.log_device(f"✗ Failed to send reboot cmd: {e}")
+            self.link.stop()
+            await self._finish_session()
+            # The new image may change the GATT table
+            await run_blocking(self.gatt_cache.invalidate, self.client.address)
+            if not await request_ota_reboot(self.client, len(fw_data), self.log_device):
                 return
-
-            # Disconnect this client; device will reboot into BLE_Ota
-            try:
-                await self.client.disconnect()
-            except Exception:
-                pass
             self.client = None
 
-            # 3) Wait and reconnect in OTA mode
-            await asyncio.sleep(3.0)
-            self.log_device("… Waiting for BOLT in OTA mode")
-
-            devices = await BleakScanner.discover(timeout=8.0)
-            target = next((d for d in devices if d.name == "BOLT"), None)
-            if not target:
-                self.log_device("✗ BOLT in OTA mode not found after reboot")
-                return
-
-            self.log_device(f"✓ Found BOLT in OTA mode: {target.address}")
-            ota_client = BleakClient(target.address)
-
-            try:
-                await ota_client.connect()
-                self.log_device("✓ Connected in OTA mode")
-
-                # 4) Send START_USER_APP command
-                offset = APP_BASE_ADDR - FLASH_BASE_ADDR
-                addr_bytes = offset.to_bytes(3, "big")
-                start_payload = bytes([ACTION_START_USER_APP]) + addr_bytes
-
-                await ota_client.write_gatt_char(
-                    OTA_BASE_ADDR_UUID, start_payload, response=False
-                )
-                self.log_device(
-                    f"→ OTA START_USER_APP: {' '.join(f'{b:02X}' for b in start_payload)}"
-                )
-
-                # 5) Stream firmware
-                total = len(fw_data)
-                sent = 0
-                self.log_device(f"→ Sending {total} bytes…")
-
-                for i in range(0, total, OTA_CHUNK_SIZE):
-                    chunk = fw_data[i:i + OTA_CHUNK_SIZE]
-                    await ota_client.write_gatt_char(
-                        OTA_DATA_UUID, chunk, response=False
-                    )
-                    sent += len(chunk)
-                    # light throttling to keep things smooth
-                    await asyncio.sleep(0.02)
-
-                self.log_device(f"✓ Firmware transfer complete ({sent} bytes sent)")
-
-                # 6) Subscribe to reboot notifications BEFORE sending FILE_FINISHED
-                reboot_event = asyncio.Event()
-
-                def reboot_callback(sender, data):
-                    self.log_device(f"← Device rebooting: {data.hex()}")
-                    reboot_event.set()
-
-                try:
-                    await ota_client.start_notify(OTA_REBOOT_CONF_UUID, reboot_callback)
-                    self.log_device("✓ Subscribed to reboot notifications")
-                except Exception as e:
-                    self.log_device(f"⚠ Could not subscribe to reboot notifications: {e}")
-
-                # 7) Tell bootloader we're done (device will auto-reboot after this)
-                finish_payload = bytes([ACTION_FILE_FINISHED]) + addr_bytes
-                await ota_client.write_gatt_char(
-                    OTA_BASE_ADDR_UUID, finish_payload, response=False
-                )
-                self.log_device(
-                    f"→ OTA FILE_FINISHED: {' '.join(f'{b:02X}' for b in finish_payload)}"
-                )
-
-                # 8) Wait for device to send reboot indication
-                self.log_device("… Waiting for device to reboot")
-                try:
-                    await asyncio.wait_for(reboot_event.wait(), timeout=8.0)
-                    self.log_device("✓ Reboot confirmation received")
-                except asyncio.TimeoutError:
-                    self.log_device("⚠ Reboot confirmation timeout (device may still reboot)")
-
-                # Give device time to complete reboot
-                await asyncio.sleep(4.0)
-
-            finally:
-                try:
-                    await ota_client.disconnect()
-                except Exception:
-                    pass
-
-            # 9) Reconnect to updated firmware
-            self.log_device("✓ OTA finished — scanning for new firmware...")
-            await asyncio.sleep(2.0)
-            
-            devices = await BleakScanner.discover(timeout=8.0)
-            target = next((d for d in devices if d.name == "BOLT"), None)
+            # 3) Reconnect in OTA mode, stream the image and wait for the reboot
+            target = await transfer_ota_image(fw_data, self.log_device)
 
+            # 4) Reconnect to updated firmware
             if target:
                 self.log_device("✓ New firmware detected — reconnecting...")
-                self.client = BleakClient(target.address, disconnected_callback=self._on_disconnect)
-                await self.client.connect()
+                await run_blocking(self.gatt_cache.invalidate, target.address)
+                self.client, _ = await connect_cached(
+                    target.address, self.gatt_cache, disconnected_callback=self._on_disconnect, timeout=SCAN_TIMEOUT
+                )
+                await self._start_session(target.address)
                 await self.client.start_notify(NOTIFY_UUID, self._notification_handler)
+                self.link.start(self.client)
                 self._update_ui_connected()
                 self.log_device("✓ Reconnected to updated firmware")
                 # Fetch the new version
                 self.root.after(500, self.fetch_version)
                 self.root.after(1000, self.fetch_rssi)
-            else:
-                self.log_device("⚠ Could not find device after OTA (maybe still rebooting)")
 
         except Exception as e:
             self.log_device(f"✗ OTA process failed: {e}")
@@ -708,8 +897,13 @@ class SimpleBOLTController:
             self.log_device(traceback.format_exc())
 
         finally:
-            # Re-enable the button on GUI thread
-            self.root.after(0, lambda: self.start_fw_button.config(state="normal"))
+            # Re-enable the start button
+            self.ui_state.set(ota_busy=False)
+
+    @staticmethod
+    def _read_firmware(path):
+        with open(path, "rb") as f:
+            return f.read()
 
     def select_firmware(self):
         """Let user pick a .bin file for OTA."""
@@ -720,12 +914,9 @@ class SimpleBOLTController:
         if not path:
             return
 
-        self.ota_bin_path = path
         self.log_device(f"✓ Selected firmware: {path}")
-        # Update button label and enable start
-        self.select_fw_button.config(text=os.path.basename(path))
-        if self.is_connected:
-            self.start_fw_button.config(state="normal")
+        # Button label and start button follow the state
+        self.ui_state.set(ota_bin_path=path)
 
     def start_firmware_update(self):
         """Trigger firmware update over BLE OTA."""
@@ -737,7 +928,7 @@ class SimpleBOLTController:
             return
 
         # Disable button so user can’t spam it
-        self.start_fw_button.config(state="disabled")
+        self.ui_state.set(ota_busy=True)
         self.log_device(f"Starting firmware update: {self.ota_bin_path}")
 
         asyncio.run_coroutine_threadsafe(self._do_firmware_update(), self.loop)
@@ -768,14 +959,13 @@ class SimpleBOLTController:
             return False
         
         try:
-            payload = bytes([0x10, sensor_id, action])  # 0x10 = sensor command prefix
+            payload = sensor_command(sensor_id, action)
             await self.client.write_gatt_char(LED_WRITE_UUID, payload, response=False)
             
-            sensor_names = {0x01: "LSM6DSO", 0x02: "STT22H", 0x03: "STRAIN GAUGE", 0x04: "ALL"}
             action_str = "START" if action else "STOP"
             self.log_device(
-                f"→ {sensor_names.get(sensor_id, 'UNKNOWN')} {action_str} | "
-                f"Payload: {' '.join(f'{b:02X}' for b in payload)}"
+                f"→ {SENSOR_NAMES.get(sensor_id, 'UNKNOWN')} {action_str} | "
+                f"Payload: {format_payload(payload)}"
             )
             return True
         except Exception as e:
@@ -792,8 +982,9 @@ class SimpleBOLTController:
             action = 0x01 if new_state else 0x00
             
             if await self._send_sensor_command(0x01, action):
-                self.lsm6dso_active = new_state
-                self.root.after(0, self._update_sensor_button_states)
+                if new_state:
+                    self.vibration.reset()
+                self.ui_state.set(lsm6dso_active=new_state)
         
         asyncio.run_coroutine_threadsafe(_toggle(), self.loop)
 
@@ -807,8 +998,7 @@ class SimpleBOLTController:
             action = 0x01 if new_state else 0x00
             
             if await self._send_sensor_command(0x02, action):
-                self.sttsh22h_active = new_state
-                self.root.after(0, self._update_sensor_button_states)
+                self.ui_state.set(sttsh22h_active=new_state)
         
         asyncio.run_coroutine_threadsafe(_toggle(), self.loop)
 
@@ -818,17 +1008,14 @@ class SimpleBOLTController:
             action = SENSOR_START if new_state else SENSOR_STOP
             
             if await self._send_sensor_command(SENSOR_ALL, action):
-                self.all_sensors_active = new_state
                 if new_state:
-                    # When starting all, disable individual buttons
-                    self.lsm6dso_active = False
-                    self.sttsh22h_active = False
-                    self.strain_gauge_active = False
-
-                    self.lsm6dso_count = 0
-                    self.sttsh22h_count = 0
-                    self.strain_gauge_count = 0
-                self.root.after(0, self._update_sensor_button_states)
+                    self.bus.reset_counts()
+                    self.vibration.reset()
+                    # When starting all, individual sensors are cleared and their buttons locked
+                    self.ui_state.set(all_sensors_active=True, lsm6dso_active=False,
+                                      sttsh22h_active=False, strain_gauge_active=False)
+                else:
+                    self.ui_state.set(all_sensors_active=False)
         
         asyncio.run_coroutine_threadsafe(_toggle(), self.loop)
     def toggle_strain_gauge(self):
@@ -841,58 +1028,489 @@ class SimpleBOLTController:
             action = 0x01 if new_state else 0x00
         
             if await self._send_sensor_command(SENSOR_STRAIN_GAUGE, action):
-                self.strain_gauge_active = new_state
-                self.root.after(0, self._update_sensor_button_states)
+                self.ui_state.set(strain_gauge_active=new_state)
     
         asyncio.run_coroutine_threadsafe(_toggle(), self.loop)    
 
-    def _update_sensor_button_states(self):
-        """Update button text and status indicators"""
-        # LSM6DSO
-        if self.lsm6dso_active:
-            self.lsm6dso_button.config(text="STOP")
-            self.lsm6dso_status.config(foreground="green")
-        else:
-            self.lsm6dso_button.config(text="START")
-            self.lsm6dso_status.config(foreground="red")
-        
-        # STT22H
-        if self.sttsh22h_active:
-            self.sttsh22h_button.config(text="STOP")
-            self.sttsh22h_status.config(foreground="green")
+    # === Vibration Spectrum ===
+    @staticmethod
+    def _build_palette(steps=64):
+        """Dark blue -> cyan -> yellow -> red color ramp for the spectrogram"""
+        stops = ((0, 0, 64), (0, 160, 255), (255, 255, 0), (255, 0, 0))
+        palette = []
+        for i in range(steps):
+            pos = i / (steps - 1) * (len(stops) - 1)
+            k = min(int(pos), len(stops) - 2)
+            f = pos - k
+            rgb = [int(a + (b - a) * f) for a, b in zip(stops[k], stops[k + 1])]
+            palette.append("#%02x%02x%02x" % tuple(rgb))
+        return palette
+
+    def _refresh_spectrogram(self):
+        """Periodic redraw of the vibration tab while streaming"""
+        if self.lsm6dso_active or self.all_sensors_active:
+            self._refresh_spectrogram_view()
+        self.root.after(SPECTROGRAM_REFRESH_MS, self._refresh_spectrogram)
+
+    def _refresh_spectrogram_view(self):
+        axes = slice(0, 3) if self.spectrum_axes_var.get() == "Accel" else slice(3, 6)
+        freqs, columns = self.vibration.spectrogram(axes)
+        if not len(columns):
+            return
+
+        # Log power normalized over the visible window, highest frequency on top
+        power = np.log10(columns.T[::-1] + 1e-9)
+        lo, hi = power.min(), power.max()
+        levels = ((power - lo) / (hi - lo or 1.0) * (len(self._spectrogram_palette) - 1)).astype(int)
+        rows = " ".join(
+            "{" + " ".join(self._spectrogram_palette[v] for v in row) + "}" for row in levels
+        )
+
+        image = tk.PhotoImage(width=levels.shape[1], height=levels.shape[0])
+        image.put(rows, to=(0, 0))
+        self._spectrogram_image = image.zoom(SPECTROGRAM_PIXELS, SPECTROGRAM_PIXELS)
+        self.spectrogram_canvas.delete("all")
+        self.spectrogram_canvas.config(height=self._spectrogram_image.height())
+        self.spectrogram_canvas.create_image(0, 0, anchor="nw", image=self._spectrogram_image)
+
+        _, energy = self.vibration.snapshot()
+        names = ("X", "Y", "Z")
+        group = energy[:, axes]
+        lines = []
+        for (band_lo, band_hi), row in zip(self.vibration.bands, group):
+            values = "  ".join(f"{n}={v:10.3g}" for n, v in zip(names, row))
+            lines.append(f"{band_lo:4.1f}-{band_hi:4.1f} Hz: {values}")
+        self.band_energy_label.config(text="\n".join(lines))
+
+    # === Link Quality ===
+    def _active_sensor_ids(self):
+        if self.all_sensors_active:
+            return [SENSOR_ALL]
+        active = ((SENSOR_LSM6DSO, self.lsm6dso_active),
+                  (SENSOR_STTSH22H, self.sttsh22h_active),
+                  (SENSOR_STRAIN_GAUGE, self.strain_gauge_active))
+        return [sensor_id for sensor_id, on in active if on]
+
+    def _on_link_stats(self, stats):
+        phy = "2M" if stats.phy == PHY_2M else "1M"
+        text = (f"Link: {stats.profile} {phy} | {stats.notif_rate:.1f} pkt/s | "
+                f"loss {stats.loss:.0%} | errors {stats.errors}")
+        color = "black" if stats.loss < 0.05 else "orange" if stats.loss < 0.2 else "red"
+        self.ui_state.set(link_text=text, link_color=color)
+        if self.recorder:
+            self._link_history.append(stats)
+
+        # The link manager may have exchanged a larger MTU since connect
+        client = self.client
+        if client and client.is_connected:
+            self.ui_state.set(mtu=client.mtu_size)
+
+    # === Session Recording ===
+    def _open_recorder(self, address):
+        self._close_recorder()
+        # Tag exported samples and captures with the device they come from
+        self.stream_server.device = address
+        if self.shm:
+            self.shm.set_device(address)
+        self.capture.set_tags(device=address, firmware=None)
+        self._load_calibration(address)
+        if self.ui_state["capture_mode"]:
+            return
+        try:
+            self.recorder = self.store.open_session(address)
+            self._link_history = []
+            self.log_device(f"✓ Recording session: {self.recorder.path}")
+        except OSError as e:
+            self.recorder = None
+            self.log_device(f"✗ Could not open session store: {e}")
+
+    def _close_recorder(self):
+        # Let the recorder consumer write out everything already published
+        if self.recorder and not self.bus.drain("recorder", timeout=10.0):
+            self.log_device("⚠ Recorder queue not drained, closing session anyway")
+        recorder, self.recorder = self.recorder, None
+        if recorder:
+            try:
+                # Kept in meta.json for the post-session report
+                recorder.close(link=link_summary(self._link_history), calibration=self.units.profile)
+            except OSError as e:
+                self.log_device(f"✗ Could not close session: {e}")
+
+    # === Calibration ===
+    def _load_calibration(self, address, firmware=None):
+        self.units.set_device(address, firmware)
+        calibrated = self.units.profile.get("calibrated")
+        self.ui_state.set(calibration_text=f"Calibration: {calibrated}" if calibrated else None)
+
+    def open_calibration(self):
+        """Guided calibration of the connected device, one step per page"""
+        if self.calibration_window is not None:
+            self.calibration_window.lift()
+            return
+        client = self.client
+        if not client:
+            return
+        self.calibration = CalibrationRoutine(self.units.profile)
+        self.calibration_address = client.address
+        self.bus.subscribe("calibration", self.calibration.collect, policy=POLICY_DROP_OLDEST,
+                           maxsize=RECORDER_QUEUE_SIZE)
+
+        win = self.calibration_window = tk.Toplevel(self.root)
+        win.title(f"Calibrate {client.address}")
+        win.resizable(False, False)
+        win.protocol("WM_DELETE_WINDOW", self.close_calibration)
+
+        self.cal_title = ttk.Label(win, font=("Arial", 11, "bold"))
+        self.cal_title.pack(padx=12, pady=(12, 4), anchor="w")
+        self.cal_prompt = ttk.Label(win, wraplength=360, justify="left")
+        self.cal_prompt.pack(padx=12, anchor="w")
+
+        ref_frame = ttk.Frame(win)
+        ref_frame.pack(padx=12, pady=6, anchor="w")
+        self.cal_reference_var = tk.StringVar()
+        self.cal_reference = ttk.Entry(ref_frame, textvariable=self.cal_reference_var, width=10)
+        self.cal_reference.pack(side="left")
+        self.cal_unit = ttk.Label(ref_frame)
+        self.cal_unit.pack(side="left", padx=4)
+
+        self.cal_status = ttk.Label(win, wraplength=360, justify="left", foreground="gray")
+        self.cal_status.pack(padx=12, pady=(0, 6), anchor="w")
+
+        buttons = ttk.Frame(win)
+        buttons.pack(padx=12, pady=(0, 12), fill="x")
+        self.cal_start_button = ttk.Button(buttons, text="Start", command=self._calibration_start)
+        self.cal_start_button.pack(side="left")
+        self.cal_skip_button = ttk.Button(buttons, text="Skip", command=self._calibration_skip)
+        self.cal_skip_button.pack(side="left", padx=6)
+        self.cal_firmware_var = tk.BooleanVar(value=False)
+        version = self.ui_state["version"]
+        self.cal_firmware_check = ttk.Checkbutton(
+            buttons, text=f"Only firmware {version}", variable=self.cal_firmware_var,
+            state="normal" if version else "disabled"
+        )
+        self.cal_firmware_check.pack(side="left", padx=6)
+        self.cal_save_button = ttk.Button(buttons, text="Save", command=self._calibration_save, state="disabled")
+        self.cal_save_button.pack(side="right")
+        self._show_calibration_step()
+
+    def _show_calibration_step(self, status=None, color="gray"):
+        routine = self.calibration
+        step = routine.step
+        if step is None:
+            self.cal_title.config(text="Calibration complete")
+            self.cal_prompt.config(text="\n".join(routine.results))
+            self.cal_reference.config(state="disabled")
+            self.cal_unit.config(text="")
+            self.cal_start_button.config(state="disabled")
+            self.cal_skip_button.config(state="disabled")
+            self.cal_save_button.config(state="normal")
         else:
-            self.sttsh22h_button.config(text="START")
-            self.sttsh22h_status.config(foreground="red")
-        
-        # Strain Gauge
-        if self.strain_gauge_active:
-            self.strain_gauge_button.config(text="STOP")
-            self.strain_gauge_status.config(foreground="green")
+            self.cal_title.config(text=f"Step {routine.index + 1}/{len(CALIBRATION_STEPS)}: {step.title}")
+            self.cal_prompt.config(text=step.prompt)
+            self.cal_reference_var.set("")
+            self.cal_reference.config(state="normal" if step.reference else "disabled")
+            self.cal_unit.config(text=step.reference or "")
+            self.cal_start_button.config(text="Start", state="normal")
+            self.cal_skip_button.config(state="normal")
+        self.cal_status.config(text=status or "", foreground=color)
+
+    def _calibration_start(self):
+        routine = self.calibration
+        step = routine.step
+        if routine.collecting:
+            # Open-ended step, stopped by the user
+            self._calibration_finish()
+            return
+        reference = None
+        if step.reference:
+            try:
+                reference = float(self.cal_reference_var.get())
+            except ValueError:
+                self.cal_status.config(text=f"Enter the reference value in {step.reference}", foreground="red")
+                return
+        routine.begin(reference)
+        self.cal_skip_button.config(state="disabled")
+        if step.seconds:
+            self.cal_start_button.config(state="disabled")
+            self.cal_status.config(text=f"Collecting for {step.seconds} s...", foreground="black")
+            self.root.after(int(step.seconds * 1000), self._calibration_finish)
         else:
-            self.strain_gauge_button.config(text="START")
-            self.strain_gauge_status.config(foreground="red")
+            self.cal_start_button.config(text="Stop")
+            self.cal_status.config(text="Collecting, press Stop when done...", foreground="black")
 
-        # All
-        if self.all_sensors_active:
-            self.all_sensors_button.config(text="STOP ALL")
-            self.all_sensors_status.config(foreground="green")
-            # Disable individual sensor buttons when all is active
-            self.lsm6dso_button.config(state="disabled")
-            self.sttsh22h_button.config(state="disabled")
-            self.strain_gauge_button.config(state="disabled")
+    def _calibration_finish(self):
+        routine = self.calibration
+        if routine is None or not routine.collecting:
+            return
+        self.bus.drain("calibration", timeout=1.0)
+        title = routine.step.title
+        try:
+            result = routine.finish()
+        except ValueError as e:
+            self._show_calibration_step(str(e), "red")
+            return
+        self.log_device(f"✓ Calibration {title}: {result}")
+        self._show_calibration_step(f"✓ {title}: {result}", "green")
+
+    def _calibration_skip(self):
+        self.calibration.skip()
+        self._show_calibration_step()
+
+    def _calibration_save(self):
+        firmware = self.ui_state["version"] if self.cal_firmware_var.get() else None
+        try:
+            self.calibrations.save(self.calibration_address, self.calibration.profile, firmware)
+        except OSError as e:
+            self.cal_status.config(text=f"Could not save: {e}", foreground="red")
+            return
+        self.log_device(f"✓ Calibration saved for {self.calibration_address}"
+                        + (f" firmware {firmware}" if firmware else ""))
+        client = self.client
+        if client and client.address == self.calibration_address:
+            self._load_calibration(client.address, self.ui_state["version"])
+        self.close_calibration()
+
+    def close_calibration(self):
+        self.bus.unsubscribe("calibration")
+        self.calibration = None
+        if self.calibration_window is not None:
+            self.calibration_window.destroy()
+            self.calibration_window = None
+
+    # === Trigger Capture ===
+    def toggle_capture_mode(self):
+        on = self.capture_var.get()
+        self.capture.enable(on)
+        self.ui_state.set(capture_mode=on)
+        # Draining the recorder and writing captures can take seconds, keep them off the Tk thread
+        asyncio.run_coroutine_threadsafe(self._switch_capture_mode(on), self.loop)
+
+    def _load_capture_config(self):
+        """Per-sensor triggers and window from the trigger file, current ones kept on errors"""
+        try:
+            triggers, pre_ms, post_ms = load_capture_config(
+                DEFAULT_TRIGGER_FILE, CAPTURE_TRIGGERS, CAPTURE_PRE_MS, CAPTURE_POST_MS
+            )
+            self.capture.configure(triggers, pre_ms, post_ms)
+        except (OSError, ValueError) as e:
+            self.log_device(f"✗ Could not load capture triggers from {DEFAULT_TRIGGER_FILE}: {e}")
+
+    async def _switch_capture_mode(self, on):
+        if on:
+            await run_blocking(self._load_capture_config)
+            async with self._session_lock:
+                await run_blocking(self._close_recorder)
+            capture = self.capture
+            names = ", ".join(f"{t.name} ({t.mode} {t.level:g})" for t in capture.triggers) or "manual only"
+            self.log_device(f"✓ Capture mode on: {capture.pre_ms} ms before / {capture.post_ms} ms after each trigger")
+            self.log_device(f"  Triggers: {names} — edit {DEFAULT_TRIGGER_FILE} and toggle to change")
         else:
-            self.all_sensors_button.config(text="START ALL")
-            self.all_sensors_status.config(foreground="red")
-            # Re-enable individual buttons
+            async with self._session_lock:
+                await run_blocking(self.capture.flush)
+            self.log_device("Capture mode off")
+            client = self.client
+            if client and client.is_connected:
+                await self._start_session(client.address)
+
+    def manual_trigger(self):
+        self.capture.fire("manual")
+
+    def _on_capture(self, trigger, path):
+        self.ui_state.set(captures=self.capture.count, last_capture=f"{trigger} ({os.path.basename(path)})")
+
+    # === Soak Test ===
+    def toggle_soak(self):
+        if self.soak_var.get():
+            # Handler latency comes from the stage profiler
+            self.profiling_var.set(True)
+            PROFILER.enable(True)
+            try:
+                self.soak.start()
+                self.ui_state.set(soak_text=f"Soak: running, first row in {self.soak.interval:.0f} s")
+            except (OSError, RuntimeError) as e:
+                self.soak_var.set(False)
+                self.log_device(f"✗ Could not start soak monitor: {e}")
+        else:
+            self.soak.stop()
+            self.ui_state.set(soak_text=None)
+
+    def toggle_simulation(self):
+        if self.simulate_var.get():
             if self.is_connected:
-                self.lsm6dso_button.config(state="normal")
-                self.sttsh22h_button.config(state="normal")
-                self.strain_gauge_button.config(state="normal")
+                self.simulate_var.set(False)
+                self.log_device("⚠ Disconnect before starting the simulated stream")
+                return
+            self.simulation.start()
+            self.log_device(f"✓ Simulated stream: {len(self.simulation.sensors)} sensors at {self.simulation.rate_hz:g} Hz")
+        else:
+            self.simulation.stop()
+            self.log_device("Simulated stream stopped")
+
+    def _soak_probe_tk(self):
+        def _read():
+            return {
+                "log_lines": int(self.notify_text.index("end-1c").split(".")[0]),
+                "tk_after_pending": len(self.root.tk.splitlist(self.root.tk.call("after", "info"))),
+            }
+        lag, row = call_and_time(lambda fn: self.root.after(0, fn), _read)
+        row = row or {}
+        row["tk_lag_ms"] = None if lag is None else round(lag, 2)
+        return row
+
+    def _soak_probe_loop(self):
+        lag, tasks = call_and_time(self.loop.call_soon_threadsafe, lambda: len(asyncio.all_tasks(self.loop)))
+        stats = self.watchdog.stats()
+        return {
+            "loop_lag_ms": None if lag is None else round(lag, 2),
+            "loop_lag_p99_ms": round(stats["p99"], 2),
+            "loop_stalls": stats["stalls"],
+            "loop_tasks": tasks,
+        }
+
+    def _soak_probe_bus(self):
+        stats = self.bus.stats() + self.units_bus.stats()
+        return {
+            "bus_queued": sum(st.queued for st in stats),
+            "bus_dropped": sum(st.dropped for st in stats),
+            "bus_max_lag_ms": round(max((st.lag for st in stats), default=0.0) * 1000, 1),
+        }
+
+    def _on_soak_row(self, row, flagged):
+        text = (f"Soak {row['elapsed_s'] / 3600:.2f} h | RSS {row['rss_mb']} MB | traced {row['traced_mb']} MB | "
+                f"log {row.get('log_lines')} lines | loop lag {row.get('loop_lag_ms')} ms | "
+                f"handler {row.get('receive_mean_us')} µs")
+        if flagged:
+            text += "\n⚠ rising: " + ", ".join(f"{k} {v:+.3g}/h" for k, v in flagged.items())
+        self.ui_state.set(soak_text=text)
+
+    # === Event Loop Watchdog ===
+    def _on_loop_stats(self, stats):
+        color = "black" if stats["p99"] < 20 else "orange" if stats["p99"] < 100 else "red"
+        self.ui_state.set(
+            loop_text=(f"Loop lag p50 {stats['p50']:.1f} | p95 {stats['p95']:.1f} | p99 {stats['p99']:.1f} | "
+                       f"max {stats['max']:.0f} ms | stalls {stats['stalls']}"),
+            loop_color=color,
+        )
+
+    def dump_loop_report(self):
+        for line in self.watchdog.report().splitlines():
+            self.log_device(line)
+        try:
+            self.log_device(f"✓ Loop report saved: {self.watchdog.dump_report(DEFAULT_PROFILE_DIR)}")
+        except OSError as e:
+            self.log_device(f"✗ Could not save loop report: {e}")
+
+    async def _start_session(self, address):
+        """Open the recorder for `address`; closing the previous one may wait for its queue to drain"""
+        async with self._session_lock:
+            await run_blocking(self._open_recorder, address)
+
+    async def _finish_session(self):
+        """Write out the open capture and recorder session without holding the BLE loop"""
+        async with self._session_lock:
+            self._log_bus_stats()
+            await run_blocking(self.capture.flush)
+            await run_blocking(self._close_recorder)
+
+    def _remember_version(self, address, version, mtu):
+        if self.gatt_cache.set_version(address, version, mtu):
+            self.log_device("⚠ Firmware changed — cached services dropped, next connect rediscovers")
+
+    def _on_version_saved(self, future):
+        if not future.cancelled() and future.exception():
+            self.log_device(f"✗ Could not save firmware version to GATT cache: {future.exception()!r}")
+
+    # === Profiling ===
+    def dump_profile_report(self):
+        for line in PROFILER.report().splitlines():
+            self.log_device(line)
+        try:
+            self.log_device(f"✓ Stage report saved: {PROFILER.dump_report()}")
+        except OSError as e:
+            self.log_device(f"✗ Could not save stage report: {e}")
+
+    def capture_flame_graph(self):
+        """Sample all thread stacks in the background, then write folded stacks"""
+        self.flame_button.config(state="disabled")
+        self.log_device(f"→ Sampling stacks for {FLAME_GRAPH_SECONDS} s...")
+
+        def _capture():
+            try:
+                path = write_folded(sample_stacks(FLAME_GRAPH_SECONDS))
+                self.log_device(f"✓ Flame graph stacks saved: {path}")
+            except OSError as e:
+                self.log_device(f"✗ Could not save flame graph: {e}")
+            finally:
+                self.root.after(0, lambda: self.flame_button.config(state="normal"))
+
+        threading.Thread(target=_capture, name="flame-sampler", daemon=True).start()
+
+    # === Sample Consumers (bus threads) ===
+    def _flush_recorder(self):
+        """Periodic flush, so an idle stream's buffered samples still reach disk"""
+        recorder = self.recorder
+        if recorder:
+            asyncio.run_coroutine_threadsafe(run_blocking(recorder.flush), self.loop)
+        self.root.after(RECORDER_FLUSH_MS, self._flush_recorder)
+
+    def _record_samples(self, batch):
+        recorder = self.recorder
+        if recorder:
+            for sample in batch:
+                recorder.append(sample.sensor_id, sample.t, sample.values)
+
+    def _analyse_samples(self, batch):
+        for sample in batch:
+            alerts = self.vibration.push(sample.values)
+            for axis, (lo, hi), energy in alerts:
+                self.log_device(f"⚠ Vibration {axis}: {lo:.1f}-{hi:.1f} Hz band energy {energy:.3g}")
+
+    def _log_samples(self, batch):
+        """Units bus consumer, values are already in engineering units"""
+        for sample in batch:
+            if sample.sensor_id == SENSOR_LSM6DSO:
+                accel_x, accel_y, accel_z, gyro_x, gyro_y, gyro_z = sample.values
+                text = (f"← LSM6DSO #{sample.seq}: Accel X={accel_x:+.3f} Y={accel_y:+.3f} Z={accel_z:+.3f} g | "
+                        f"Gyro X={gyro_x:+7.2f} Y={gyro_y:+7.2f} Z={gyro_z:+7.2f} dps")
+            elif sample.sensor_id == SENSOR_STTSH22H:
+                temp_celsius, = sample.values
+                text = f"← STT22H #{sample.seq}: Temperature: {temp_celsius:.2f} °C"
+            elif sample.sensor_id == SENSOR_STRAIN_GAUGE:
+                strain, = sample.values
+                unit, = self.units.units(SENSOR_STRAIN_GAUGE)
+                text = f"← StrainGauge #{sample.seq}: {strain:.1f} {unit}"
+            else:
+                continue
+            self.log_device(text)
+
+    def _log_bus_stats(self):
+        for st in self.bus.stats() + self.units_bus.stats():
+            if st.delivered or st.dropped:
+                self.log_device(
+                    f"Bus {st.name}: {st.delivered} delivered, {st.dropped} dropped, "
+                    f"queue peak {st.high_water}, max lag {st.max_lag * 1000:.0f} ms"
+                )
 
     # === Notification Handler ===
     def _notification_handler(self, sender, data: bytes):
         """Called when device sends notification"""
+        t_receive = PROFILER.start()
         try:
+            self.link.on_notification(len(data))
+
+            # Hot path: decode and publish, consumers do the rest on their own threads
+            if data and data[0] == NOTIF_SENSOR_DATA:
+                t0 = PROFILER.start()
+                decoded = decode_sensor_data(data)
+                PROFILER.stop("decode", t0)
+                if decoded:
+                    sensor_id, values = decoded
+                    self.link.on_sample(sensor_id)
+                    t0 = PROFILER.start()
+                    self.bus.publish(sensor_id, values)
+                    PROFILER.stop("dispatch", t0)
+                    return
+
             hex_data = ' '.join(f'{b:02X}' for b in data)
             text = f"← Received ({len(data)} bytes): {hex_data}"
 
@@ -912,50 +1530,6 @@ class SimpleBOLTController:
                     status_str = "STARTED" if status == SENSOR_START else "STOPPED"
                     text = f"← {sensor_name} {status_str} ✓"
 
-                elif data[0] == NOTIF_SENSOR_DATA:  # 0x20 - Actual sensor data
-                    sensor_id = data[1] if len(data) > 1 else 0
-    
-                    # Parse LSM6DSO data
-                    if sensor_id == SENSOR_LSM6DSO and len(data) >= 14:
-                        accel_x = struct.unpack('>h', data[2:4])[0]
-                        accel_y = struct.unpack('>h', data[4:6])[0]
-                        accel_z = struct.unpack('>h', data[6:8])[0]
-                        gyro_x = struct.unpack('>h', data[8:10])[0]
-                        gyro_y = struct.unpack('>h', data[10:12])[0]
-                        gyro_z = struct.unpack('>h', data[12:14])[0]
-        
-                        self.lsm6dso_count += 1
-        
-                        # Only log every 10th sample to reduce spam
-                        if self.lsm6dso_count % 10 == 0:
-                            text = f"← LSM6DSO #{self.lsm6dso_count}: Accel X={accel_x:5d} Y={accel_y:5d} Z={accel_z:5d} | Gyro X={gyro_x:5d} Y={gyro_y:5d} Z={gyro_z:5d}"
-                        else:
-                            return  # Skip logging for other samples
-    
-                    # Parse Temperature data
-                    elif sensor_id == SENSOR_STTSH22H and len(data) >= 4:
-                        temp_raw = struct.unpack('>h', data[2:4])[0]
-                        temp_celsius = temp_raw
-        
-                        self.sttsh22h_count += 1
-        
-                        # Only log every 10th sample to reduce spam
-                        if self.sttsh22h_count % 10 == 0:
-                            text = f"← STT22H #{self.sttsh22h_count}: Temperature: {temp_celsius:.2f} °C"
-                        else:
-                            return  # Skip logging for other samples
-    
-                    elif sensor_id == SENSOR_STRAIN_GAUGE and len(data) >= 4:
-                        raw_value = struct.unpack('>H', data[2:4])[0]
-    
-                        self.strain_gauge_count += 1
-    
-                        # Only log every 10th sample to reduce spam
-                        if self.strain_gauge_count % 10 == 0:
-                            text = f"← StrainGauge #{self.strain_gauge_count}: Raw Value: {raw_value}"
-                        else:
-                            return
-    
                 elif data[0] == NOTIF_VERSION_RESPONSE:
                     if len(data) >= 4:
                         major = data[1]
@@ -964,17 +1538,20 @@ class SimpleBOLTController:
                         version_str = f"{major}.{minor}.{patch}"
                         # Log and update UI immediately
                         self.log_device(f"← Firmware Version: {version_str}")
-                        self.root.after(0, lambda v=version_str: self.version_label.config(
-                            text=f"Firmware Version: {v}",
-                            foreground="black"
-                        ))
+                        client = self.client
+                        self.capture.set_tags(firmware=version_str)
+                        if client:
+                            self._load_calibration(client.address, version_str)
+                            # The cache file write stays off the BLE loop
+                            future = asyncio.ensure_future(
+                                run_blocking(self._remember_version, client.address, version_str, client.mtu_size)
+                            )
+                            future.add_done_callback(self._on_version_saved)
+                        self.ui_state.set(version=version_str)
                         # Calculate latency if ping started
                     if self.last_ping_start:
                         delta_ms = (time.time() - self.last_ping_start) * 1000
-                        self.root.after(0, lambda d=delta_ms: self.latency_label.config(
-                            text=f"Latency: {d:.0f} ms",
-                            foreground="black"
-                        ))
+                        self.ui_state.set(latency_ms=delta_ms)
                         self.last_ping_start = None  # Reset after calculation
                         # DO NOT continue to "unknown format" – we found what we wanted
                         return  # <-- Critical: stop processing this notification for logging
@@ -982,34 +1559,63 @@ class SimpleBOLTController:
                         self.log_device(f"← Version response too short: {' '.join(f'{b:02X}' for b in data)}")
                         return
                 elif data[0] == NOTIF_RSSI_RESPONSE:
-                    if len(data) >= 2:
-                        rssi = struct.unpack('b', data[1:2])[0]  # Signed byte for RSSI (e.g., -50 dBm)
-                        self.log_device(f"← RSSI: {rssi} dBm")
-                        self.root.after(0, lambda r=rssi: self.rssi_label.config(
-                        text=f"RSSI: {r} dBm",
-                        foreground="black" if r > -70 else "orange" if r > -90 else "red"  # Optional: color based on signal strength
-                    ))
+                    rssi = decode_rssi(data)  # Signed byte for RSSI (e.g., -50 dBm)
+                    self.link.on_rssi(rssi)
+                    if rssi is not None:
+                        # Periodic polls from the link manager only refresh the label
+                        if self.rssi_requested:
+                            self.log_device(f"← RSSI: {rssi} dBm")
+                        self.ui_state.set(rssi=rssi)
                     else:
-                        self.log_device(f"← RSSI response too short: {' '.join(f'{b:02X}' for b in data)}")
+                        self.log_device(f"← RSSI response invalid: {format_payload(data)}")
+                    self.rssi_requested = False
                     return  # Stop further processing
 
+                elif data[0] in (NOTIF_LINK_PARAM_RESPONSE, NOTIF_PHY_RESPONSE):
+                    what = "Link parameters" if data[0] == NOTIF_LINK_PARAM_RESPONSE else "PHY"
+                    status = data[1]
+                    if status == 0x00:
+                        text = f"← {what} request accepted ✓"
+                    else:
+                        self.link.on_error()
+                        text = f"← {what} request rejected (status 0x{status:02X})"
+
                 else:
                     text = f"← Received sensor data (unknown format): {hex_data}"
             
             self.log_device(text)
 
         except Exception as e:
+            self.link.on_error()
             self.log_device(f"✗ Notification parse error: {e}")
+        finally:
+            PROFILER.stop("receive", t_receive)
 
     def log_device(self, message: str):
         """Thread-safe log to text area"""
+        t_log = PROFILER.start()
         timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
-        def _update():
-            self.notify_text.config(state="normal")
-            self.notify_text.insert("end", f"[{timestamp}] {message}\n")
-            self.notify_text.see("end")
-            self.notify_text.config(state="disabled")
-        self.root.after(0, _update)
+        # One pending after() for all queued lines instead of a closure per message
+        with self._log_lock:
+            self._log_pending.append(f"[{timestamp}] {message}\n")
+            schedule = len(self._log_pending) == 1
+        if schedule:
+            self.root.after(0, self._flush_log)
+        PROFILER.stop("log", t_log)
+
+    def _flush_log(self):
+        t0 = PROFILER.start()
+        with self._log_lock:
+            lines, self._log_pending = self._log_pending, []
+        self.notify_text.config(state="normal")
+        self.notify_text.insert("end", "".join(lines))
+        # Keep the widget bounded for shift-long runs
+        excess = int(self.notify_text.index("end-1c").split(".")[0]) - LOG_MAX_LINES
+        if excess > 0:
+            self.notify_text.delete("1.0", f"{excess + 1}.0")
+        self.notify_text.see("end")
+        self.notify_text.config(state="disabled")
+        PROFILER.stop("ui_apply", t0)
 
 
 def main():
@@ -1026,7 +1632,22 @@ def main():
             except:
                 pass
         
+        future = asyncio.run_coroutine_threadsafe(app.stream_server.stop(), app.loop)
+        try:
+            future.result(timeout=2.0)
+        except Exception as e:
+            app.log_device(f"⚠ Stream server did not stop cleanly: {e!r}")
+
         # Stop event loop
+        app.watchdog.stop()
+        app.simulation.stop()
+        app.soak.stop()
+        app.capture.flush()
+        app._close_recorder()
+        app.bus.close()
+        app.units_bus.close()
+        if app.shm:
+            app.shm.close()
         app.loop.call_soon_threadsafe(app.loop.stop)
         root.destroy()
 
@@ -0,0 +1,213 @@
+"""
+Fan-out bus between the BLE decoder and everything that consumes samples.
+
+The notification handler only decodes and calls SampleBus.publish(); each
+consumer (GUI log, recorder, vibration analytics, network export) has its
+own bounded queue drained by its own thread, so a slow consumer only
+backs up its own queue. What happens when a queue is full is chosen per
+consumer:
+
+    block        publisher waits for room, nothing is ever lost (recorder)
+    drop-oldest  oldest queued sample is discarded (analytics, export)
+    every-nth    only every Nth sample per sensor is queued, then drop-oldest (GUI)
+
+Samples carry a per-sensor sequence number so consumers that skip samples
+can still show how many were received.
+"""
+import threading
+import time
+from collections import deque, namedtuple
+
+POLICY_BLOCK = "block"
+POLICY_DROP_OLDEST = "drop-oldest"
+POLICY_EVERY_NTH = "every-nth"
+
+DEFAULT_QUEUE_SIZE = 1024
+MAX_BATCH = 256
+
+Sample = namedtuple("Sample", "t sensor_id seq values")
+
+SubscriberStats = namedtuple("SubscriberStats", "name policy queued high_water delivered dropped lag max_lag errors")
+
+
+class Subscriber:
+    """One consumer: bounded queue, drop policy and the thread that feeds callback(batch)"""
+
+    def __init__(self, name, callback, maxsize=DEFAULT_QUEUE_SIZE, policy=POLICY_DROP_OLDEST,
+                 every=1, sensors=None, on_error=None):
+        if policy not in (POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_EVERY_NTH):
+            raise ValueError(f"unknown policy {policy!r}")
+        self.name = name
+        self.callback = callback
+        self.maxsize = maxsize
+        self.policy = policy
+        self.every = max(1, int(every))
+        self.sensors = set(sensors) if sensors is not None else None
+        self.on_error = on_error
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._busy = False
+        self._closed = False
+
+        self.high_water = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+
+        self._thread = threading.Thread(target=self._run, name=f"bus-{name}", daemon=True)
+        self._thread.start()
+
+    def offer(self, sample):
+        """Queue a sample according to the policy, called on the publishing thread"""
+        if self.sensors is not None and sample.sensor_id not in self.sensors:
+            return
+        if self.policy == POLICY_EVERY_NTH and sample.seq % self.every:
+            return
+        with self._cond:
+            if self._closed:
+                return
+            if len(self._queue) >= self.maxsize:
+                if self.policy == POLICY_BLOCK:
+                    while len(self._queue) >= self.maxsize and not self._closed:
+                        self._cond.wait()
+                    if self._closed:
+                        return
+                else:
+                    self._queue.popleft()
+                    self.dropped += 1
+            self._queue.append(sample)
+            self.high_water = max(self.high_water, len(self._queue))
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                n = min(len(self._queue), MAX_BATCH)
+                batch = [self._queue.popleft() for _ in range(n)]
+                self._busy = True
+                # Room for a blocked publisher
+                self._cond.notify_all()
+
+            try:
+                self.callback(batch)
+            except Exception as e:
+                self.errors += 1
+                if self.on_error:
+                    self.on_error(self.name, e)
+
+            lag = time.time() - batch[-1].t
+            with self._cond:
+                self._busy = False
+                self.delivered += len(batch)
+                self.lag = lag
+                self.max_lag = max(self.max_lag, lag)
+                self._cond.notify_all()
+
+    def drain(self, timeout=None):
+        """Wait until everything queued so far has been handled, returns False on timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._queue or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self):
+        """Stop accepting samples; what is already queued is still delivered"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+
+    def stats(self):
+        with self._cond:
+            return SubscriberStats(
+                name=self.name,
+                policy=self.policy,
+                queued=len(self._queue),
+                high_water=self.high_water,
+                delivered=self.delivered,
+                dropped=self.dropped,
+                lag=self.lag,
+                max_lag=self.max_lag,
+                errors=self.errors,
+            )
+
+
+class SampleBus:
+    def __init__(self, on_error=None):
+        self.on_error = on_error
+        self._subscribers = {}
+        self._seq = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, name, callback, **options):
+        """Add a consumer; options are Subscriber's maxsize, policy, every and sensors"""
+        options.setdefault("on_error", self.on_error)
+        subscriber = Subscriber(name, callback, **options)
+        with self._lock:
+            old = self._subscribers.pop(name, None)
+            self._subscribers[name] = subscriber
+        if old:
+            old.close()
+        return subscriber
+
+    def unsubscribe(self, name):
+        with self._lock:
+            subscriber = self._subscribers.pop(name, None)
+        if subscriber:
+            subscriber.close()
+
+    def publish(self, sensor_id, values, t=None):
+        """Hand one decoded sample to every consumer, returns the Sample"""
+        with self._lock:
+            seq = self._seq.get(sensor_id, 0) + 1
+            self._seq[sensor_id] = seq
+            subscribers = list(self._subscribers.values())
+        sample = Sample(time.time() if t is None else t, sensor_id, seq, values)
+        for subscriber in subscribers:
+            subscriber.offer(sample)
+        return sample
+
+    def forward(self, samples):
+        """Hand already numbered samples (e.g. converted by another consumer) to every consumer"""
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for subscriber in subscribers:
+            for sample in samples:
+                subscriber.offer(sample)
+
+    def reset_counts(self):
+        with self._lock:
+            self._seq.clear()
+
+    def drain(self, name=None, timeout=None):
+        """Wait for one consumer (or all of them) to catch up"""
+        with self._lock:
+            if name:
+                targets = [self._subscribers[name]] if name in self._subscribers else []
+            else:
+                targets = list(self._subscribers.values())
+        return all(subscriber.drain(timeout) for subscriber in targets)
+
+    def stats(self):
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        return [subscriber.stats() for subscriber in subscribers]
+
+    def close(self):
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+            self._subscribers.clear()
+        for subscriber in subscribers:
+            subscriber.close()
@@ -0,0 +1,316 @@
+"""
+Sensor calibration and unit conversion.
+
+Each channel converts as  eng = (raw - offset) * scale  per value column:
+
+    lsm6dso  accel in g, gyro in dps; scale = full-scale sensitivity * gain
+    stt22h   °C; the firmware already sends whole degrees (int16)
+    strain   µε once the span step has run (counts before), minus
+             temp_coeff * (T - temp_ref) with T the latest device temperature
+
+Profiles live in ~/ScrewSystem/calibration.json keyed by device address,
+then firmware version, with "*" for any firmware:
+
+    {"<address>": {"*": {<channel>: {...}}, "1.2.0": {<channel>: {...}}}}
+
+A profile is the defaults overlaid with the device's "*" entry and then its
+firmware entry, channel by channel. UnitConverter compiles it into offset /
+scale arrays and converts whole bus batches per sensor in one NumPy step.
+Recordings stay in raw counts; the profile used is stored in the session
+meta.json.
+
+CalibrationRoutine walks through the guided steps in STEPS: collect raw
+samples for a while, then derive offsets / gains / the strain temperature
+coefficient from them.
+"""
+import copy
+import json
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+
+from bolt_bus import Sample
+from bolt_protocol import SENSOR_LSM6DSO, SENSOR_STTSH22H, SENSOR_STRAIN_GAUGE, SENSOR_NAMES
+
+DEFAULT_CALIBRATION_FILE = os.path.join(os.path.expanduser("~"), "ScrewSystem", "calibration.json")
+ANY_FIRMWARE = "*"
+
+# LSM6DSO sensitivity per full-scale setting (datasheet): mg/LSB and mdps/LSB
+ACCEL_SENSITIVITY_MG = {2: 0.061, 4: 0.122, 8: 0.244, 16: 0.488}
+GYRO_SENSITIVITY_MDPS = {125: 4.375, 250: 8.75, 500: 17.5, 1000: 35.0, 2000: 70.0}
+
+# Firmware settings: CTRL1_XL = 0x48 (FS_XL = 10, ±4 g), CTRL2_G = 0x50 (FS_G = 00, ±250 dps)
+FIRMWARE_ACCEL_FS_G = 4
+FIRMWARE_GYRO_FS_DPS = 250
+# The STTS22H driver scales 0.01 °C/LSB and main.c sends the result truncated to int16
+STTS22H_C_PER_LSB = 1.0
+
+DEFAULT_PROFILE = {
+    "lsm6dso": {"accel_fs_g": FIRMWARE_ACCEL_FS_G, "gyro_fs_dps": FIRMWARE_GYRO_FS_DPS,
+                "offset": [0.0] * 6, "gain": [1.0] * 6},
+    "stt22h": {"offset": 0.0, "gain": STTS22H_C_PER_LSB},
+    "strain": {"offset": 0.0, "gain": 1.0, "unit": "counts", "temp_coeff": 0.0, "temp_ref": 25.0},
+}
+
+UNITS = {
+    SENSOR_LSM6DSO: ("g", "g", "g", "dps", "dps", "dps"),
+    SENSOR_STTSH22H: ("°C",),
+}
+
+
+def resolve_profile(entries, firmware=None):
+    """Defaults overlaid with the "*" entry and the firmware entry of one device"""
+    profile = copy.deepcopy(DEFAULT_PROFILE)
+    for key in (ANY_FIRMWARE, firmware):
+        entry = entries.get(key) if key else None
+        for channel, params in (entry or {}).items():
+            if channel in profile and isinstance(params, dict):
+                profile[channel].update(params)
+            elif channel == "calibrated":
+                profile[channel] = params
+    return profile
+
+
+def _compile(profile):
+    """sensor_id -> (offset array, scale array)"""
+    imu = profile["lsm6dso"]
+    sensitivity = ([ACCEL_SENSITIVITY_MG[imu["accel_fs_g"]] / 1000.0] * 3
+                   + [GYRO_SENSITIVITY_MDPS[imu["gyro_fs_dps"]] / 1000.0] * 3)
+    compiled = {SENSOR_LSM6DSO: (np.array(imu["offset"], dtype=float),
+                                 np.array(sensitivity) * np.array(imu["gain"], dtype=float))}
+    for sensor_id, channel in ((SENSOR_STTSH22H, "stt22h"), (SENSOR_STRAIN_GAUGE, "strain")):
+        params = profile[channel]
+        compiled[sensor_id] = (np.array([params["offset"]], dtype=float), np.array([params["gain"]], dtype=float))
+    return compiled
+
+
+class CalibrationStore:
+    """All device profiles in one JSON file, same layout rules as the GATT cache"""
+
+    def __init__(self, path=DEFAULT_CALIBRATION_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self._devices = json.load(f)
+        except (OSError, ValueError):
+            self._devices = {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._devices, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def profile(self, address, firmware=None):
+        with self._lock:
+            return resolve_profile(self._devices.get(address) or {}, firmware)
+
+    def save(self, address, profile, firmware=None):
+        """Store a full profile for address (and firmware, "*" for any)"""
+        with self._lock:
+            entry = self._devices.setdefault(address, {})
+            entry[firmware or ANY_FIRMWARE] = dict(profile, calibrated=datetime.now().isoformat(timespec="seconds"))
+            self._save()
+
+
+class UnitConverter:
+    """
+    Bus consumer converting raw batches to engineering units and handing
+    them to `forward` (SampleBus.forward of the units bus).
+    """
+
+    def __init__(self, store, forward=None):
+        self.store = store
+        self.forward = forward
+        self.address = None
+        self.firmware = None
+        self.profile = copy.deepcopy(DEFAULT_PROFILE)
+        self._compiled = _compile(self.profile)
+        self._temp = None  # (t, °C) of the last temperature sample
+
+    def set_device(self, address, firmware=None):
+        """Load the profile of the connected device; the compiled arrays are swapped in one go"""
+        profile = self.store.profile(address, firmware) if address else copy.deepcopy(DEFAULT_PROFILE)
+        compiled = _compile(profile)
+        self.address, self.firmware = address, firmware
+        self.profile, self._compiled = profile, compiled
+        self._temp = None
+
+    def units(self, sensor_id):
+        if sensor_id == SENSOR_STRAIN_GAUGE:
+            return (self.profile["strain"].get("unit", "counts"),)
+        return UNITS.get(sensor_id, ())
+
+    def convert(self, sensor_id, t, raw):
+        """raw [n, fields] -> float64 [n, fields] in engineering units"""
+        offset, scale = self._compiled[sensor_id]
+        eng = (np.asarray(raw, dtype=np.float64) - offset) * scale
+        if sensor_id == SENSOR_STTSH22H and len(eng):
+            self._temp = (t[-1], eng[-1, 0])
+        elif sensor_id == SENSOR_STRAIN_GAUGE:
+            strain = self.profile["strain"]
+            if strain["temp_coeff"] and self._temp is not None:
+                eng[:, 0] -= strain["temp_coeff"] * (self._temp[1] - strain["temp_ref"])
+        return eng
+
+    def push(self, batch):
+        """Convert a bus batch per sensor; temperatures first so strain uses the newest one"""
+        by_sensor = {}
+        for sample in batch:
+            if sample.sensor_id in self._compiled:
+                by_sensor.setdefault(sample.sensor_id, []).append(sample)
+
+        converted = []
+        for sensor_id in sorted(by_sensor, key=lambda s: s != SENSOR_STTSH22H):
+            group = by_sensor[sensor_id]
+            t = np.array([s.t for s in group])
+            eng = self.convert(sensor_id, t, [s.values for s in group])
+            converted += [Sample(s.t, s.sensor_id, s.seq, tuple(row)) for s, row in zip(group, eng.tolist())]
+        if converted and self.forward:
+            converted.sort(key=lambda s: s.t)
+            self.forward(converted)
+
+
+# --- guided calibration ---
+Step = namedtuple("Step", "key title prompt sensors seconds reference")
+
+STEPS = (
+    Step("imu-level", "Level IMU",
+         "Place the bolt flat and still with the Z axis up.",
+         (SENSOR_LSM6DSO,), 5, None),
+    Step("temp-reference", "Temperature",
+         "Hold a reference thermometer next to the bolt and enter its reading.",
+         (SENSOR_STTSH22H,), 5, "°C"),
+    Step("strain-zero", "Strain zero",
+         "Remove all load from the bolt.",
+         (SENSOR_STRAIN_GAUGE, SENSOR_STTSH22H), 5, None),
+    Step("strain-span", "Strain span",
+         "Apply the reference load and enter its strain.",
+         (SENSOR_STRAIN_GAUGE,), 5, "µε"),
+    Step("strain-drift", "Strain temperature drift",
+         "Leave the bolt unloaded while its temperature changes by a few °C, then stop (optional).",
+         (SENSOR_STRAIN_GAUGE, SENSOR_STTSH22H), None, None),
+)
+
+MIN_STEP_SAMPLES = 5
+MIN_DRIFT_SPAN_C = 2.0
+
+
+class CalibrationRoutine:
+    """
+    One pass through STEPS for a device. begin() starts collecting for the
+    current step, collect() is a bus consumer, finish() derives the step's
+    parameters into self.profile and advances. Steps can be skipped.
+    """
+
+    def __init__(self, profile):
+        self.profile = copy.deepcopy(profile)
+        self.index = 0
+        self.results = []
+        self.collecting = False
+        self.reference = None
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    @property
+    def step(self):
+        return STEPS[self.index] if self.index < len(STEPS) else None
+
+    @property
+    def done(self):
+        return self.step is None
+
+    def begin(self, reference=None):
+        step = self.step
+        if step.reference and reference is None:
+            raise ValueError(f"{step.title}: enter the reference value in {step.reference}")
+        with self._lock:
+            self.reference = reference
+            self._samples = {sensor_id: [] for sensor_id in step.sensors}
+            self.collecting = True
+
+    def collect(self, batch):
+        with self._lock:
+            if not self.collecting:
+                return
+            for sample in batch:
+                samples = self._samples.get(sample.sensor_id)
+                if samples is not None:
+                    samples.append((sample.t, *sample.values))
+
+    def skip(self):
+        with self._lock:
+            self.collecting = False
+        self.results.append(f"{self.step.title}: skipped")
+        self.index += 1
+
+    def finish(self):
+        """Derive the step's parameters; ValueError leaves the step current for a retry"""
+        with self._lock:
+            self.collecting = False
+            data = {sensor_id: np.array(rows, dtype=float) for sensor_id, rows in self._samples.items()}
+        step = self.step
+        for sensor_id, rows in data.items():
+            if len(rows) < MIN_STEP_SAMPLES:
+                raise ValueError(f"{step.title}: only {len(rows)} {SENSOR_NAMES[sensor_id]} samples, "
+                                 f"start the sensor and repeat")
+        result = getattr(self, "_" + step.key.replace("-", "_"))(data)
+        self.results.append(f"{step.title}: {result}")
+        self.index += 1
+        return result
+
+    def _temperature(self, rows):
+        params = self.profile["stt22h"]
+        return (rows[:, 1] - params["offset"]) * params["gain"]
+
+    def _imu_level(self, data):
+        rows = data[SENSOR_LSM6DSO][:, 1:]
+        imu = self.profile["lsm6dso"]
+        noise = rows.std(axis=0)
+        offset = rows.mean(axis=0)
+        one_g = 1000.0 / ACCEL_SENSITIVITY_MG[imu["accel_fs_g"]] / imu["gain"][2]
+        offset[2] -= one_g
+        if abs(rows[:, 2].mean() - one_g) > 0.2 * one_g:
+            raise ValueError("Level IMU: Z axis does not read about 1 g, check the orientation")
+        imu["offset"] = offset.round(1).tolist()
+        return f"offsets {', '.join(f'{v:.0f}' for v in offset)} counts (noise {noise.max():.1f})"
+
+    def _temp_reference(self, data):
+        params = self.profile["stt22h"]
+        raw = data[SENSOR_STTSH22H][:, 1].mean()
+        params["offset"] = round(float(raw - self.reference / params["gain"]), 2)
+        return f"offset {params['offset']:+.1f} counts"
+
+    def _strain_zero(self, data):
+        params = self.profile["strain"]
+        params["offset"] = round(float(data[SENSOR_STRAIN_GAUGE][:, 1].mean()), 2)
+        params["temp_ref"] = round(float(self._temperature(data[SENSOR_STTSH22H]).mean()), 2)
+        return f"zero {params['offset']:.1f} counts at {params['temp_ref']:.1f} °C"
+
+    def _strain_span(self, data):
+        params = self.profile["strain"]
+        counts = data[SENSOR_STRAIN_GAUGE][:, 1].mean() - params["offset"]
+        if abs(counts) < 1.0:
+            raise ValueError("Strain span: no change from zero, apply the reference load")
+        params["gain"] = float(self.reference / counts)
+        params["unit"] = "µε"
+        return f"{params['gain']:.5g} µε/count"
+
+    def _strain_drift(self, data):
+        params = self.profile["strain"]
+        strain, temp = data[SENSOR_STRAIN_GAUGE], data[SENSOR_STTSH22H]
+        # Temperature at every strain sample
+        t_c = np.interp(strain[:, 0], temp[:, 0], self._temperature(temp))
+        if np.ptp(t_c) < MIN_DRIFT_SPAN_C:
+            raise ValueError(f"Strain drift: temperature only changed {np.ptp(t_c):.1f} °C, "
+                             f"need {MIN_DRIFT_SPAN_C:.0f}")
+        eng = (strain[:, 1] - params["offset"]) * params["gain"]
+        slope = np.polyfit(t_c, eng, 1)[0]
+        params["temp_coeff"] = round(float(slope), 4)
+        return f"{slope:+.3g} {params.get('unit', 'counts')}/°C"
+
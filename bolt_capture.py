@@ -0,0 +1,255 @@
+"""
+Trigger-based capture: keep a rolling pre-trigger buffer of the decoded
+streams and persist only the window around each event.
+
+Every sensor keeps the last `pre_ms` of samples in memory. When a trigger
+fires (a sensor threshold, a manual button press or an external request
+via the stream server) a capture is opened with the buffered samples from
+t - pre_ms and collects samples until t + post_ms. It is then written as
+its own session in a TimeSeriesStore (default ~/ScrewSystem/captures), so
+the usual readers and reports work on captures too. meta.json of a capture
+holds the trigger, its time, the window and the device/firmware tags.
+
+Triggers that fire while a capture is open are added to its trigger list
+instead of starting a new one.
+
+The triggers and window live in ~/ScrewSystem/capture_triggers.json, written
+with the app defaults on first use; every entry holds the Trigger fields:
+
+    {"pre_ms": 2000, "post_ms": 3000,
+     "triggers": [{"name": "strain", "sensor_id": 3, "field": 0, "level": 3000, "mode": "above"}]}
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime
+
+from bolt_protocol import SENSOR_NAMES, SENSOR_ALL
+
+DEFAULT_CAPTURE_DIR = os.path.join(os.path.expanduser("~"), "ScrewSystem", "captures")
+DEFAULT_TRIGGER_FILE = os.path.join(os.path.expanduser("~"), "ScrewSystem", "capture_triggers.json")
+DEFAULT_PRE_MS = 2000
+DEFAULT_POST_MS = 3000
+
+# mode: "above" / "below" fire when the value crosses level, "delta" when it
+# jumps by more than level between two samples. field is a value index or
+# "magnitude" (norm of the first three values, e.g. LSM6DSO acceleration).
+Trigger = namedtuple("Trigger", "name sensor_id field level mode")
+TRIGGER_MODES = ("above", "below", "delta")
+
+
+def _check_trigger(trigger):
+    if trigger.mode not in TRIGGER_MODES:
+        raise ValueError(f"trigger {trigger.name}: unknown mode {trigger.mode!r}")
+    if trigger.sensor_id not in SENSOR_NAMES or trigger.sensor_id == SENSOR_ALL:
+        raise ValueError(f"trigger {trigger.name}: unknown sensor_id {trigger.sensor_id!r}")
+    if trigger.field != "magnitude" and not isinstance(trigger.field, int):
+        raise ValueError(f"trigger {trigger.name}: field must be a value index or \"magnitude\"")
+    if not isinstance(trigger.level, (int, float)):
+        raise ValueError(f"trigger {trigger.name}: level must be a number")
+
+
+def load_capture_config(path=DEFAULT_TRIGGER_FILE, triggers=(), pre_ms=DEFAULT_PRE_MS, post_ms=DEFAULT_POST_MS):
+    """
+    (triggers, pre_ms, post_ms) from the JSON file at `path`. A missing file is
+    created from the given defaults so it can be edited. ValueError on bad content.
+    """
+    try:
+        with open(path) as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        config = {"pre_ms": pre_ms, "post_ms": post_ms, "triggers": [t._asdict() for t in triggers]}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(config, f, indent=2)
+    if not isinstance(config, dict):
+        raise ValueError("expected a JSON object")
+
+    try:
+        loaded = [Trigger(**entry) for entry in config.get("triggers", [])]
+    except TypeError as e:
+        raise ValueError(f"bad trigger entry: {e}") from None
+    for trigger in loaded:
+        _check_trigger(trigger)
+    pre_ms = config.get("pre_ms", pre_ms)
+    post_ms = config.get("post_ms", post_ms)
+    if not all(isinstance(ms, (int, float)) and ms >= 0 for ms in (pre_ms, post_ms)):
+        raise ValueError("pre_ms and post_ms must be non-negative numbers")
+    return loaded, pre_ms, post_ms
+
+
+class _Capture:
+    def __init__(self, trigger, t, pre_ms, post_ms, samples):
+        self.trigger = trigger
+        self.t = t
+        self.end = t + post_ms / 1000.0
+        self.triggers = [(trigger, t)]
+        self.samples = samples
+
+
+class CaptureManager:
+    """
+    push() is a SampleBus consumer; fire() may be called from any thread.
+    Capture files are written on the consumer thread (or the expiry timer)
+    outside the lock.
+    """
+
+    def __init__(self, store, triggers=(), pre_ms=DEFAULT_PRE_MS, post_ms=DEFAULT_POST_MS,
+                 log=print, on_capture=None):
+        self.store = store
+        self.log = log
+        self.on_capture = on_capture
+
+        self.enabled = False
+        self.count = 0
+        self.tags = {}
+        self._buffers = {}
+        self._active = None
+        self._lock = threading.Lock()
+        self.configure(triggers, pre_ms, post_ms)
+
+    def configure(self, triggers, pre_ms=DEFAULT_PRE_MS, post_ms=DEFAULT_POST_MS):
+        """Replace the triggers and window, e.g. after editing the trigger file"""
+        for trigger in triggers:
+            _check_trigger(trigger)
+        with self._lock:
+            self.triggers = list(triggers)
+            self.pre_ms = pre_ms
+            self.post_ms = post_ms
+            self._last = {}
+            self._armed = {trigger.name: True for trigger in self.triggers}
+
+    def set_tags(self, **tags):
+        """Device / firmware tags stored with every following capture"""
+        with self._lock:
+            self.tags.update(tags)
+
+    def enable(self, on=True):
+        with self._lock:
+            self.enabled = on
+            if not on:
+                self._buffers.clear()
+                self._last.clear()
+
+    # --- sample path ---
+    def push(self, batch):
+        done = []
+        with self._lock:
+            if not self.enabled:
+                return
+            horizon = self.pre_ms / 1000.0
+            for sample in batch:
+                buf = self._buffers.get(sample.sensor_id)
+                if buf is None:
+                    buf = self._buffers[sample.sensor_id] = deque()
+                buf.append(sample)
+                while buf[0].t < sample.t - horizon:
+                    buf.popleft()
+
+                active = self._active
+                if active:
+                    if sample.t > active.end:
+                        done.append(active)
+                        self._active = None
+                    else:
+                        active.samples.append(sample)
+
+                for trigger in self.triggers:
+                    if trigger.sensor_id == sample.sensor_id and self._check(trigger, sample):
+                        self._start(trigger.name, sample.t)
+        for capture in done:
+            self._persist(capture)
+
+    def _value(self, trigger, values):
+        if trigger.field == "magnitude":
+            return math.sqrt(sum(v * v for v in values[:3]))
+        return values[trigger.field]
+
+    def _check(self, trigger, sample):
+        """Edge detection with re-arming once the condition clears"""
+        value = self._value(trigger, sample.values)
+        if trigger.mode == "above":
+            hit = value > trigger.level
+        elif trigger.mode == "below":
+            hit = value < trigger.level
+        else:
+            last = self._last.get(trigger.name)
+            self._last[trigger.name] = value
+            hit = last is not None and abs(value - last) > trigger.level
+
+        fired = hit and self._armed[trigger.name]
+        self._armed[trigger.name] = not hit
+        return fired
+
+    def _start(self, name, t):
+        """Open a capture at t (lock held), or note the trigger on the open one"""
+        if self._active:
+            self._active.triggers.append((name, t))
+            return
+        since = t - self.pre_ms / 1000.0
+        samples = [s for buf in self._buffers.values() for s in buf if s.t >= since]
+        capture = self._active = _Capture(name, t, self.pre_ms, self.post_ms, samples)
+
+        # Finish even if the streams stop before the post window is full
+        timer = threading.Timer(self.post_ms / 1000.0 + 1.0, self._expire, args=(capture,))
+        timer.daemon = True
+        timer.start()
+        self.log(f"⚠ Capture triggered: {name}")
+
+    def fire(self, name="manual"):
+        """Manual or external trigger at the current time"""
+        with self._lock:
+            if not self.enabled:
+                return False
+            self._start(name, time.time())
+            return True
+
+    def _expire(self, capture):
+        with self._lock:
+            if self._active is not capture:
+                return
+            self._active = None
+        self._persist(capture)
+
+    def flush(self):
+        """Write the open capture now, e.g. on disconnect"""
+        with self._lock:
+            capture, self._active = self._active, None
+        if capture:
+            self._persist(capture)
+
+    # --- persistence ---
+    def _persist(self, capture):
+        with self._lock:
+            tags = dict(self.tags)
+        device = tags.pop("device", None) or "unknown"
+        stamp = datetime.fromtimestamp(capture.t).strftime("%Y%m%d-%H%M%S-%f")[:-3]
+        try:
+            writer = self.store.open_session(
+                device,
+                session=f"{stamp}-{capture.trigger}",
+                kind="capture",
+                trigger=capture.trigger,
+                t_trigger=capture.t,
+                triggers=[{"name": name, "t": t} for name, t in capture.triggers],
+                pre_ms=self.pre_ms,
+                post_ms=self.post_ms,
+                **tags,
+            )
+            counts = {}
+            for sample in sorted(capture.samples, key=lambda s: s.t):
+                writer.append(sample.sensor_id, sample.t, sample.values)
+                counts[sample.sensor_id] = counts.get(sample.sensor_id, 0) + 1
+            writer.close()
+        except (OSError, ValueError) as e:
+            self.log(f"✗ Could not save capture {capture.trigger}: {e}")
+            return
+
+        self.count += 1
+        summary = ", ".join(f"{SENSOR_NAMES.get(k, k)} {n}" for k, n in sorted(counts.items()))
+        self.log(f"✓ Capture saved: {writer.path} ({summary or 'no samples'})")
+        if self.on_capture:
+            self.on_capture(capture.trigger, writer.path)
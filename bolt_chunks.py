@@ -0,0 +1,299 @@
+"""
+Compressed, chunk-indexed sample files (.bch) for raw recordings.
+
+Samples are buffered into chunks of `chunk_samples` rows. A chunk is
+written when it is full or once it spans `max_chunk_age` seconds, so a
+crash loses at most that much of a slow stream. Each chunk
+is delta encoded column by column (timestamps as int64 microseconds, values
+as int32 raw sensor counts), compressed with zlib or lzma on a background
+thread and appended to the file. Closing the writer appends a chunk index
+so readers can seek to a time window and decompress only the chunks that
+overlap it.
+
+Layout, little endian:
+
+    file header (16 bytes)
+      0   8s   magic          b"BOLTCHK1"
+      8   u2   version        FORMAT_VERSION
+     10   u1   codec          0 none, 1 zlib, 2 lzma
+     11   u1   n_fields       value columns per sample
+     12   u4   chunk_samples  rows per full chunk
+
+    chunk (CHUNK_HEADER + payload), repeated
+      0   4s   magic          b"CHNK"
+      4   u4   count          rows in this chunk
+      8   u4   payload_len    compressed bytes that follow
+     12   u4   crc32          of the compressed payload
+     16   f8   t_first
+     24   f8   t_last
+     payload: compress(delta(t_us) as i8[count] + delta(values) as i4[count, n_fields])
+              deltas run down each column, the first row holds absolute values
+
+    index (written by close())
+      n x (f8 t_first, f8 t_last, u8 offset, u4 count)
+    footer (16 bytes)
+      0   4s   magic          b"CIDX"
+      4   u4   n_chunks
+      8   u8   index_offset
+
+A file without footer (crash, still recording) is indexed by walking the
+chunk headers, which only reads 32 bytes per chunk.
+"""
+import lzma
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+FORMAT_VERSION = 1
+DEFAULT_CHUNK_SAMPLES = 4096
+DEFAULT_MAX_CHUNK_AGE = 30.0   # seconds of samples held in memory at most
+
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+CODEC_LZMA = 2
+CODECS = {"none": CODEC_NONE, "zlib": CODEC_ZLIB, "lzma": CODEC_LZMA}
+
+FILE_HEADER = struct.Struct("<8sHBBI")
+CHUNK_HEADER = struct.Struct("<4sIIIdd")
+INDEX_ENTRY = struct.Struct("<ddQI")
+FOOTER = struct.Struct("<4sIQ")
+
+FILE_MAGIC = b"BOLTCHK1"
+CHUNK_MAGIC = b"CHNK"
+INDEX_MAGIC = b"CIDX"
+
+
+def _compress(codec, data):
+    if codec == CODEC_ZLIB:
+        return zlib.compress(data, 6)
+    if codec == CODEC_LZMA:
+        return lzma.compress(data, preset=6)
+    return data
+
+
+def _decompress(codec, data):
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_LZMA:
+        return lzma.decompress(data)
+    return data
+
+
+def encode_chunk(t, values, codec):
+    """t float seconds [n], values [n, n_fields] -> compressed payload"""
+    t_us = np.rint(np.asarray(t, dtype=np.float64) * 1e6).astype("<i8")
+    v = np.rint(np.asarray(values, dtype=np.float64)).astype("<i4")
+    t_delta = np.diff(t_us, prepend=np.int64(0))
+    v_delta = np.diff(v, axis=0, prepend=np.zeros((1, v.shape[1]), dtype="<i4"))
+    return _compress(codec, t_delta.tobytes() + np.ascontiguousarray(v_delta).tobytes())
+
+
+def decode_chunk(payload, count, n_fields, codec):
+    """Inverse of encode_chunk: (t float64 [n], values int32 [n, n_fields])"""
+    data = _decompress(codec, payload)
+    t_us = np.cumsum(np.frombuffer(data, dtype="<i8", count=count))
+    v = np.cumsum(
+        np.frombuffer(data, dtype="<i4", offset=8 * count, count=count * n_fields).reshape(count, n_fields),
+        axis=0, dtype="<i4",
+    )
+    return t_us / 1e6, v
+
+
+class ChunkCompressor:
+    """Background thread compressing and writing full chunks for any number of writers"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="chunk-compressor", daemon=True)
+        self._thread.start()
+
+    def submit(self, writer, t, values):
+        self._queue.put((writer, t, values))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                writer, t, values = item
+                writer._write_chunk(t, values)
+            except Exception as e:
+                item[0].error = e
+            finally:
+                self._queue.task_done()
+
+    def wait(self):
+        """Block until every submitted chunk is on disk"""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+
+class ChunkWriter:
+    """Append-only .bch writer; append() only copies into the open chunk"""
+
+    def __init__(self, path, n_fields, codec="zlib", chunk_samples=DEFAULT_CHUNK_SAMPLES, compressor=None,
+                 max_chunk_age=DEFAULT_MAX_CHUNK_AGE):
+        self.path = path
+        self.n_fields = n_fields
+        self.codec = CODECS[codec]
+        self.chunk_samples = chunk_samples
+        self.max_chunk_age = max_chunk_age
+        self.compressor = compressor
+        self.error = None
+
+        self._f = open(path, "wb")
+        self._f.write(FILE_HEADER.pack(FILE_MAGIC, FORMAT_VERSION, self.codec, n_fields, chunk_samples))
+        self._index = []
+        self._file_lock = threading.Lock()
+        self._new_chunk()
+
+    def _new_chunk(self):
+        self._t = np.empty(self.chunk_samples, dtype=np.float64)
+        self._values = np.empty((self.chunk_samples, self.n_fields), dtype=np.float64)
+        self._n = 0
+
+    def append(self, t, values):
+        self._t[self._n] = t
+        self._values[self._n] = values
+        self._n += 1
+        if self._n == self.chunk_samples or t - self._t[0] >= self.max_chunk_age:
+            self._submit()
+
+    def _submit(self):
+        if not self._n:
+            return
+        t, values = self._t[:self._n], self._values[:self._n]
+        self._new_chunk()
+        if self.compressor:
+            self.compressor.submit(self, t, values)
+        else:
+            self._write_chunk(t, values)
+
+    def _write_chunk(self, t, values):
+        payload = encode_chunk(t, values, self.codec)
+        with self._file_lock:
+            offset = self._f.tell()
+            self._f.write(CHUNK_HEADER.pack(
+                CHUNK_MAGIC, len(t), len(payload), zlib.crc32(payload), float(t[0]), float(t[-1])
+            ))
+            self._f.write(payload)
+            self._f.flush()
+            self._index.append((float(t[0]), float(t[-1]), offset, len(t)))
+
+    def flush(self):
+        """Flush the file, writing the open chunk too once it is max_chunk_age old"""
+        if self._n and time.time() - self._t[0] >= self.max_chunk_age:
+            self._submit()
+        with self._file_lock:
+            self._f.flush()
+
+    def close(self):
+        """Write the partial chunk, wait for the compressor, then append the index"""
+        self._submit()
+        if self.compressor:
+            self.compressor.wait()
+        with self._file_lock:
+            index_offset = self._f.tell()
+            for entry in self._index:
+                self._f.write(INDEX_ENTRY.pack(*entry))
+            self._f.write(FOOTER.pack(INDEX_MAGIC, len(self._index), index_offset))
+            self._f.close()
+        if self.error:
+            raise self.error
+
+
+class ChunkReader:
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, "rb")
+        header = self._f.read(FILE_HEADER.size)
+        if len(header) < FILE_HEADER.size:
+            self._f.close()
+            raise ValueError(f"{path}: truncated header")
+        magic, version, self.codec, self.n_fields, self.chunk_samples = FILE_HEADER.unpack(header)
+        if magic != FILE_MAGIC or version != FORMAT_VERSION:
+            self._f.close()
+            raise ValueError(f"{path}: not a chunk file (magic {magic!r}, version {version})")
+        self.index = self._load_index()
+
+    def _load_index(self):
+        """(t_first, t_last, offset, count) per chunk, from the footer or by walking the chunks"""
+        self._f.seek(0, os.SEEK_END)
+        size = self._f.tell()
+        if size >= FILE_HEADER.size + FOOTER.size:
+            self._f.seek(size - FOOTER.size)
+            magic, n, index_offset = FOOTER.unpack(self._f.read(FOOTER.size))
+            if magic == INDEX_MAGIC and index_offset + n * INDEX_ENTRY.size + FOOTER.size == size:
+                self._f.seek(index_offset)
+                raw = self._f.read(n * INDEX_ENTRY.size)
+                return [INDEX_ENTRY.unpack_from(raw, i * INDEX_ENTRY.size) for i in range(n)]
+
+        index = []
+        offset = FILE_HEADER.size
+        while offset + CHUNK_HEADER.size <= size:
+            self._f.seek(offset)
+            magic, count, length, _, t_first, t_last = CHUNK_HEADER.unpack(self._f.read(CHUNK_HEADER.size))
+            if magic != CHUNK_MAGIC or offset + CHUNK_HEADER.size + length > size:
+                break  # torn tail of an unfinished file
+            index.append((t_first, t_last, offset, count))
+            offset += CHUNK_HEADER.size + length
+        return index
+
+    def __len__(self):
+        return sum(entry[3] for entry in self.index)
+
+    def time_range(self):
+        if not self.index:
+            return None
+        return self.index[0][0], self.index[-1][1]
+
+    def chunks_between(self, t0=None, t1=None):
+        return [e for e in self.index
+                if (t0 is None or e[1] >= t0) and (t1 is None or e[0] < t1)]
+
+    def count(self, t0=None, t1=None):
+        """Estimate of the samples in [t0, t1) from the index only, partial chunks pro rata"""
+        total = 0.0
+        for t_first, t_last, _, n in self.chunks_between(t0, t1):
+            span = t_last - t_first
+            lo = t_first if t0 is None else max(t0, t_first)
+            hi = t_last if t1 is None else min(t1, t_last)
+            total += n if span <= 0 else n * min(1.0, max(0.0, hi - lo) / span)
+        return int(round(total))
+
+    def read(self, t0=None, t1=None):
+        """(t, values) of the samples with t0 <= t < t1, decompressing only overlapping chunks"""
+        ts, vs = [], []
+        for _, _, offset, _ in self.chunks_between(t0, t1):
+            self._f.seek(offset)
+            magic, count, length, crc, _, _ = CHUNK_HEADER.unpack(self._f.read(CHUNK_HEADER.size))
+            payload = self._f.read(length)
+            if magic != CHUNK_MAGIC or zlib.crc32(payload) != crc:
+                raise ValueError(f"{self.path}: corrupt chunk at offset {offset}")
+            t, v = decode_chunk(payload, count, self.n_fields, self.codec)
+            ts.append(t)
+            vs.append(v)
+        if not ts:
+            return np.empty(0), np.empty((0, self.n_fields), dtype="<i4")
+        t, v = np.concatenate(ts), np.concatenate(vs)
+        lo = 0 if t0 is None else np.searchsorted(t, t0)
+        hi = len(t) if t1 is None else np.searchsorted(t, t1)
+        return t[lo:hi], v[lo:hi]
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,289 @@
+"""
+Headless command line interface for BOLT, beside the Tk app in ScrewSystem.py.
+
+    python bolt_cli.py scan
+    python bolt_cli.py version
+    python bolt_cli.py record --sensors all --duration 60
+    python bolt_cli.py ota --image screw_system.bin
+    python bolt_cli.py report --since 2024-05-02T06:00 --jobs 4
+    python bolt_cli.py gui
+
+Only argparse and the protocol constants are imported at startup; bleak,
+numpy and tkinter are imported by the commands that need them so the CLI
+starts fast on headless station PCs.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime
+
+from bolt_protocol import (
+    DEVICE_NAME, SCAN_TIMEOUT, LED_WRITE_UUID, NOTIFY_UUID,
+    SENSOR_LSM6DSO, SENSOR_STTSH22H, SENSOR_STRAIN_GAUGE, SENSOR_ALL, SENSOR_START, SENSOR_STOP,
+    VERSION_REQUEST_PREFIX, SENSOR_NAMES,
+    decode_sensor_data, decode_version, sensor_command, format_payload, find_bolt,
+    request_ota_reboot, transfer_ota_image,
+)
+from bolt_gatt_cache import GattCache, connect
+
+CLI_SENSORS = {
+    "lsm6dso": SENSOR_LSM6DSO,
+    "stt22h": SENSOR_STTSH22H,
+    "strain": SENSOR_STRAIN_GAUGE,
+    "all": SENSOR_ALL,
+}
+
+
+class CommandError(Exception):
+    pass
+
+
+def log(message: str):
+    """Progress goes to stderr so stdout stays clean for scripts"""
+    timestamp = datetime.now().strftime("%H:%M:%S.%f")[:-3]
+    print(f"[{timestamp}] {message}", file=sys.stderr, flush=True)
+
+
+async def _connect(args):
+    """Connect to --address, else the last cached device, else the first BOLT found by scanning"""
+    cache = GattCache()
+    address = args.address or (None if args.rescan else cache.last_address())
+    if address:
+        try:
+            started = time.perf_counter()
+            client, cached = await connect(address, cache)
+            log(f"✓ Connected to {address} in {(time.perf_counter() - started) * 1000:.0f} ms"
+                + (" (cached services)" if cached else ""))
+            return client
+        except Exception as e:
+            if args.address:
+                raise
+            log(f"⚠ Fast reconnect to {address} failed, scanning: {e}")
+            cache.invalidate(address)
+
+    log(f"Scanning for {DEVICE_NAME}...")
+    target = await find_bolt(args.timeout)
+    if not target:
+        raise CommandError(f"{DEVICE_NAME} not found")
+    client, _ = await connect(target.address, cache, timeout=args.timeout)
+    log(f"✓ Connected to {target.address}")
+    return client
+
+
+async def cmd_scan(args):
+    from bleak import BleakScanner
+
+    found = await BleakScanner.discover(timeout=args.timeout, return_adv=True)
+    devices = sorted(found.values(), key=lambda item: item[1].rssi, reverse=True)
+    shown = 0
+    for device, adv in devices:
+        if args.all or device.name == DEVICE_NAME:
+            print(f"{device.address}\t{adv.rssi}\t{device.name or ''}")
+            shown += 1
+    return 0 if shown else 1
+
+
+async def cmd_version(args):
+    client = await _connect(args)
+    response = asyncio.get_running_loop().create_future()
+
+    def handler(sender, data):
+        version = decode_version(data)
+        if version and not response.done():
+            response.set_result(version)
+
+    try:
+        await client.start_notify(NOTIFY_UUID, handler)
+        started = time.perf_counter()
+        await client.write_gatt_char(LED_WRITE_UUID, bytes([VERSION_REQUEST_PREFIX]), response=False)
+        try:
+            version = await asyncio.wait_for(response, timeout=args.timeout)
+        except asyncio.TimeoutError:
+            raise CommandError("no version response")
+        log(f"Latency: {(time.perf_counter() - started) * 1000:.0f} ms")
+        if GattCache().set_version(client.address, version, client.mtu_size):
+            log("⚠ Firmware changed — cached services dropped")
+        print(version)
+        return 0
+    finally:
+        try:
+            await client.disconnect()
+        except Exception:
+            pass
+
+
+async def cmd_record(args):
+    from bolt_store import TimeSeriesStore, DEFAULT_STORE_DIR
+
+    sensor_ids = [CLI_SENSORS[name] for name in args.sensors]
+    if SENSOR_ALL in sensor_ids:
+        sensor_ids = [SENSOR_ALL]
+
+    store = TimeSeriesStore(args.store or DEFAULT_STORE_DIR)
+    client = await _connect(args)
+    recorder = store.open_session(client.address, source="cli")
+    counts = {}
+
+    def handler(sender, data):
+        decoded = decode_sensor_data(data)
+        if decoded:
+            sensor_id, values = decoded
+            recorder.append(sensor_id, time.time(), values)
+            counts[sensor_id] = counts.get(sensor_id, 0) + 1
+
+    log(f"✓ Recording session: {recorder.path}")
+    try:
+        await client.start_notify(NOTIFY_UUID, handler)
+        for sensor_id in sensor_ids:
+            payload = sensor_command(sensor_id, SENSOR_START)
+            await client.write_gatt_char(LED_WRITE_UUID, payload, response=False)
+            log(f"→ {SENSOR_NAMES[sensor_id]} START | Payload: {format_payload(payload)}")
+
+        if args.duration:
+            await asyncio.sleep(args.duration)
+        else:
+            log("Recording until interrupted (Ctrl+C)")
+            await asyncio.Event().wait()
+    finally:
+        try:
+            if client.is_connected:
+                for sensor_id in sensor_ids:
+                    await client.write_gatt_char(
+                        LED_WRITE_UUID, sensor_command(sensor_id, SENSOR_STOP), response=False
+                    )
+                await client.stop_notify(NOTIFY_UUID)
+            await client.disconnect()
+        except Exception as e:
+            log(f"⚠ Disconnect error: {e}")
+        recorder.close()
+
+        for sensor_id, count in sorted(counts.items()):
+            print(f"{SENSOR_NAMES[sensor_id]}\t{count}")
+    return 0
+
+
+async def cmd_ota(args):
+    try:
+        with open(args.image, "rb") as f:
+            fw_data = f.read()
+    except OSError as e:
+        raise CommandError(f"Could not read firmware file: {e}")
+
+    client = await _connect(args)
+    GattCache().invalidate(client.address)
+    if not await request_ota_reboot(client, len(fw_data), log):
+        try:
+            await client.disconnect()
+        except Exception:
+            pass
+        return 1
+
+    target = await transfer_ota_image(fw_data, log)
+    if not target:
+        return 1
+    print(target.address)
+    return 0
+
+
+async def cmd_report(args):
+    from bolt_report import build_report, DEFAULT_REPORT_DIR, TIGHTEN_HIGH, TIGHTEN_LOW
+    from bolt_store import DEFAULT_STORE_DIR
+
+    high = TIGHTEN_HIGH if args.high is None else args.high
+    low = TIGHTEN_LOW if args.low is None else args.low
+    started = time.perf_counter()
+    try:
+        paths, analysed, cached = build_report(
+            args.store or DEFAULT_STORE_DIR, args.out or DEFAULT_REPORT_DIR, jobs=args.jobs, since=args.since,
+            devices=args.device, high=high, low=low, log=log,
+        )
+    except ValueError as e:
+        raise CommandError(str(e))
+    log(f"✓ Report done in {time.perf_counter() - started:.1f} s: {analysed} analysed, {cached} from cache")
+    for path in paths:
+        print(path)
+    return 0
+
+
+def _parse_sensors(text):
+    names = [name.strip().lower() for name in text.split(",") if name.strip()]
+    unknown = [name for name in names if name not in CLI_SENSORS]
+    if not names or unknown:
+        raise argparse.ArgumentTypeError(
+            f"expected a comma separated list of {', '.join(CLI_SENSORS)}"
+        )
+    return names
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="bolt_cli", description="Headless BOLT tools")
+    sub = parser.add_subparsers(dest="command")
+
+    def add_link_options(p):
+        p.add_argument("--address", help=f"connect to this address instead of scanning for {DEVICE_NAME}")
+        p.add_argument("--timeout", type=float, default=SCAN_TIMEOUT, help="scan/response timeout in seconds")
+        p.add_argument("--rescan", action="store_true", help="ignore the last cached device and scan")
+
+    p = sub.add_parser("scan", help=f"list advertising {DEVICE_NAME} devices (address, RSSI, name)")
+    p.add_argument("--timeout", type=float, default=SCAN_TIMEOUT)
+    p.add_argument("--all", action="store_true", help="list every BLE device, not only BOLT")
+    p.set_defaults(func=cmd_scan)
+
+    p = sub.add_parser("version", help="print the firmware version of the device")
+    add_link_options(p)
+    p.set_defaults(func=cmd_version)
+
+    p = sub.add_parser("record", help="stream sensors into the session store")
+    add_link_options(p)
+    p.add_argument("--sensors", type=_parse_sensors, default=["all"],
+                   help="all or a comma separated list of lsm6dso, stt22h, strain")
+    p.add_argument("--duration", type=float, help="seconds to record, until Ctrl+C if omitted")
+    p.add_argument("--store", help="session store directory")
+    p.set_defaults(func=cmd_record)
+
+    p = sub.add_parser("ota", help="flash a firmware image over BLE")
+    add_link_options(p)
+    p.add_argument("--image", required=True, help="firmware .bin")
+    p.set_defaults(func=cmd_ota)
+
+    p = sub.add_parser("report", help="summarise recorded sessions per station (CSV + HTML)")
+    p.add_argument("--store", help="session store directory")
+    p.add_argument("--out", help="report directory, also holds the per-session cache")
+    p.add_argument("--since", help="only sessions opened at or after this ISO date/time")
+    p.add_argument("--device", action="append", help="only this device, may be repeated")
+    p.add_argument("--jobs", type=int, help="worker processes, default one per core")
+    p.add_argument("--high", type=float, help="strain ADC counts (0-4095) that start a tightening, default 3000")
+    p.add_argument("--low", type=float, help="strain ADC counts that end a tightening, default 2700")
+    p.set_defaults(func=cmd_report)
+
+    sub.add_parser("gui", help="start the desktop application")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command is None:
+        parser.print_help()
+        return 2
+    if args.command == "gui":
+        from ScrewSystem import main as gui_main
+        gui_main()
+        return 0
+
+    try:
+        return asyncio.run(args.func(args))
+    except CommandError as e:
+        log(f"✗ {e}")
+        return 1
+    except KeyboardInterrupt:
+        return 130
+    except Exception as e:
+        log(f"✗ {args.command} failed: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Persistent per-device GATT cache and fast reconnect path.
+
+For every device we keep the UUIDs of its resolved services, plus the
+last firmware version and MTU, in one JSON file. A reconnect to a cached
+device skips the 8 s scan and asks the bleak backend to reuse its own
+service cache (WinRT use_cached_services, BlueZ dangerous_use_bleak_cache)
+restricted to the cached services, then goes straight to start_notify.
+
+bleak has no way to hand it characteristic handles or an address type on
+connect, so those are not stored; the OS/backend cache does the real work.
+
+The entry's services are dropped whenever the firmware version reported
+by 0x30 differs from the cached one, and explicitly before OTA, so a new
+GATT table is always rediscovered.
+"""
+import json
+import os
+import threading
+import time
+
+from bolt_watchdog import run_blocking
+
+DEFAULT_GATT_CACHE = os.path.join(os.path.expanduser("~"), "ScrewSystem", "gatt_cache.json")
+FAST_CONNECT_TIMEOUT = 5.0
+
+
+class GattCache:
+    def __init__(self, path=DEFAULT_GATT_CACHE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self._devices = json.load(f)
+        except (OSError, ValueError):
+            self._devices = {}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._devices, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def get(self, address):
+        with self._lock:
+            entry = self._devices.get(address)
+            return dict(entry) if entry else None
+
+    def last_address(self):
+        """Address of the most recently connected device, None if the cache is empty"""
+        with self._lock:
+            if not self._devices:
+                return None
+            return max(self._devices.items(), key=lambda item: item[1].get("seen", 0))[0]
+
+    def remember(self, address, client):
+        """Store the services resolved by a connected client"""
+        with self._lock:
+            entry = self._devices.setdefault(address, {})
+            entry["services"] = sorted(service.uuid for service in client.services)
+            entry["mtu"] = client.mtu_size
+            entry["seen"] = time.time()
+            entry.pop("address_type", None)
+            self._save()
+
+    def set_version(self, address, version, mtu=None):
+        """Record the firmware version, returns True when a changed version dropped the services"""
+        with self._lock:
+            entry = self._devices.setdefault(address, {})
+            changed = entry.get("version") not in (None, version)
+            if changed:
+                entry.pop("services", None)
+            entry["version"] = version
+            if mtu:
+                entry["mtu"] = mtu
+            self._save()
+            return changed
+
+    def invalidate(self, address):
+        """Forget the services of `address`, e.g. before flashing new firmware"""
+        with self._lock:
+            entry = self._devices.get(address)
+            if entry and entry.pop("services", None) is not None:
+                self._save()
+
+
+async def connect(address, cache, disconnected_callback=None, timeout=FAST_CONNECT_TIMEOUT):
+    """
+    Connect to `address`, using the cached services when there are any.
+    Returns (client, used_cache).
+    """
+    from bleak import BleakClient
+
+    entry = cache.get(address) or {}
+    cached = entry.get("services")
+
+    kwargs = {}
+    connect_kwargs = {}
+    if cached:
+        kwargs = {"services": list(cached), "winrt": {"use_cached_services": True}}
+        connect_kwargs = {"dangerous_use_bleak_cache": True}
+
+    try:
+        client = BleakClient(address, disconnected_callback=disconnected_callback, timeout=timeout, **kwargs)
+        await client.connect(**connect_kwargs)
+    except TypeError as e:
+        # Older bleak without service filtering / cache options
+        if "unexpected keyword" not in str(e):
+            raise
+        client = BleakClient(address, disconnected_callback=disconnected_callback, timeout=timeout)
+        await client.connect()
+        cached = None
+
+    # The JSON write stays off the BLE loop, like the version update
+    await run_blocking(cache.remember, address, client)
+    return client, bool(cached)
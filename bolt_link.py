@@ -0,0 +1,252 @@
+"""
+Link-quality manager for a connected BOLT.
+
+Polls RSSI on a schedule, tracks notification throughput and loss against
+the rate the active sensors should produce, and asks the firmware for
+connection parameters / PHY that fit the current load:
+
+    idle       nothing streaming, long interval + peripheral latency to save power
+    streaming  sensors active, short interval, no latency
+    burst      streaming but samples are being lost, shortest interval; back to
+               streaming after BURST_RECOVER_POLLS polls with little loss
+
+2M PHY is requested while the signal is good and 1M when it gets weak
+(better sensitivity). The larger ATT MTU is requested once per connection
+where the bleak backend supports it.
+"""
+import asyncio
+import time
+from collections import namedtuple
+
+from bolt_protocol import (
+    LED_WRITE_UUID, RSSI_REQUEST_PREFIX, SENSOR_ALL, SENSOR_DATA_RATE_HZ, PHY_1M, PHY_2M,
+    SENSOR_LSM6DSO, SENSOR_STTSH22H, SENSOR_STRAIN_GAUGE,
+    link_param_command, phy_command, format_payload,
+)
+
+LinkProfile = namedtuple("LinkProfile", "interval_min_ms interval_max_ms latency timeout_ms")
+
+LINK_PROFILES = {
+    "idle":      LinkProfile(100.0, 200.0, 4, 6000),
+    "streaming": LinkProfile(15.0, 30.0, 0, 2000),
+    "burst":     LinkProfile(7.5, 15.0, 0, 2000),
+}
+
+LinkStats = namedtuple("LinkStats", "rssi profile phy notif_rate byte_rate loss errors")
+
+RSSI_POLL_INTERVAL = 5.0     # seconds
+RSSI_WEAK_DBM = -85          # switch to 1M PHY below this
+RSSI_STRONG_DBM = -78        # back to 2M PHY above this
+LOSS_BURST_THRESHOLD = 0.10  # sample loss ratio that escalates streaming -> burst
+LOSS_RECOVER_THRESHOLD = 0.02  # burst -> streaming once loss stays below this ...
+BURST_RECOVER_POLLS = 3        # ... for this many polls in a row
+
+
+def link_summary(history):
+    """RSSI / loss / error summary of the LinkStats polled during a session, None if empty"""
+    if not history:
+        return None
+    rssi = [s.rssi for s in history if s.rssi is not None]
+    return {
+        "polls": len(history),
+        "rssi_mean": round(sum(rssi) / len(rssi), 1) if rssi else None,
+        "rssi_min": min(rssi) if rssi else None,
+        "loss_mean": round(sum(s.loss for s in history) / len(history), 4),
+        "loss_max": round(max(s.loss for s in history), 4),
+        "errors": history[-1].errors,
+    }
+
+
+class LinkManager:
+    """
+    Runs on the BLE event loop next to the notification handler.
+
+    The handler reports traffic with on_notification / on_sample / on_rssi /
+    on_error; active_sensors is a callable returning the ids of the sensors
+    currently started, on_stats receives a LinkStats after every poll.
+    clock is the monotonic time source of the loss windows.
+    """
+
+    def __init__(self, log, active_sensors, on_stats=None, poll_interval=RSSI_POLL_INTERVAL, clock=time.monotonic):
+        self.log = log
+        self.active_sensors = active_sensors
+        self.on_stats = on_stats
+        self.poll_interval = poll_interval
+        self.clock = clock
+
+        self.client = None
+        self._task = None
+        self.profile = None
+        self.phy = None
+        self.rssi = None
+        self._clean_polls = 0
+        self._samples = {}
+        self._streaming = set()
+        self._reset_window()
+        self.errors = 0
+
+    def _reset_window(self):
+        self._window_start = self.clock()
+        self._notifications = 0
+        self._bytes = 0
+        # Active sensors that delivered before count from the window start (a stall
+        # shows as loss), sensors that just started from their first sample
+        self._streaming = (self._streaming | set(self._samples)) & self._active_ids()
+        self._samples = {}
+        self._first = {}
+
+    # --- traffic accounting, called from the notification handler ---
+    def on_notification(self, n_bytes):
+        self._notifications += 1
+        self._bytes += n_bytes
+
+    def on_sample(self, sensor_id):
+        count = self._samples.get(sensor_id)
+        if count is None:
+            self._first[sensor_id] = self.clock()
+            count = 0
+        self._samples[sensor_id] = count + 1
+
+    def on_rssi(self, rssi):
+        if rssi is None:
+            self.errors += 1
+        else:
+            self.rssi = rssi
+
+    def on_error(self):
+        self.errors += 1
+
+    # --- lifecycle ---
+    def start(self, client):
+        """Start polling for `client`, must be called on the BLE event loop"""
+        self.stop()
+        self.client = client
+        self.profile = None
+        self.phy = None
+        self.rssi = None
+        self.errors = 0
+        self._clean_polls = 0
+        self._samples = {}
+        self._streaming = set()
+        self._reset_window()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self.client = None
+
+    async def _run(self):
+        try:
+            await self._acquire_mtu()
+            while self.client and self.client.is_connected:
+                await self._write(bytes([RSSI_REQUEST_PREFIX]))
+                await asyncio.sleep(self.poll_interval)
+                await self._tune(self._window_stats())
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            self.log(f"✗ Link manager stopped: {e}")
+
+    async def _acquire_mtu(self):
+        """Exchange the larger ATT MTU where the backend needs an explicit request"""
+        acquire = getattr(getattr(self.client, "_backend", None), "_acquire_mtu", None)
+        if acquire is None:
+            return
+        try:
+            await acquire()
+            self.log(f"✓ MTU exchanged: {self.client.mtu_size} bytes")
+        except Exception as e:
+            self.log(f"⚠ MTU exchange not available: {e}")
+
+    def _active_ids(self):
+        active = set(self.active_sensors())
+        if SENSOR_ALL in active:
+            return {SENSOR_LSM6DSO, SENSOR_STTSH22H, SENSOR_STRAIN_GAUGE}
+        return active
+
+    def _expected_samples_per_s(self):
+        return len(self._active_ids()) * SENSOR_DATA_RATE_HZ
+
+    def _window_loss(self, now):
+        """Share of expected samples missing, each sensor measured from when it should have started"""
+        expected = received = 0.0
+        for sensor_id in self._active_ids():
+            count = self._samples.get(sensor_id, 0)
+            if sensor_id in self._streaming:
+                expected += SENSOR_DATA_RATE_HZ * (now - self._window_start)
+            elif count:
+                expected += SENSOR_DATA_RATE_HZ * (now - self._first[sensor_id]) + 1
+            else:
+                continue  # started but no first sample yet
+            received += count
+        return max(0.0, 1.0 - received / expected) if expected else 0.0
+
+    def _window_stats(self):
+        now = self.clock()
+        elapsed = max(now - self._window_start, 1e-3)
+        loss = self._window_loss(now)
+        stats = LinkStats(
+            rssi=self.rssi,
+            profile=self.profile,
+            phy=self.phy,
+            notif_rate=self._notifications / elapsed,
+            byte_rate=self._bytes / elapsed,
+            loss=loss,
+            errors=self.errors,
+        )
+        self._reset_window()
+        return stats
+
+    def _choose_profile(self, stats):
+        if not self._expected_samples_per_s():
+            self._clean_polls = 0
+            return "idle"
+        if stats.loss > LOSS_BURST_THRESHOLD:
+            self._clean_polls = 0
+            return "burst"
+        if self.profile == "burst":
+            self._clean_polls = self._clean_polls + 1 if stats.loss < LOSS_RECOVER_THRESHOLD else 0
+            if self._clean_polls < BURST_RECOVER_POLLS:
+                return "burst"
+        return "streaming"
+
+    def _choose_phy(self):
+        if self.rssi is None:
+            return self.phy or PHY_2M
+        if self.rssi < RSSI_WEAK_DBM:
+            return PHY_1M
+        if self.rssi > RSSI_STRONG_DBM:
+            return PHY_2M
+        return self.phy or PHY_2M
+
+    async def _tune(self, stats):
+        profile = self._choose_profile(stats)
+        if profile != self.profile:
+            p = LINK_PROFILES[profile]
+            payload = link_param_command(p.interval_min_ms, p.interval_max_ms, p.latency, p.timeout_ms)
+            if await self._write(payload):
+                self.log(f"→ Link profile {profile} | Payload: {format_payload(payload)}")
+                self.profile = profile
+
+        phy = self._choose_phy()
+        if phy != self.phy:
+            payload = phy_command(phy, phy)
+            if await self._write(payload):
+                self.log(f"→ PHY {'2M' if phy == PHY_2M else '1M'} | Payload: {format_payload(payload)}")
+                self.phy = phy
+
+        if self.on_stats:
+            self.on_stats(stats._replace(profile=self.profile, phy=self.phy))
+
+    async def _write(self, payload):
+        if not self.client or not self.client.is_connected:
+            return False
+        try:
+            await self.client.write_gatt_char(LED_WRITE_UUID, payload, response=False)
+            return True
+        except Exception as e:
+            self.errors += 1
+            self.log(f"✗ Link request failed: {e}")
+            return False
@@ -0,0 +1,171 @@
+"""
+Per-stage timing of the sample pipeline and an on-demand sampling profiler.
+
+Hot-path code brackets a stage with
+
+    t0 = PROFILER.start()
+    ...
+    PROFILER.stop("decode", t0)
+
+start() returns 0 while profiling is off and stop() returns right away on
+0, so the disabled cost is two attribute lookups and two calls. When
+enabled, durations (perf_counter_ns) go into per-stage log2 histograms.
+
+Stages used by the app:
+
+    receive    whole Bleak notification callback
+    decode     decode_sensor_data
+    dispatch   SampleBus.publish (fan-out to consumer queues)
+    log        log_device: formatting + scheduling onto Tk
+    ui_apply   Tk work: log text insertion and WidgetBinder frames
+    ota_write  one OTA chunk write_gatt_char
+
+Set BOLT_PROFILE=1 to start with timing enabled. sample_stacks() collects
+folded stacks from every thread for flamegraph.pl / speedscope.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from time import perf_counter_ns
+
+STAGES = ("receive", "decode", "dispatch", "log", "ui_apply", "ota_write")
+DEFAULT_PROFILE_DIR = os.path.join(os.path.expanduser("~"), "ScrewSystem", "profiles")
+N_BUCKETS = 48  # bucket b holds durations in [2**(b-1), 2**b) ns
+
+
+class StageHistogram:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = [0] * N_BUCKETS
+
+    def add(self, ns):
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+        self.buckets[min(ns.bit_length(), N_BUCKETS - 1)] += 1
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile, in ns"""
+        if not self.count:
+            return 0
+        target = q / 100.0 * self.count
+        seen = 0
+        for b, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return min(1 << b, self.max)
+        return self.max
+
+
+class StageProfiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self._stages = {}
+        self._lock = threading.Lock()
+        self._since = time.time()
+
+    def start(self):
+        return perf_counter_ns() if self.enabled else 0
+
+    def stop(self, stage, t0):
+        if not t0:
+            return
+        ns = perf_counter_ns() - t0
+        with self._lock:
+            hist = self._stages.get(stage)
+            if hist is None:
+                hist = self._stages[stage] = StageHistogram()
+            hist.add(ns)
+
+    def enable(self, on=True):
+        self.enabled = on
+
+    def totals(self, stage):
+        """(count, total ns) of a stage since the last reset"""
+        with self._lock:
+            hist = self._stages.get(stage)
+            return (hist.count, hist.total) if hist else (0, 0)
+
+    def reset(self):
+        with self._lock:
+            self._stages = {}
+            self._since = time.time()
+
+    def report(self):
+        """Text table of all stages, known stages first"""
+        with self._lock:
+            stages = {name: hist for name, hist in self._stages.items() if hist.count}
+            since = self._since
+        order = [s for s in STAGES if s in stages] + sorted(s for s in stages if s not in STAGES)
+        grand = sum(hist.total for hist in stages.values()) or 1
+
+        lines = [
+            f"Stage timing since {datetime.fromtimestamp(since):%H:%M:%S} "
+            f"({'on' if self.enabled else 'off'}), times in µs",
+            f"{'stage':<10} {'count':>8} {'mean':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9} {'total ms':>10} {'share':>6}",
+        ]
+        for name in order:
+            h = stages[name]
+            lines.append(
+                f"{name:<10} {h.count:>8} {h.total / h.count / 1e3:>9.1f} "
+                f"{h.percentile(50) / 1e3:>9.1f} {h.percentile(90) / 1e3:>9.1f} {h.percentile(99) / 1e3:>9.1f} "
+                f"{h.max / 1e3:>9.1f} {h.total / 1e6:>10.1f} {h.total / grand:>6.1%}"
+            )
+        if not order:
+            lines.append("(no samples)")
+        return "\n".join(lines)
+
+    def dump_report(self, directory=DEFAULT_PROFILE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"stages-{datetime.now():%Y%m%d-%H%M%S}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.report() + "\n")
+        return path
+
+
+PROFILER = StageProfiler(enabled=bool(os.environ.get("BOLT_PROFILE")))
+
+
+def _frame_label(frame):
+    return f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}"
+
+
+def sample_stacks(duration, interval=0.005):
+    """
+    Sample every thread's stack for `duration` seconds, returns a Counter of
+    folded stacks ("thread;outer;...;inner" -> samples). Blocks the caller.
+    """
+    me = threading.get_ident()
+    counts = Counter()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            counts[";".join(reversed(stack))] += 1
+        time.sleep(interval)
+    return counts
+
+
+def write_folded(counts, directory=DEFAULT_PROFILE_DIR):
+    """Write folded stacks (flamegraph.pl / speedscope input), returns the path"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"flame-{datetime.now():%Y%m%d-%H%M%S}.folded")
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, n in counts.most_common():
+            f.write(f"{stack} {n}\n")
+    return path
@@ -0,0 +1,278 @@
+"""
+BOLT BLE protocol shared by the desktop app (ScrewSystem.py) and the CLI (bolt_cli.py):
+UUIDs, command payloads, notification decoding and the OTA sequence.
+
+bleak is imported on first use so importing this module stays cheap.
+"""
+import asyncio
+import math
+import struct
+
+from bolt_profile import PROFILER
+
+DEVICE_NAME = "BOLT"
+SCAN_TIMEOUT = 8.0
+
+# Standard ST P2P UUIDs
+LED_WRITE_UUID   = "0000fe41-8e22-4541-9d4c-21edae82ed19"   # Write to control LED
+NOTIFY_UUID      = "0000fe42-8e22-4541-9d4c-21edae82ed19"   # Notifications from device
+
+# --- OTA-specific UUIDs and flash layout ---
+REBOOT_CHAR_UUID      = "0000fe11-8e22-4541-9d4c-21edae82ed19"   # reboot to BLE_Ota
+OTA_SERVICE_UUID      = "0000fe20-cc7a-482a-984a-7f2ed5b3e58f"
+OTA_BASE_ADDR_UUID    = "0000fe22-8e22-4541-9d4c-21edae82ed19"
+OTA_REBOOT_CONF_UUID  = "0000fe23-8e22-4541-9d4c-21edae82ed19"
+OTA_DATA_UUID         = "0000fe24-8e22-4541-9d4c-21edae82ed19"
+
+FLASH_BASE_ADDR       = 0x08000000
+APP_BASE_ADDR         = 0x08007000     # your p2p app base
+FLASH_PAGE_SIZE       = 2048          # 2KB
+OTA_CHUNK_SIZE        = 100           # bytes per BLE write
+
+ACTION_START_USER_APP = 0x02
+ACTION_FILE_FINISHED  = 0x07
+
+
+SENSOR_CMD_PREFIX       = 0x10
+
+SENSOR_LSM6DSO          = 0x01
+SENSOR_STTSH22H         = 0x02
+SENSOR_STRAIN_GAUGE     = 0x03
+SENSOR_ALL              = 0x04
+
+SENSOR_START            = 0x01
+SENSOR_STOP             = 0x00
+
+NOTIF_SENSOR_DATA       = 0x20
+NOTIF_SENSOR_STATUS     = 0x21
+VERSION_REQUEST_PREFIX  = 0x30
+NOTIF_VERSION_RESPONSE  = 0x30
+RSSI_REQUEST_PREFIX     = 0x40
+NOTIF_RSSI_RESPONSE     = 0x40
+LINK_PARAM_REQUEST_PREFIX = 0x50
+NOTIF_LINK_PARAM_RESPONSE = 0x50
+PHY_REQUEST_PREFIX      = 0x51
+NOTIF_PHY_RESPONSE      = 0x51
+
+# HCI LE PHY preference bits
+PHY_1M                  = 0x01
+PHY_2M                  = 0x02
+
+# One sample per sensor every SENSOR_DATA_INTERVAL (100 ms) in p2p_server_app.c
+SENSOR_DATA_RATE_HZ     = 10.0
+
+# Strain gauge values are raw 12-bit ADC counts (ADC_RESOLUTION_12B in adc.c)
+STRAIN_ADC_MAX          = 4095
+
+# Sensor Command Protocol
+# Format: [Device_Selection, Sensor_ID, Action]
+# Device_Selection: 0x10 = Sensor commands
+# Sensor_ID:
+# 0x01 = LSM6DSO
+# 0x02 = STT22H
+# 0x03 = STRAIN
+# 0x04 = ALL
+# Action: 0x01 = Start, 0x00 = Stop
+#
+# Link Parameter Request (write characteristic is 5 bytes max)
+# Format: [0x50, Interval_Min, Interval_Max, Latency, Timeout]
+# Intervals in 1.25 ms units, latency in connection events, timeout in 100 ms units
+# PHY Request
+# Format: [0x51, TX_PHYS, RX_PHYS]  (bit0 = 1M, bit1 = 2M)
+# Both answer with a notification [prefix, HCI status]
+
+SENSOR_NAMES = {
+    SENSOR_LSM6DSO: "LSM6DSO",
+    SENSOR_STTSH22H: "STT22H",
+    SENSOR_STRAIN_GAUGE: "STRAIN GAUGE",
+    SENSOR_ALL: "ALL",
+}
+
+# Payload layouts of 0x20 sensor data notifications, values start at byte 2
+_SENSOR_STRUCTS = {
+    SENSOR_LSM6DSO: struct.Struct(">6h"),        # accel x/y/z, gyro x/y/z
+    SENSOR_STTSH22H: struct.Struct(">h"),        # temperature
+    SENSOR_STRAIN_GAUGE: struct.Struct(">H"),    # strain ADC raw
+}
+
+
+def decode_sensor_data(data):
+    """Decode a 0x20 notification into (sensor_id, values), None if unknown or short"""
+    if len(data) < 2 or data[0] != NOTIF_SENSOR_DATA:
+        return None
+    layout = _SENSOR_STRUCTS.get(data[1])
+    if layout is None or len(data) < 2 + layout.size:
+        return None
+    return data[1], layout.unpack_from(data, 2)
+
+
+def decode_version(data):
+    """Decode a 0x30 response into 'major.minor.patch', None if short"""
+    if len(data) < 4 or data[0] != NOTIF_VERSION_RESPONSE:
+        return None
+    return f"{data[1]}.{data[2]}.{data[3]}"
+
+
+def decode_rssi(data):
+    """Decode a 0x40 response into dBm, None if short or the firmware error marker"""
+    if len(data) < 2 or data[0] != NOTIF_RSSI_RESPONSE or data[1] == 0xFF:
+        return None
+    return struct.unpack_from('b', data, 1)[0]
+
+
+def sensor_command(sensor_id: int, action: int):
+    return bytes([SENSOR_CMD_PREFIX, sensor_id, action])
+
+
+def link_param_command(interval_min_ms, interval_max_ms, latency, timeout_ms):
+    """Connection parameter request, values clamped to what fits the 1-byte fields"""
+    def units(value, unit, lo, hi):
+        return max(lo, min(hi, int(round(value / unit))))
+    return bytes([
+        LINK_PARAM_REQUEST_PREFIX,
+        units(interval_min_ms, 1.25, 6, 255),
+        units(interval_max_ms, 1.25, 6, 255),
+        max(0, min(255, int(latency))),
+        units(timeout_ms, 100, 1, 255),
+    ])
+
+
+def phy_command(tx_phys=PHY_2M, rx_phys=PHY_2M):
+    return bytes([PHY_REQUEST_PREFIX, tx_phys, rx_phys])
+
+
+def format_payload(payload):
+    return ' '.join(f'{b:02X}' for b in payload)
+
+
+def compute_sector_info(app_addr, size_bytes):
+    offset = app_addr - FLASH_BASE_ADDR
+    first_sector = offset // FLASH_PAGE_SIZE
+    num_sectors = math.ceil(size_bytes / FLASH_PAGE_SIZE)
+    return first_sector, num_sectors
+
+
+async def find_bolt(timeout=SCAN_TIMEOUT):
+    """Scan for the first advertising BOLT, None if not found"""
+    from bleak import BleakScanner
+
+    devices = await BleakScanner.discover(timeout=timeout)
+    return next((d for d in devices if d.name == DEVICE_NAME), None)
+
+
+async def request_ota_reboot(client, image_size, log):
+    """Ask the running user app to reboot into BLE_Ota and disconnect, returns success"""
+    first_sec, num_sec = compute_sector_info(APP_BASE_ADDR, image_size)
+    log(f"→ OTA erase plan: first_sector={first_sec}, num_sectors={num_sec}")
+
+    reboot_payload = bytes([
+        0x01,                 # boot mode: jump to OTA app
+        first_sec & 0xFF,     # first sector index
+        num_sec & 0xFF,       # number of sectors
+    ])
+
+    try:
+        await client.write_gatt_char(REBOOT_CHAR_UUID, reboot_payload, response=False)
+        log(f"→ Reboot to OTA sent: {format_payload(reboot_payload)}")
+    except Exception as e:
+        log(f"✗ Failed to send reboot cmd: {e}")
+        return False
+
+    # Disconnect this client; device will reboot into BLE_Ota
+    try:
+        await client.disconnect()
+    except Exception:
+        pass
+    return True
+
+
+async def transfer_ota_image(fw_data, log):
+    """
+    Connect to BOLT in OTA mode, stream fw_data and finish.
+    Returns the rebooted device found by scanning afterwards, None if it did not show up.
+    """
+    from bleak import BleakClient
+
+    # Wait and reconnect in OTA mode
+    await asyncio.sleep(3.0)
+    log("… Waiting for BOLT in OTA mode")
+
+    target = await find_bolt()
+    if not target:
+        log("✗ BOLT in OTA mode not found after reboot")
+        return None
+
+    log(f"✓ Found BOLT in OTA mode: {target.address}")
+    ota_client = BleakClient(target.address)
+
+    try:
+        await ota_client.connect()
+        log("✓ Connected in OTA mode")
+
+        # Send START_USER_APP command
+        offset = APP_BASE_ADDR - FLASH_BASE_ADDR
+        addr_bytes = offset.to_bytes(3, "big")
+        start_payload = bytes([ACTION_START_USER_APP]) + addr_bytes
+
+        await ota_client.write_gatt_char(OTA_BASE_ADDR_UUID, start_payload, response=False)
+        log(f"→ OTA START_USER_APP: {format_payload(start_payload)}")
+
+        # Stream firmware
+        total = len(fw_data)
+        sent = 0
+        log(f"→ Sending {total} bytes…")
+
+        for i in range(0, total, OTA_CHUNK_SIZE):
+            chunk = fw_data[i:i + OTA_CHUNK_SIZE]
+            t0 = PROFILER.start()
+            await ota_client.write_gatt_char(OTA_DATA_UUID, chunk, response=False)
+            PROFILER.stop("ota_write", t0)
+            sent += len(chunk)
+            # light throttling to keep things smooth
+            await asyncio.sleep(0.02)
+
+        log(f"✓ Firmware transfer complete ({sent} bytes sent)")
+
+        # Subscribe to reboot notifications BEFORE sending FILE_FINISHED
+        reboot_event = asyncio.Event()
+
+        def reboot_callback(sender, data):
+            log(f"← Device rebooting: {data.hex()}")
+            reboot_event.set()
+
+        try:
+            await ota_client.start_notify(OTA_REBOOT_CONF_UUID, reboot_callback)
+            log("✓ Subscribed to reboot notifications")
+        except Exception as e:
+            log(f"⚠ Could not subscribe to reboot notifications: {e}")
+
+        # Tell bootloader we're done (device will auto-reboot after this)
+        finish_payload = bytes([ACTION_FILE_FINISHED]) + addr_bytes
+        await ota_client.write_gatt_char(OTA_BASE_ADDR_UUID, finish_payload, response=False)
+        log(f"→ OTA FILE_FINISHED: {format_payload(finish_payload)}")
+
+        # Wait for device to send reboot indication
+        log("… Waiting for device to reboot")
+        try:
+            await asyncio.wait_for(reboot_event.wait(), timeout=8.0)
+            log("✓ Reboot confirmation received")
+        except asyncio.TimeoutError:
+            log("⚠ Reboot confirmation timeout (device may still reboot)")
+
+        # Give device time to complete reboot
+        await asyncio.sleep(4.0)
+
+    finally:
+        try:
+            await ota_client.disconnect()
+        except Exception:
+            pass
+
+    # Look for the updated firmware
+    log("✓ OTA finished — scanning for new firmware...")
+    await asyncio.sleep(2.0)
+
+    target = await find_bolt()
+    if not target:
+        log("⚠ Could not find device after OTA (maybe still rebooting)")
+    return target
@@ -0,0 +1,337 @@
+"""
+Batch post-session report over a TimeSeriesStore.
+
+Every session is reduced to one row of shift metrics:
+
+    tightenings     strain rising above TIGHTEN_HIGH, ended when it falls below TIGHTEN_LOW
+    peak strain     maximum raw strain of every tightening (distribution per station)
+    temperature     min / max / mean °C from the memory-mapped 1 s rollups, converted with
+                    the calibration stored in meta.json (1 °C per count without one)
+    link quality    delivered vs expected sample rate and seconds without samples (worst
+                    channel) from the rollups, plus the RSSI / loss summary the app
+                    writes into meta.json
+
+Sessions are analysed in parallel worker processes, all with vectorised
+NumPy over whole channels. Each session result is cached as JSON under
+<out>/cache, keyed by the sizes and mtimes of the session files, so a re-run
+only analyses new or still growing sessions. The report itself is
+sessions.csv, stations.csv (one row per device) and report.html with SVG
+plots, written to <out> (default ~/ScrewSystem/reports).
+"""
+import csv
+import html
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+
+from bolt_calibration import resolve_profile, ANY_FIRMWARE
+from bolt_protocol import SENSOR_DATA_RATE_HZ, STRAIN_ADC_MAX
+from bolt_store import TimeSeriesStore, CHANNELS, DEFAULT_STORE_DIR, _safe_name
+
+DEFAULT_REPORT_DIR = os.path.join(os.path.expanduser("~"), "ScrewSystem", "reports")
+ANALYSIS_VERSION = 3  # bump when the per-session metrics change, invalidates the cache
+
+# Raw 12-bit strain ADC counts; HIGH is the level of the strain capture trigger
+TIGHTEN_HIGH = 3000
+TIGHTEN_LOW = 2700
+
+PEAK_BINS = 20
+
+SESSION_COLUMNS = (
+    "device", "session", "opened", "closed", "duration_s",
+    "tightenings", "tightenings_per_h", "peak_p50", "peak_p95", "peak_max",
+    "temp_min", "temp_max", "temp_mean",
+    "delivery", "missing_s", "rssi_mean", "rssi_min", "loss_mean",
+)
+STATION_COLUMNS = (
+    "device", "sessions", "hours", "tightenings", "tightenings_per_h",
+    "peak_p5", "peak_p50", "peak_p95", "peak_max",
+    "temp_min", "temp_max", "delivery", "missing_s", "rssi_mean", "rssi_min",
+)
+
+
+# --- per-session analysis (worker processes) ---
+def tightening_peaks(strain, high=TIGHTEN_HIGH, low=TIGHTEN_LOW):
+    """Peak value of every above-high episode, with hysteresis down to low"""
+    v = np.asarray(strain, dtype=np.float64)
+    if not len(v):
+        return np.empty(0)
+    # 1 above high, 0 below low, -1 in between: carry the last decided state forward
+    state = np.full(len(v), -1, dtype=np.int8)
+    state[v > high] = 1
+    state[v < low] = 0
+    decided = np.maximum.accumulate(np.where(state >= 0, np.arange(len(v)), 0))
+    on = (state[decided] == 1).astype(np.int8)
+
+    edges = np.diff(on, prepend=np.int8(0), append=np.int8(0))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if not len(starts):
+        return np.empty(0)
+    bounds = np.column_stack((starts, ends)).ravel()
+    return np.maximum.reduceat(np.append(v, -np.inf), bounds)[::2]
+
+
+def analyse_session(root, device, session, high=TIGHTEN_HIGH, low=TIGHTEN_LOW):
+    """Metrics of one session; runs in a worker process"""
+    store = TimeSeriesStore(root)
+    path = store.session_path(device, session)
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+
+    row = {"device": meta.get("device", device), "session": session,
+           "opened": meta.get("opened"), "closed": meta.get("closed")}
+    res = min(meta.get("resolutions") or store.resolutions)
+    t_first, t_last = [], []
+    delivered, expected, missing = 0, 0.0, 0.0
+
+    for channel, _ in CHANNELS.values():
+        rollup = store.read_level(device, session, channel, res)
+        if not len(rollup):
+            continue
+        t = np.asarray(rollup["t"])
+        n = np.asarray(rollup["n"])
+        span = t[-1] - t[0] + res
+        t_first.append(t[0])
+        t_last.append(t[-1] + res)
+        delivered += int(n.sum())
+        expected += span * SENSOR_DATA_RATE_HZ
+        missing = max(missing, float(np.clip(np.diff(t) - res, 0, None).sum()))
+
+        if channel == "stt22h":
+            cal = resolve_profile({ANY_FIRMWARE: meta.get("calibration") or {}})["stt22h"]
+            for key, raw in (("temp_min", rollup["temp_min"].min()), ("temp_max", rollup["temp_max"].max()),
+                             ("temp_mean", np.average(rollup["temp_mean"], weights=n))):
+                row[key] = round((float(raw) - cal["offset"]) * cal["gain"], 2)
+
+    strain = store.read_level(device, session, "strain")
+    peaks = tightening_peaks(strain["raw"], high, low) if len(strain) else np.empty(0)
+
+    duration = (max(t_last) - min(t_first)) if t_first else 0.0
+    row["duration_s"] = round(duration, 1)
+    row["tightenings"] = len(peaks)
+    row["tightenings_per_h"] = round(len(peaks) / duration * 3600.0, 2) if duration else None
+    if len(peaks):
+        p50, p95 = np.percentile(peaks, (50, 95))
+        row.update(peak_p50=float(p50), peak_p95=float(p95), peak_max=float(peaks.max()))
+    row["delivery"] = round(min(1.0, delivered / expected), 4) if expected else None
+    row["missing_s"] = round(missing, 1)
+
+    link = meta.get("link") or {}
+    row.update(rssi_mean=link.get("rssi_mean"), rssi_min=link.get("rssi_min"), loss_mean=link.get("loss_mean"))
+    row["peaks"] = [float(p) for p in peaks]
+    return row
+
+
+# --- cache ---
+def _fingerprint(path, high, low):
+    files = []
+    for name in sorted(os.listdir(path)):
+        st = os.stat(os.path.join(path, name))
+        files.append([name, st.st_size, st.st_mtime_ns])
+    return {"version": ANALYSIS_VERSION, "high": high, "low": low, "files": files}
+
+
+class ResultCache:
+    """One JSON file per session under <directory>/<device>/<session>.json"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, device, session):
+        return os.path.join(self.directory, _safe_name(device), _safe_name(session) + ".json")
+
+    def get(self, device, session, fingerprint):
+        try:
+            with open(self._path(device, session)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry["row"] if entry.get("fingerprint") == fingerprint else None
+
+    def put(self, device, session, fingerprint, row):
+        path = self._path(device, session)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump({"fingerprint": fingerprint, "row": row}, f)
+        os.replace(path + ".tmp", path)
+
+
+# --- aggregation ---
+def _weighted_mean(pairs, digits):
+    """Mean of (value, weight) pairs, None without weight"""
+    if not pairs or not sum(w for _, w in pairs):
+        return None
+    values, weights = zip(*pairs)
+    return round(float(np.average(values, weights=weights)), digits)
+
+
+def station_summary(rows):
+    """One aggregated row per device"""
+    by_device = {}
+    for row in rows:
+        by_device.setdefault(row["device"], []).append(row)
+
+    stations = []
+    for device, group in sorted(by_device.items()):
+        peaks = np.array([p for row in group for p in row["peaks"]])
+        hours = sum(row["duration_s"] for row in group) / 3600.0
+        tightenings = sum(row["tightenings"] for row in group)
+        temps_min = [row["temp_min"] for row in group if row.get("temp_min") is not None]
+        temps_max = [row["temp_max"] for row in group if row.get("temp_max") is not None]
+        delivery = [(row["delivery"], row["duration_s"]) for row in group if row.get("delivery") is not None]
+        rssi = [(row["rssi_mean"], row["duration_s"]) for row in group if row.get("rssi_mean") is not None]
+        rssi_min = [row["rssi_min"] for row in group if row.get("rssi_min") is not None]
+
+        station = {
+            "device": device,
+            "sessions": len(group),
+            "hours": round(hours, 2),
+            "tightenings": tightenings,
+            "tightenings_per_h": round(tightenings / hours, 2) if hours else None,
+            "temp_min": min(temps_min) if temps_min else None,
+            "temp_max": max(temps_max) if temps_max else None,
+            "delivery": _weighted_mean(delivery, 4),
+            "missing_s": round(sum(row["missing_s"] for row in group), 1),
+            "rssi_mean": _weighted_mean(rssi, 1),
+            "rssi_min": min(rssi_min) if rssi_min else None,
+            "peaks": peaks,
+        }
+        if len(peaks):
+            p5, p50, p95 = np.percentile(peaks, (5, 50, 95))
+            station.update(peak_p5=float(p5), peak_p50=float(p50), peak_p95=float(p95), peak_max=float(peaks.max()))
+        stations.append(station)
+    return stations
+
+
+# --- output ---
+def _write_csv(path, columns, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            writer.writerow(["" if row.get(c) is None else row.get(c) for c in columns])
+
+
+def svg_bars(labels, values, title, width=520, height=220, color="#3b78c2"):
+    """Minimal vertical bar chart as an inline SVG string"""
+    pad_l, pad_b, pad_t = 50, 40, 24
+    plot_w, plot_h = width - pad_l - 10, height - pad_b - pad_t
+    top = max(values) if len(values) and max(values) > 0 else 1
+    bar_w = plot_w / max(len(values), 1)
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" font-family="sans-serif" font-size="10">',
+        f'<text x="{width / 2}" y="14" text-anchor="middle" font-size="12">{html.escape(title)}</text>',
+        f'<line x1="{pad_l}" y1="{pad_t + plot_h}" x2="{width - 10}" y2="{pad_t + plot_h}" stroke="#444"/>',
+        f'<text x="{pad_l - 4}" y="{pad_t + 4}" text-anchor="end">{top:g}</text>',
+        f'<text x="{pad_l - 4}" y="{pad_t + plot_h}" text-anchor="end">0</text>',
+    ]
+    step = max(1, len(labels) // 10)
+    for i, (label, value) in enumerate(zip(labels, values)):
+        h = plot_h * value / top
+        x = pad_l + i * bar_w
+        parts.append(f'<rect x="{x + 1:.1f}" y="{pad_t + plot_h - h:.1f}" width="{max(bar_w - 2, 1):.1f}" '
+                     f'height="{h:.1f}" fill="{color}"><title>{html.escape(str(label))}: {value:g}</title></rect>')
+        if i % step == 0:
+            parts.append(f'<text x="{x + bar_w / 2:.1f}" y="{pad_t + plot_h + 14}" text-anchor="middle">'
+                         f'{html.escape(str(label))}</text>')
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+def _html_table(columns, rows):
+    head = "".join(f"<th>{html.escape(c)}</th>" for c in columns)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{'' if row.get(c) is None else html.escape(str(row.get(c)))}</td>" for c in columns)
+        + "</tr>"
+        for row in rows
+    )
+    return f"<table><tr>{head}</tr>{body}</table>"
+
+
+def write_html(path, stations, rows, since=None):
+    stations_fmt = [{k: (round(v, 1) if isinstance(v, float) else v) for k, v in s.items()} for s in stations]
+    plots = [svg_bars([s["device"] for s in stations], [s["tightenings"] for s in stations], "Tightenings per station")]
+    for station in stations:
+        if len(station["peaks"]):
+            counts, edges = np.histogram(station["peaks"], bins=PEAK_BINS)
+            plots.append(svg_bars([f"{e:.0f}" for e in edges[:-1]], counts.tolist(),
+                                  f"Peak strain, {station['device']} ({len(station['peaks'])} tightenings)",
+                                  color="#c2603b"))
+    span = f" since {html.escape(since)}" if since else ""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(
+            "<!DOCTYPE html><html><head><meta charset='utf-8'><title>BOLT session report</title><style>"
+            "body{font-family:sans-serif;margin:20px}table{border-collapse:collapse;margin-bottom:20px}"
+            "td,th{border:1px solid #ccc;padding:3px 8px;text-align:right}th{background:#eee}"
+            "svg{margin:0 12px 12px 0}</style></head><body>"
+            f"<h1>BOLT session report</h1><p>{len(rows)} sessions{span}, generated "
+            f"{datetime.now():%Y-%m-%d %H:%M}. Tightening: strain above {TIGHTEN_HIGH} until below {TIGHTEN_LOW}.</p>"
+            "<h2>Stations</h2>" + _html_table(STATION_COLUMNS, stations_fmt)
+            + "<div>" + "".join(plots) + "</div>"
+            "<h2>Sessions</h2>" + _html_table(SESSION_COLUMNS, rows)
+            + "</body></html>\n"
+        )
+
+
+# --- driver ---
+def build_report(root=DEFAULT_STORE_DIR, out=DEFAULT_REPORT_DIR, jobs=None, since=None, devices=None,
+                 high=TIGHTEN_HIGH, low=TIGHTEN_LOW, log=print):
+    """
+    Analyse every session (opened at or after `since`, ISO date/time) of the
+    store and write the report. Returns (paths, sessions analysed, sessions from cache).
+    """
+    if not 0 <= low < high <= STRAIN_ADC_MAX:
+        raise ValueError(f"tightening levels need 0 <= low < high <= {STRAIN_ADC_MAX} (got low {low}, high {high})")
+    store = TimeSeriesStore(root)
+    cache = ResultCache(os.path.join(out, "cache"))
+
+    rows, todo = [], []
+    for device in devices or store.devices():
+        for session in store.sessions(device):
+            path = store.session_path(device, session)
+            if since:
+                with open(os.path.join(path, "meta.json")) as f:
+                    if (json.load(f).get("opened") or "") < since:
+                        continue
+            fingerprint = _fingerprint(path, high, low)
+            row = cache.get(device, session, fingerprint)
+            if row is None:
+                todo.append((device, session, fingerprint))
+            else:
+                rows.append(row)
+
+    cached = len(rows)
+    log(f"{cached + len(todo)} sessions, {len(todo)} to analyse, {cached} cached")
+
+    def finished(item, result):
+        device, session, fingerprint = item
+        try:
+            row = result()
+        except (OSError, ValueError, KeyError) as e:
+            log(f"✗ {device}/{session}: {e}")
+            return
+        cache.put(device, session, fingerprint, row)
+        rows.append(row)
+
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(todo) == 1:
+        for item in todo:
+            finished(item, lambda: analyse_session(root, item[0], item[1], high, low))
+    elif todo:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(todo))) as pool:
+            futures = {pool.submit(analyse_session, root, item[0], item[1], high, low): item for item in todo}
+            for future in as_completed(futures):
+                finished(futures[future], future.result)
+
+    rows.sort(key=lambda row: (row["device"], row["session"]))
+    stations = station_summary(rows)
+    os.makedirs(out, exist_ok=True)
+    paths = [os.path.join(out, name) for name in ("sessions.csv", "stations.csv", "report.html")]
+    _write_csv(paths[0], SESSION_COLUMNS, rows)
+    _write_csv(paths[1], STATION_COLUMNS, stations)
+    write_html(paths[2], stations, rows, since)
+    return paths, len(rows) - cached, cached
@@ -0,0 +1,350 @@
+"""
+Streaming server for remote dashboards, running on the app's BLE event loop.
+
+Decoded samples are forwarded to TCP clients (port STREAM_PORT) and
+WebSocket clients (port STREAM_WS_PORT) as compact binary batch frames,
+one frame per device and sensor per flush:
+
+    0   2s   magic       b"BS"
+    2   u1   version     FRAME_VERSION
+    3   u1   sensor_id
+    4   u2   count       records in this frame
+    6   u1   device_len
+    7   u1   reserved
+    8   f8   t0          unix time of the first record
+   16        device      device_len bytes, BLE address
+    ..       records     count x (u4 sensor_seq, u4 dt_us since t0, values)
+
+All little endian. Values are 6 x i2 for LSM6DSO, 1 x i2 for STT22H and
+1 x u2 for the strain gauge. Over TCP every frame is prefixed with its u32
+length; over WebSocket each frame is one binary message.
+
+Clients subscribe with a JSON object (a line over TCP, a text message over
+WebSocket), all keys optional, later messages replace earlier ones:
+
+    {"devices": ["AA:BB:..."], "sensors": [1, 3], "decimate": 10}
+
+decimate N keeps every Nth sample per sensor. {"trigger": "<name>"} fires
+an external capture trigger (bolt_capture.py) instead, only when triggers are
+enabled (BOLT_STREAM_TRIGGERS=1). Each client has a bounded
+queue drained by its own task; while its socket is backed up the oldest
+samples are dropped for that client only, and BLE handling never waits.
+
+There is no authentication: the server binds to localhost unless
+BOLT_STREAM_HOST names another interface (0.0.0.0 for the whole LAN).
+Request lines over the reader limit and WebSocket messages over
+MAX_MESSAGE_SIZE close the client.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+from collections import deque
+
+from bolt_protocol import SENSOR_LSM6DSO, SENSOR_STTSH22H, SENSOR_STRAIN_GAUGE
+
+STREAM_HOST = os.environ.get("BOLT_STREAM_HOST", "127.0.0.1")
+STREAM_TRIGGERS = bool(os.environ.get("BOLT_STREAM_TRIGGERS"))
+STREAM_PORT = 8765
+STREAM_WS_PORT = 8766
+
+FLUSH_INTERVAL = 0.1           # seconds between frames per client
+FLUSH_COUNT = 256              # flush early once this many samples are pending
+CLIENT_QUEUE_SIZE = 4096       # samples per client before the oldest are dropped
+WRITE_BUFFER_LIMIT = 256 * 1024
+MAX_MESSAGE_SIZE = 64 * 1024   # bytes per request, same as the TCP line limit
+
+FRAME_MAGIC = b"BS"
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct("<2sBBHBBd")
+RECORD_PREFIX = struct.Struct("<II")
+FRAME_VALUES = {
+    SENSOR_LSM6DSO: struct.Struct("<6h"),
+    SENSOR_STTSH22H: struct.Struct("<h"),
+    SENSOR_STRAIN_GAUGE: struct.Struct("<H"),
+}
+
+_WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_WS_CLOSE_TOO_BIG = 1009
+
+
+def encode_frames(device, samples):
+    """Pack bolt_bus.Samples from one device into one frame per sensor"""
+    by_sensor = {}
+    for sample in samples:
+        if sample.sensor_id in FRAME_VALUES:
+            by_sensor.setdefault(sample.sensor_id, []).append(sample)
+
+    address = (device or "").encode()[:255]
+    frames = []
+    for sensor_id, group in by_sensor.items():
+        values = FRAME_VALUES[sensor_id]
+        for i in range(0, len(group), 0xFFFF):
+            chunk = group[i:i + 0xFFFF]
+            t0 = chunk[0].t
+            parts = [FRAME_HEADER.pack(FRAME_MAGIC, FRAME_VERSION, sensor_id, len(chunk), len(address), 0, t0),
+                     address]
+            for sample in chunk:
+                dt_us = min(max(int((sample.t - t0) * 1e6), 0), 0xFFFFFFFF)
+                parts.append(RECORD_PREFIX.pack(sample.seq & 0xFFFFFFFF, dt_us))
+                parts.append(values.pack(*sample.values))
+            frames.append(b"".join(parts))
+    return frames
+
+
+def decode_frame(frame):
+    """Client side helper: (device, sensor_id, [(t, sensor_seq, values), ...])"""
+    magic, version, sensor_id, count, device_len, _, t0 = FRAME_HEADER.unpack_from(frame, 0)
+    if magic != FRAME_MAGIC or version != FRAME_VERSION:
+        raise ValueError(f"not a BOLT stream frame (magic {magic!r}, version {version})")
+    offset = FRAME_HEADER.size
+    device = frame[offset:offset + device_len].decode(errors="replace")
+    offset += device_len
+
+    values = FRAME_VALUES[sensor_id]
+    records = []
+    for _ in range(count):
+        seq, dt_us = RECORD_PREFIX.unpack_from(frame, offset)
+        offset += RECORD_PREFIX.size
+        records.append((t0 + dt_us / 1e6, seq, values.unpack_from(frame, offset)))
+        offset += values.size
+    return device, sensor_id, records
+
+
+class _Client:
+    def __init__(self, peer, max_pending=CLIENT_QUEUE_SIZE):
+        self.peer = peer
+        self.writer = None
+        self.devices = None
+        self.sensors = None
+        self.decimate = 1
+        self.pending = deque(maxlen=max_pending)
+        self.dropped = 0
+        self.sent = 0
+        self.wakeup = asyncio.Event()
+        self._seen = {}
+
+    def subscribe(self, request):
+        devices = request.get("devices")
+        sensors = request.get("sensors")
+        self.devices = set(devices) if devices else None
+        self.sensors = {int(s) for s in sensors} if sensors else None
+        self.decimate = max(1, int(request.get("decimate", 1)))
+        self._seen.clear()
+
+    def offer(self, device, samples):
+        if self.devices is not None and device not in self.devices:
+            return
+        for sample in samples:
+            if self.sensors is not None and sample.sensor_id not in self.sensors:
+                continue
+            if self.decimate > 1:
+                n = self._seen.get(sample.sensor_id, 0)
+                self._seen[sample.sensor_id] = n + 1
+                if n % self.decimate:
+                    continue
+            if len(self.pending) == self.pending.maxlen:
+                self.dropped += 1
+            self.pending.append((device, sample))
+        if len(self.pending) >= FLUSH_COUNT:
+            self.wakeup.set()
+
+    def take_frames(self):
+        items = list(self.pending)
+        self.pending.clear()
+        by_device = {}
+        for device, sample in items:
+            by_device.setdefault(device, []).append(sample)
+        frames = []
+        for device, samples in by_device.items():
+            frames.extend(encode_frames(device, samples))
+        self.sent += len(items)
+        return frames
+
+
+class StreamServer:
+    """
+    TCP + WebSocket sample server. start()/stop() run on the event loop,
+    publish() may be called from any thread (it is a SampleBus consumer).
+    """
+
+    def __init__(self, log, loop, host=STREAM_HOST, port=STREAM_PORT, ws_port=STREAM_WS_PORT, on_trigger=None,
+                 allow_triggers=STREAM_TRIGGERS):
+        self.log = log
+        self.loop = loop
+        self.on_trigger = on_trigger
+        self.allow_triggers = allow_triggers
+        self.host = host
+        self.port = port
+        self.ws_port = ws_port
+        self.device = None
+        self._servers = []
+        self._clients = set()
+
+    async def start(self):
+        if self.port:
+            self._servers.append(await asyncio.start_server(self._handle_tcp, self.host, self.port))
+        if self.ws_port:
+            self._servers.append(await asyncio.start_server(self._handle_ws, self.host, self.ws_port))
+        self.log(f"✓ Streaming server on {self.host} (TCP {self.port}, WebSocket {self.ws_port})")
+        if self.host not in ("127.0.0.1", "localhost", "::1"):
+            self.log("⚠ Streaming server reachable from the network without authentication")
+
+    async def stop(self):
+        for server in self._servers:
+            server.close()
+        # wait_closed() waits for open connections on newer Pythons
+        for client in list(self._clients):
+            client.writer.close()
+        for server in self._servers:
+            await server.wait_closed()
+        self._servers = []
+
+    def publish(self, batch):
+        """Forward a batch of samples from the current device to every subscribed client"""
+        if self._clients:
+            self.loop.call_soon_threadsafe(self._feed, self.device, batch)
+
+    def _feed(self, device, batch):
+        for client in self._clients:
+            client.offer(device, batch)
+
+    async def _pump(self, client, writer, send_frame):
+        """Per-client writer task: flush on a timer or when enough samples are pending"""
+        while True:
+            try:
+                await asyncio.wait_for(client.wakeup.wait(), FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            client.wakeup.clear()
+            if not client.pending:
+                continue
+            if writer.transport.get_write_buffer_size() > WRITE_BUFFER_LIMIT:
+                # Socket backed up, let this client's queue drop the oldest samples
+                continue
+            for frame in client.take_frames():
+                send_frame(frame)
+            await writer.drain()
+
+    async def _serve(self, client, writer, send_frame, read_message):
+        client.writer = writer
+        self._clients.add(client)
+        self.log(f"→ Stream client {client.peer} connected")
+        pump = asyncio.create_task(self._pump(client, writer, send_frame))
+        try:
+            while True:
+                message = await read_message()
+                if message is None:
+                    break
+                try:
+                    request = json.loads(message)
+                    if not isinstance(request, dict):
+                        raise ValueError("expected a JSON object")
+                    if "trigger" in request:
+                        name = str(request["trigger"] or "external")
+                        if not self.allow_triggers:
+                            self.log(f"✗ Stream client {client.peer} trigger rejected (BOLT_STREAM_TRIGGERS not set)")
+                            continue
+                        self.log(f"← Stream client {client.peer} trigger: {name}")
+                        if self.on_trigger:
+                            self.on_trigger(name)
+                        continue
+                    client.subscribe(request)
+                    self.log(f"← Stream client {client.peer} subscribed: devices={client.devices or 'all'} "
+                             f"sensors={client.sensors or 'all'} decimate={client.decimate}")
+                except (ValueError, TypeError) as e:
+                    self.log(f"✗ Stream client {client.peer} bad request: {e}")
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._clients.discard(client)
+            pump.cancel()
+            writer.close()
+            self.log(f"Stream client {client.peer} left: {client.sent} sent, {client.dropped} dropped")
+
+    # --- TCP: u32 length prefixed frames out, JSON lines in ---
+    async def _handle_tcp(self, reader, writer):
+        client = _Client(writer.get_extra_info("peername"))
+
+        def send_frame(frame):
+            writer.write(struct.pack("<I", len(frame)) + frame)
+
+        async def read_message():
+            try:
+                line = await reader.readline()
+            except ValueError:
+                # Line over the reader limit, asyncio re-raises LimitOverrunError as ValueError
+                self.log(f"✗ Stream client {client.peer} request too long, closing")
+                return None
+            return line.decode(errors="replace") if line else None
+
+        await self._serve(client, writer, send_frame, read_message)
+
+    # --- WebSocket (RFC 6455): binary messages out, text messages in ---
+    async def _handle_ws(self, reader, writer):
+        client = _Client(writer.get_extra_info("peername"))
+        try:
+            request = await reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            writer.close()
+            return
+        headers = {}
+        for line in request.decode(errors="replace").split("\r\n")[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        key = headers.get("sec-websocket-key")
+        if not key:
+            writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+            writer.close()
+            return
+        accept = base64.b64encode(hashlib.sha1(key.encode() + _WS_GUID).digest()).decode()
+        writer.write(
+            "HTTP/1.1 101 Switching Protocols\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Accept: {accept}\r\n\r\n".encode()
+        )
+
+        def send_ws(opcode, payload):
+            n = len(payload)
+            if n < 126:
+                head = struct.pack("!BB", 0x80 | opcode, n)
+            elif n < 1 << 16:
+                head = struct.pack("!BBH", 0x80 | opcode, 126, n)
+            else:
+                head = struct.pack("!BBQ", 0x80 | opcode, 127, n)
+            writer.write(head + payload)
+
+        async def read_message():
+            message = b""
+            while True:
+                b0, b1 = await reader.readexactly(2)
+                opcode, n = b0 & 0x0F, b1 & 0x7F
+                if n == 126:
+                    n, = struct.unpack("!H", await reader.readexactly(2))
+                elif n == 127:
+                    n, = struct.unpack("!Q", await reader.readexactly(8))
+                if len(message) + n > MAX_MESSAGE_SIZE:
+                    self.log(f"✗ Stream client {client.peer} message too long, closing")
+                    send_ws(0x8, struct.pack("!H", _WS_CLOSE_TOO_BIG))
+                    return None
+                mask = await reader.readexactly(4) if b1 & 0x80 else None
+                payload = await reader.readexactly(n)
+                if mask:
+                    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+                if opcode == 0x8:    # close
+                    send_ws(0x8, payload[:2])
+                    return None
+                if opcode == 0x9:    # ping
+                    send_ws(0xA, payload)
+                    continue
+                if opcode == 0xA:    # pong
+                    continue
+                message += payload
+                if b0 & 0x80:
+                    return message.decode(errors="replace")
+
+        await self._serve(client, writer, lambda frame: send_ws(0x2, frame), read_message)
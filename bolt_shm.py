@@ -0,0 +1,282 @@
+"""
+Shared-memory ring buffer carrying the live sample stream to local processes.
+
+ScrewSystem publishes every decoded sample into a named
+multiprocessing.shared_memory block (default name "bolt_samples"). Readers
+attach by name and get NumPy views straight into the block, with no sockets
+and no copies. Any number of readers can follow the stream at full rate.
+
+Layout, little endian, HEADER_SIZE bytes of header followed by `capacity`
+records of RECORD_SIZE bytes:
+
+    header
+      0   8s   magic        b"BOLTSHM1"
+      8   u2   version      LAYOUT_VERSION
+     10   u2   header_size  128
+     12   u4   record_size  48
+     16   u8   capacity     number of record slots
+     24   u8   write_seq    seq of the last complete record, 0 = none yet
+     32   f8   created      unix time the block was created
+     40   32s  device       BLE address of the connected BOLT, NUL padded
+     72   u4   pid          process id of the publisher
+     76        reserved
+
+    record (slot = (seq - 1) % capacity)
+      0   u8   seq          global sequence number, 0 while the slot is being written
+      8   f8   t            host receive time, unix seconds
+     16   u4   sensor_seq   per-sensor sequence number (bolt_bus.Sample.seq)
+     20   u1   sensor_id    SENSOR_LSM6DSO / SENSOR_STTSH22H / SENSOR_STRAIN_GAUGE
+     21   u1   n            number of valid entries in values
+     22   2x   padding
+     24   6i4  values       raw sensor values (accel xyz + gyro xyz, temp, strain)
+
+The writer zeroes a slot's seq, fills the record, then stores seq and
+finally write_seq. A reader that is lapped by the writer (slower than
+`capacity` samples) skips ahead and counts what it missed in `lost`.
+
+Only one publisher owns a name: a block left behind by a crashed run is
+replaced, one whose publisher pid is still alive raises FileExistsError.
+
+    from bolt_shm import SampleReader
+    with SampleReader() as reader:
+        while True:
+            block = reader.read()        # structured view, may be empty
+            ...                          # use block["t"], block["values"] ...
+"""
+import os
+import struct
+import time
+
+import numpy as np
+from multiprocessing import shared_memory
+
+DEFAULT_SHM_NAME = "bolt_samples"
+DEFAULT_CAPACITY = 1 << 16
+
+MAGIC = b"BOLTSHM1"
+LAYOUT_VERSION = 1
+HEADER_SIZE = 128
+MAX_VALUES = 6
+
+HEADER_STRUCT = struct.Struct("<8sHHIQQd32s")
+WRITE_SEQ_OFFSET = 24
+DEVICE_OFFSET = 40
+PID_STRUCT = struct.Struct("<I")
+PID_OFFSET = 72
+
+RECORD_DTYPE = np.dtype([
+    ("seq", "<u8"),
+    ("t", "<f8"),
+    ("sensor_seq", "<u4"),
+    ("sensor_id", "u1"),
+    ("n", "u1"),
+    ("pad", "u1", 2),
+    ("values", "<i4", MAX_VALUES),
+])
+RECORD_SIZE = RECORD_DTYPE.itemsize
+
+
+class SharedMemoryPublisher:
+    """Owns the shared-memory block, write_batch() is a SampleBus consumer"""
+
+    def __init__(self, name=DEFAULT_SHM_NAME, capacity=DEFAULT_CAPACITY):
+        size = HEADER_SIZE + capacity * RECORD_SIZE
+        try:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            owner = _owner_pid(name)
+            if owner is not None:
+                raise FileExistsError(f"{name} is published by running process {owner}") from None
+            # Left behind by a crashed run
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        self.name = name
+        self.capacity = capacity
+        self.seq = 0
+        HEADER_STRUCT.pack_into(
+            self.shm.buf, 0, MAGIC, LAYOUT_VERSION, HEADER_SIZE, RECORD_SIZE, capacity, 0, time.time(), b""
+        )
+        PID_STRUCT.pack_into(self.shm.buf, PID_OFFSET, os.getpid())
+        self._write_seq = np.ndarray((1,), "<u8", self.shm.buf, WRITE_SEQ_OFFSET)
+        self._records = np.ndarray((capacity,), RECORD_DTYPE, self.shm.buf, HEADER_SIZE)
+
+    def set_device(self, address):
+        self.shm.buf[DEVICE_OFFSET:DEVICE_OFFSET + 32] = (address or "").encode()[:32].ljust(32, b"\0")
+
+    def write_batch(self, batch):
+        """Append a list of bolt_bus.Sample"""
+        n = len(batch)
+        if not n:
+            return
+        if n > self.capacity:
+            batch = batch[-self.capacity:]
+            self.seq += n - self.capacity
+            n = self.capacity
+
+        block = np.zeros(n, RECORD_DTYPE)
+        block["seq"] = np.arange(self.seq + 1, self.seq + n + 1)
+        block["t"] = [sample.t for sample in batch]
+        block["sensor_seq"] = [sample.seq for sample in batch]
+        block["sensor_id"] = [sample.sensor_id for sample in batch]
+        for i, sample in enumerate(batch):
+            values = sample.values[:MAX_VALUES]
+            block["n"][i] = len(values)
+            block["values"][i, :len(values)] = values
+
+        start = self.seq % self.capacity
+        first = min(n, self.capacity - start)
+        for dst, src in ((self._records[start:start + first], block[:first]),
+                         (self._records[:n - first], block[first:])):
+            if len(src):
+                dst["seq"] = 0
+                seqs = src["seq"].copy()
+                src["seq"] = 0
+                dst[...] = src
+                dst["seq"] = seqs
+
+        self.seq += n
+        self._write_seq[0] = self.seq
+
+    def close(self):
+        # Views must go before the mapping can be closed
+        self._records = None
+        self._write_seq = None
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers attached blocks with the resource tracker,
+        # which would unlink the publisher's block when this reader exits
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+
+def _pid_alive(pid):
+    if os.name == "nt":
+        # Windows frees a block with its last handle, so an existing one is in use
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _owner_pid(name):
+    """Pid of the live publisher of an existing block `name`, None when it is stale"""
+    shm = _attach(name)
+    try:
+        if bytes(shm.buf[:len(MAGIC)]) != MAGIC or shm.size < HEADER_SIZE:
+            return None
+        pid, = PID_STRUCT.unpack_from(shm.buf, PID_OFFSET)
+    finally:
+        shm.close()
+    return pid if pid and _pid_alive(pid) else None
+
+
+class SampleReader:
+    """
+    Attach to a running publisher by name.
+
+    read() returns a structured view (RECORD_DTYPE) of the next contiguous
+    run of new records. The view aliases the ring, so copy what must outlive
+    the next `capacity` samples, or check lapped(view) after using it.
+    """
+
+    def __init__(self, name=DEFAULT_SHM_NAME, from_oldest=False):
+        self.shm = _attach(name)
+        magic, version, header_size, record_size, capacity, _, created, _ = \
+            HEADER_STRUCT.unpack_from(self.shm.buf, 0)
+        if magic != MAGIC or version != LAYOUT_VERSION or record_size != RECORD_SIZE:
+            self.shm.close()
+            raise ValueError(f"{name} is not a BOLT sample ring (magic {magic!r}, version {version})")
+
+        self.name = name
+        self.capacity = capacity
+        self.created = created
+        self.lost = 0
+        self._handed = {}  # first slot of a returned view -> the seq it held then
+        self._write_seq = np.ndarray((1,), "<u8", self.shm.buf, WRITE_SEQ_OFFSET)
+        self._records = np.ndarray((capacity,), RECORD_DTYPE, self.shm.buf, header_size)
+
+        head = int(self._write_seq[0])
+        self.next_seq = max(1, head - capacity + 1) if from_oldest else head + 1
+
+    @property
+    def device(self):
+        return bytes(self.shm.buf[DEVICE_OFFSET:DEVICE_OFFSET + 32]).rstrip(b"\0").decode(errors="replace")
+
+    def available(self):
+        return int(self._write_seq[0]) - self.next_seq + 1
+
+    def read(self, max_records=None):
+        head = int(self._write_seq[0])
+        if head - self.next_seq + 1 > self.capacity:
+            # Lapped by the writer, jump to the oldest record still in the ring
+            oldest = head - self.capacity + 1
+            self.lost += oldest - self.next_seq
+            self.next_seq = oldest
+
+        n = head - self.next_seq + 1
+        start = (self.next_seq - 1) % self.capacity
+        n = min(n, self.capacity - start)
+        if max_records is not None:
+            n = min(n, max_records)
+        if n <= 0:
+            return self._records[:0]
+
+        view = self._records[start:start + n]
+        self._handed[start] = self.next_seq
+        self.next_seq += n
+        return view
+
+    def lapped(self, view):
+        """
+        True when the writer has started overwriting a view returned by read().
+        The view aliases the ring, so its own seq column can't tell; the writer
+        overwrites in seq order, so the view's first slot changes first.
+        """
+        if not len(view):
+            return False
+        start = (view.__array_interface__["data"][0] - self._records.__array_interface__["data"][0]) // RECORD_SIZE
+        first = self._handed.get(start)
+        if first is None:
+            raise ValueError("not a view returned by read()")
+        return int(view["seq"][0]) != first or int(self._write_seq[0]) - first >= self.capacity
+
+    def poll(self, timeout=None, interval=0.005):
+        """read(), waiting up to `timeout` seconds for new records"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            view = self.read()
+            if len(view) or (deadline is not None and time.monotonic() >= deadline):
+                return view
+            time.sleep(interval)
+
+    def close(self):
+        self._records = None
+        self._write_seq = None
+        self.shm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,308 @@
+"""
+Soak-test monitor for shift-long runs.
+
+Every `interval` seconds a background thread collects a row of metrics:
+process RSS, tracemalloc current size, thread count, plus whatever the app
+probes return (Tk log line count and pending after() callbacks, Tk and
+event-loop lag, notification handler latency, throughput). Rows go to a
+CSV in ~/ScrewSystem/soak, the top tracemalloc growth since the previous
+row to a side .txt file, and every metric is checked for monotonic growth
+over the last GROWTH_WINDOW rows.
+
+SimulatedStream feeds synthetic 0x20 frames through the real notification
+handler on the BLE loop, so the whole pipeline can be soaked without a
+device.
+"""
+import asyncio
+import csv
+import gc
+import math
+import os
+import struct
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from bolt_protocol import (
+    NOTIF_SENSOR_DATA, SENSOR_LSM6DSO, SENSOR_STTSH22H, SENSOR_STRAIN_GAUGE, SENSOR_DATA_RATE_HZ, STRAIN_ADC_MAX,
+)
+
+DEFAULT_SOAK_DIR = os.path.join(os.path.expanduser("~"), "ScrewSystem", "soak")
+SOAK_INTERVAL = 60.0
+GROWTH_WINDOW = 15          # rows the trend is judged on
+GROWTH_RISING_SHARE = 0.8   # share of steps that must not decrease
+TRACEMALLOC_FRAMES = 5
+TOP_ALLOCATIONS = 10
+STOP_TIMEOUT = 1.0          # seconds stop() waits for the monitor thread
+
+# Metrics whose growth is expected and never flagged
+NOT_LEAKS = {"elapsed_s", "traced_peak_mb"}
+
+
+def rss_bytes():
+    """Resident set size of this process, None where it cannot be read"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def call_and_time(schedule, fn, timeout=5.0):
+    """
+    Run fn() via schedule (root.after(0, ...) or loop.call_soon_threadsafe)
+    and wait for it. Returns (lag_ms until fn started, fn's result), lag None on timeout.
+    """
+    done = threading.Event()
+    out = {}
+    started = time.perf_counter()
+
+    def _run():
+        out["lag"] = (time.perf_counter() - started) * 1000.0
+        try:
+            out["result"] = fn()
+        finally:
+            done.set()
+
+    schedule(_run)
+    if not done.wait(timeout):
+        return None, None
+    return out["lag"], out.get("result")
+
+
+def growth(values):
+    """
+    Slope per hour of the last GROWTH_WINDOW (elapsed_s, value) points when
+    they rise steadily, otherwise None.
+    """
+    points = [(t, v) for t, v in values[-GROWTH_WINDOW:] if v is not None]
+    if len(points) < GROWTH_WINDOW:
+        return None
+    t, v = np.array(points, dtype=float).T
+    steps = np.diff(v)
+    if not steps.any() or (steps >= 0).mean() < GROWTH_RISING_SHARE or v[-1] <= v[0]:
+        return None
+    slope = np.polyfit(t, v, 1)[0]
+    return float(slope) * 3600.0 if slope > 0 else None
+
+
+class SoakMonitor:
+    """
+    probes: callables returning {metric: value}, called on the monitor thread.
+    on_row(row, flagged) is called after every row; flagged maps metric -> growth per hour.
+    """
+
+    def __init__(self, probes, log, interval=SOAK_INTERVAL, directory=DEFAULT_SOAK_DIR, on_row=None):
+        self.probes = list(probes)
+        self.log = log
+        self.interval = interval
+        self.directory = directory
+        self.on_row = on_row
+
+        self.history = {}
+        self.flagged = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._snapshot = None
+        self._started_tracemalloc = False
+        self.csv_path = None
+        self.alloc_path = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive() and not self._stop.is_set()
+
+    def start(self):
+        if self.running:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            raise RuntimeError("previous soak run is still finishing its last row")
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.csv_path = os.path.join(self.directory, f"soak-{stamp}.csv")
+        self.alloc_path = os.path.join(self.directory, f"soak-{stamp}-alloc.txt")
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        self._snapshot = tracemalloc.take_snapshot()
+        self.history = {}
+        self.flagged = {}
+        self._t0 = time.monotonic()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="soak-monitor", daemon=True)
+        self._thread.start()
+        self.log(f"✓ Soak monitor started, every {self.interval:.0f} s → {self.csv_path}")
+
+    def stop(self, timeout=STOP_TIMEOUT):
+        """
+        Called from the Tk thread, so only wait briefly: a probe may be waiting
+        on Tk itself. The monitor thread cleans up when its current row is done.
+        """
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        header = None
+        try:
+            with open(self.csv_path, "w", newline="") as f:
+                writer = csv.writer(f)
+                while not self._stop.wait(self.interval):
+                    row = self._collect()
+                    if header is None:
+                        header = list(row)
+                        writer.writerow(header)
+                    writer.writerow([row.get(k, "") for k in header])
+                    f.flush()
+                    self._check_growth(row)
+                    if self.on_row:
+                        self.on_row(row, dict(self.flagged))
+        except Exception as e:
+            self.log(f"✗ Soak monitor failed: {e!r}")
+        finally:
+            self._stop.set()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+            self._snapshot = None
+            hours = (time.monotonic() - self._t0) / 3600.0
+            self.log(f"Soak monitor stopped after {hours:.2f} h, {len(self.flagged)} metric(s) flagged")
+
+    def _collect(self):
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        row = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "elapsed_s": round(time.monotonic() - self._t0, 1),
+            "rss_mb": None,
+            "traced_mb": round(traced / 2**20, 3),
+            "traced_peak_mb": round(traced_peak / 2**20, 3),
+            "threads": threading.active_count(),
+        }
+        rss = rss_bytes()
+        if rss is not None:
+            row["rss_mb"] = round(rss / 2**20, 2)
+        row["gc_objects"] = len(gc.get_objects())
+
+        for probe in self.probes:
+            try:
+                row.update(probe())
+            except Exception as e:
+                self.log(f"✗ Soak probe {getattr(probe, '__name__', probe)} failed: {e}")
+
+        self._write_allocations(row["time"])
+        return row
+
+    def _write_allocations(self, when):
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        top = snapshot.compare_to(self._snapshot, "lineno")[:TOP_ALLOCATIONS]
+        self._snapshot = snapshot
+        with open(self.alloc_path, "a", encoding="utf-8") as f:
+            f.write(f"--- {when}\n")
+            for stat in top:
+                f.write(f"{stat}\n")
+
+    def _check_growth(self, row):
+        elapsed = row["elapsed_s"]
+        for key, value in row.items():
+            if key in NOT_LEAKS or not isinstance(value, (int, float)) or isinstance(value, bool):
+                continue
+            if isinstance(value, float) and math.isnan(value):
+                continue
+            history = self.history.setdefault(key, [])
+            history.append((elapsed, value))
+            del history[:-GROWTH_WINDOW]
+
+            rate = growth(history)
+            if rate is not None and key not in self.flagged:
+                self.flagged[key] = rate
+                self.log(f"⚠ Soak: {key} rising steadily, {rate:+.3g}/h over the last {GROWTH_WINDOW} samples "
+                         f"(now {value})")
+            elif rate is None and key in self.flagged:
+                del self.flagged[key]
+                self.log(f"Soak: {key} no longer rising (now {value})")
+
+
+def profiler_probe(profiler, stages=("receive",)):
+    """Probe with the mean and call count of profiler stages since the previous row"""
+    last = {}
+
+    def probe():
+        row = {}
+        for stage in stages:
+            count, total_ns = profiler.totals(stage)
+            prev_count, prev_total = last.get(stage, (0, 0))
+            last[stage] = (count, total_ns)
+            n = count - prev_count
+            row[f"{stage}_per_s"] = n
+            row[f"{stage}_mean_us"] = round((total_ns - prev_total) / n / 1e3, 2) if n > 0 else None
+        return row
+
+    probe.__name__ = "profiler"
+    return probe
+
+
+class SimulatedStream:
+    """Synthetic sensor notifications pushed through `handler` on `loop` at SENSOR_DATA_RATE_HZ"""
+
+    def __init__(self, loop, handler, rate_hz=SENSOR_DATA_RATE_HZ,
+                 sensors=(SENSOR_LSM6DSO, SENSOR_STTSH22H, SENSOR_STRAIN_GAUGE)):
+        self.loop = loop
+        self.handler = handler
+        self.rate_hz = rate_hz
+        self.sensors = tuple(sensors)
+        self._future = None
+
+    @property
+    def running(self):
+        return self._future is not None and not self._future.done()
+
+    def start(self):
+        if not self.running:
+            self._future = asyncio.run_coroutine_threadsafe(self._run(), self.loop)
+
+    def stop(self):
+        if self._future:
+            self._future.cancel()
+            self._future = None
+
+    @staticmethod
+    def frame(sensor_id, n):
+        t = n / SENSOR_DATA_RATE_HZ
+        if sensor_id == SENSOR_LSM6DSO:
+            accel = [int(2000 * math.sin(2 * math.pi * 1.2 * t + k)) for k in range(3)]
+            accel[2] += 8197  # 1 g at ±4 g
+            # At rest: a small zero-mean wobble, about ±0.2 dps at ±250 dps
+            gyro = [int(20 * math.sin(2 * math.pi * 0.7 * t + k)) for k in range(3)]
+            values = accel + gyro
+            return bytes([NOTIF_SENSOR_DATA, sensor_id]) + struct.pack(">6h", *values)
+        if sensor_id == SENSOR_STTSH22H:
+            return bytes([NOTIF_SENSOR_DATA, sensor_id]) + struct.pack(">h", 25 + int(3 * math.sin(t / 60)))
+        # 12-bit ADC: unloaded around 1200 counts, a 3 s tightening pulse up to ~3400 every 20 s
+        value = 1200 + int(40 * math.sin(t))
+        phase = t % 20.0
+        if phase < 3.0:
+            value += int(2200 * math.sin(math.pi * phase / 3.0))
+        return bytes([NOTIF_SENSOR_DATA, sensor_id]) + struct.pack(">H", min(max(value, 0), STRAIN_ADC_MAX))
+
+    async def _run(self):
+        period = 1.0 / self.rate_hz
+        n = 0
+        next_t = time.monotonic()
+        while True:
+            for sensor_id in self.sensors:
+                self.handler(None, self.frame(sensor_id, n))
+            n += 1
+            next_t += period
+            await asyncio.sleep(max(0.0, next_t - time.monotonic()))
@@ -0,0 +1,146 @@
+"""Streaming vibration spectrum analysis for the LSM6DSO accel/gyro stream."""
+import threading
+
+import numpy as np
+
+from bolt_protocol import SENSOR_DATA_RATE_HZ
+
+LSM6DSO_AXES = ("accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z")
+
+LSM6DSO_SAMPLE_RATE_HZ = SENSOR_DATA_RATE_HZ
+
+# Default bands in Hz, low/mid/high thirds of the 5 Hz Nyquist range
+DEFAULT_BANDS = ((0.2, 1.5), (1.5, 3.0), (3.0, 5.0))
+
+
+class VibrationSpectrum:
+    """
+    Windowed, overlapping FFT over the 6-axis LSM6DSO stream.
+
+    Samples are pushed one at a time from the notification handler. Every
+    `hop` samples a Hann-windowed frame of `window_size` samples is FFT'd on
+    all six axes at once, the frame PSD is folded into a Welch average over
+    the last `segments` frames, and band energies are recomputed.
+    band_limits: optional {band_index: threshold} applied to every axis,
+    an alert is returned once when a band energy rises above its threshold.
+    """
+
+    def __init__(self, sample_rate=LSM6DSO_SAMPLE_RATE_HZ, window_size=64, overlap=0.5,
+                 segments=4, bands=DEFAULT_BANDS, band_limits=None, history=120):
+        if not 0.0 <= overlap < 1.0:
+            raise ValueError("overlap must be in [0, 1)")
+        self.sample_rate = float(sample_rate)
+        self.window_size = int(window_size)
+        self.hop = max(1, int(round(self.window_size * (1.0 - overlap))))
+        self.bands = tuple(bands)
+        self.band_limits = dict(band_limits or {})
+
+        n_axes = len(LSM6DSO_AXES)
+        # Every sample is written twice so the last window is always one contiguous slice
+        self._buf = np.zeros((2 * self.window_size, n_axes), dtype=np.float64)
+        self._pos = 0
+        self._filled = 0
+        self._since_frame = 0
+
+        self._window = np.hanning(self.window_size)
+        # PSD scaling for a one-sided density in units^2/Hz
+        self._scale = 1.0 / (self.sample_rate * np.sum(self._window ** 2))
+        self.freqs = np.fft.rfftfreq(self.window_size, d=1.0 / self.sample_rate)
+        self._df = self.freqs[1] - self.freqs[0]
+        self._band_masks = np.array(
+            [(self.freqs >= lo) & (self.freqs < hi) for lo, hi in self.bands], dtype=bool
+        )
+
+        n_bins = len(self.freqs)
+        self._frames = np.zeros((segments, n_bins, n_axes))
+        self._frame_count = 0
+        self.welch = np.zeros((n_bins, n_axes))
+        self.band_energy = np.zeros((len(self.bands), n_axes))
+        self._alarmed = np.zeros((len(self.bands), n_axes), dtype=bool)
+
+        # Spectrogram ring: one column per frame
+        self._spectrogram = np.zeros((history, n_bins, n_axes))
+        self._spec_pos = 0
+        self._spec_count = 0
+
+        self._lock = threading.Lock()
+        self._generation = 0  # bumped by reset(), frames taken before it are discarded
+
+    def reset(self):
+        with self._lock:
+            self._generation += 1
+            self._buf[:] = 0.0
+            self._pos = self._filled = self._since_frame = 0
+            self._frames[:] = 0.0
+            self._frame_count = 0
+            self.welch[:] = 0.0
+            self.band_energy[:] = 0.0
+            self._alarmed[:] = False
+            self._spectrogram[:] = 0.0
+            self._spec_pos = self._spec_count = 0
+
+    def push(self, values):
+        """Add one 6-axis sample, returns a list of (axis, band, energy) alerts"""
+        n = self.window_size
+        # push() runs on the bus thread, reset() on the BLE loop
+        with self._lock:
+            self._buf[self._pos] = values
+            self._buf[self._pos + n] = values
+            self._pos = (self._pos + 1) % n
+            self._filled = min(self._filled + 1, n)
+            self._since_frame += 1
+
+            if self._filled < n or self._since_frame < self.hop:
+                return []
+            self._since_frame = 0
+            frame = self._buf[self._pos:self._pos + n].copy()
+            generation = self._generation
+        return self._process_frame(frame, generation)
+
+    def _process_frame(self, frame, generation):
+        # Remove per-axis DC (gravity on accel, bias on gyro) before windowing
+        frame = frame - frame.mean(axis=0)
+        spectrum = np.fft.rfft(frame * self._window[:, None], axis=0)
+        psd = (spectrum.real ** 2 + spectrum.imag ** 2) * self._scale
+        psd[1:-1] *= 2.0
+
+        with self._lock:
+            if generation != self._generation:
+                return []
+            segments = self._frames.shape[0]
+            self._frames[self._frame_count % segments] = psd
+            self._frame_count += 1
+            used = min(self._frame_count, segments)
+            self.welch = self._frames[:used].mean(axis=0)
+            # (bands x bins) @ (bins x axes) -> (bands x axes)
+            self.band_energy = (self._band_masks @ self.welch) * self._df
+
+            self._spectrogram[self._spec_pos] = psd
+            self._spec_pos = (self._spec_pos + 1) % self._spectrogram.shape[0]
+            self._spec_count = min(self._spec_count + 1, self._spectrogram.shape[0])
+
+            return self._check_limits()
+
+    def _check_limits(self):
+        alerts = []
+        for band, limit in self.band_limits.items():
+            over = self.band_energy[band] > limit
+            rising = over & ~self._alarmed[band]
+            for axis in np.flatnonzero(rising):
+                alerts.append((LSM6DSO_AXES[axis], self.bands[band], float(self.band_energy[band, axis])))
+            self._alarmed[band] = over
+        return alerts
+
+    def spectrogram(self, axes=slice(0, 3)):
+        """Return (freqs, columns) with columns oldest-first, PSD summed over `axes`"""
+        with self._lock:
+            count = self._spec_count
+            start = (self._spec_pos - count) % self._spectrogram.shape[0]
+            idx = (start + np.arange(count)) % self._spectrogram.shape[0]
+            columns = self._spectrogram[idx][:, :, axes].sum(axis=2)
+        return self.freqs, columns
+
+    def snapshot(self):
+        """Copy of the current Welch PSD and band energies for display"""
+        with self._lock:
+            return self.welch.copy(), self.band_energy.copy()
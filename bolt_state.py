@@ -0,0 +1,105 @@
+"""
+Observable UI state shared between the asyncio BLE thread and the Tk thread.
+
+The BLE side writes with StateStore.set(), several keys at once under one
+lock so readers never see half of a change. The GUI binds a render function
+through WidgetBinder: changes are coalesced into one frame, render() maps the
+whole state to the desired widget options, and only options that differ from
+what was last applied reach Tk.
+"""
+import threading
+
+from bolt_profile import PROFILER
+
+FRAME_MS = 16
+
+
+class StateStore:
+    def __init__(self, **initial):
+        self._state = dict(initial)
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._subscribers = []
+
+    def __getitem__(self, key):
+        with self._lock:
+            return self._state[key]
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._state.get(key, default)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._state)
+
+    def set(self, **changes):
+        """Apply all changes atomically, subscribers are woken only if something differs"""
+        with self._lock:
+            changed = False
+            for key, value in changes.items():
+                if self._state.get(key, _MISSING) != value:
+                    self._state[key] = value
+                    self._dirty.add(key)
+                    changed = True
+            subscribers = list(self._subscribers) if changed else ()
+        for callback in subscribers:
+            callback()
+
+    def take_changes(self):
+        """Keys changed since the last call, with a consistent snapshot of the state"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            return dirty, dict(self._state)
+
+    def subscribe(self, callback):
+        """callback() is called from the writing thread after each effective change"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+
+_MISSING = object()
+
+
+class WidgetBinder:
+    """
+    Applies render(state) -> {widget: {option: value}} to Tk widgets.
+
+    schedule is root.after; at most one flush is pending per frame no matter
+    how many set() calls happen in between.
+    """
+
+    def __init__(self, schedule, store, render, frame_ms=FRAME_MS):
+        self._schedule = schedule
+        self._store = store
+        self._render = render
+        self._frame_ms = frame_ms
+        self._pending = False
+        self._pending_lock = threading.Lock()
+        self._applied = {}
+        store.subscribe(self.request_frame)
+
+    def request_frame(self):
+        with self._pending_lock:
+            if self._pending:
+                return
+            self._pending = True
+        self._schedule(self._frame_ms, self.flush)
+
+    def flush(self):
+        """Render and apply the diff, must run on the Tk thread"""
+        with self._pending_lock:
+            self._pending = False
+        dirty, state = self._store.take_changes()
+        if dirty or not self._applied:
+            t0 = PROFILER.start()
+            self.apply(self._render(state))
+            PROFILER.stop("ui_apply", t0)
+
+    def apply(self, desired):
+        for widget, options in desired.items():
+            applied = self._applied.setdefault(widget, {})
+            diff = {k: v for k, v in options.items() if applied.get(k, _MISSING) != v}
+            if diff:
+                widget.config(**diff)
+                applied.update(diff)
@@ -0,0 +1,322 @@
+"""
+Multi-resolution time-series store for recorded BOLT sessions.
+
+Layout on disk:
+    <root>/<device>/<session>/meta.json
+    <root>/<device>/<session>/<channel>.bch          raw samples, compressed chunks (bolt_chunks.py)
+    <root>/<device>/<session>/<channel>.<res>s       min/max/mean rollups
+
+Raw samples are delta encoded and compressed per chunk on a background
+thread; the chunk index lets range reads decompress only the chunks they
+overlap. Sessions recorded before that have an uncompressed <channel>.raw
+instead, which is still read.
+
+Rollup files are flat arrays of fixed-size little-endian records appended
+in time order, so their time column is its own index: readers memory-map
+the file and binary-search the timestamps, touching only the pages of the
+requested range. Range queries read the finest level whose point count
+fits the caller's budget, so zoomed-out views only touch rollups.
+"""
+import json
+import os
+import struct
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from bolt_protocol import SENSOR_LSM6DSO, SENSOR_STTSH22H, SENSOR_STRAIN_GAUGE
+from bolt_chunks import ChunkWriter, ChunkReader, ChunkCompressor, DEFAULT_CHUNK_SAMPLES
+
+DEFAULT_STORE_DIR = os.path.join(os.path.expanduser("~"), "ScrewSystem", "sessions")
+
+# Rollup resolutions in seconds
+DEFAULT_RESOLUTIONS = (1, 60, 3600)
+
+# Raw chunk compression: "zlib" (fast) or "lzma" (smaller, slower)
+DEFAULT_CODEC = "zlib"
+
+# sensor_id -> (channel name, value fields)
+CHANNELS = {
+    SENSOR_LSM6DSO: ("lsm6dso", ("accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z")),
+    SENSOR_STTSH22H: ("stt22h", ("temp",)),
+    SENSOR_STRAIN_GAUGE: ("strain", ("raw",)),
+}
+CHANNEL_FIELDS = {name: fields for name, fields in CHANNELS.values()}
+
+
+def raw_dtype(fields):
+    return np.dtype([("t", "<f8")] + [(f, "<f4") for f in fields])
+
+
+def rollup_dtype(fields):
+    cols = [("t", "<f8"), ("n", "<u4")]
+    for f in fields:
+        cols += [(f + "_min", "<f8"), (f + "_max", "<f8"), (f + "_mean", "<f8")]
+    return np.dtype(cols)
+
+
+def _safe_name(text):
+    return "".join(c if c.isalnum() or c in "-_." else "-" for c in str(text))
+
+
+def _read_records(path, dtype):
+    """Memory-map a record file, empty array if missing or empty"""
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return np.empty(0, dtype=dtype)
+    count = size // dtype.itemsize
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+def _read_chunks(path, dtype, t0=None, t1=None):
+    """Raw records in [t0, t1) from a .bch file, empty array if missing"""
+    if not os.path.exists(path):
+        return np.empty(0, dtype=dtype)
+    with ChunkReader(path) as reader:
+        t, values = reader.read(t0, t1)
+    records = np.empty(len(t), dtype=dtype)
+    records["t"] = t
+    for i, name in enumerate(dtype.names[1:]):
+        records[name] = values[:, i]
+    return records
+
+
+class _Rollup:
+    """Running min/max/sum for the bucket currently being filled"""
+    __slots__ = ("bucket", "n", "mins", "maxs", "sums")
+
+    def __init__(self, width):
+        self.bucket = None
+        self.n = 0
+        self.mins = [0.0] * width
+        self.maxs = [0.0] * width
+        self.sums = [0.0] * width
+
+    def start(self, bucket, values):
+        self.bucket = bucket
+        self.n = 1
+        self.mins = list(values)
+        self.maxs = list(values)
+        self.sums = [float(v) for v in values]
+
+    def add(self, values):
+        self.n += 1
+        for i, v in enumerate(values):
+            if v < self.mins[i]:
+                self.mins[i] = v
+            elif v > self.maxs[i]:
+                self.maxs[i] = v
+            self.sums[i] += v
+
+    def pack(self, packer):
+        cols = []
+        for lo, hi, total in zip(self.mins, self.maxs, self.sums):
+            cols += (lo, hi, total / self.n)
+        return packer.pack(self.bucket, self.n, *cols)
+
+
+class SessionWriter:
+    """Append-only writer for one device session, fed from the notification path"""
+
+    def __init__(self, path, resolutions=DEFAULT_RESOLUTIONS, codec=DEFAULT_CODEC,
+                 chunk_samples=DEFAULT_CHUNK_SAMPLES):
+        self.path = path
+        self.resolutions = tuple(resolutions)
+        self.codec = codec
+        self.chunk_samples = chunk_samples
+        self._compressor = ChunkCompressor()
+        self._raw = {}
+        self._files = {}
+        self._packers = {}
+        self._rollups = {}
+        self._lock = threading.Lock()
+        self.closed = False
+
+    def _open_channel(self, name):
+        fields = CHANNEL_FIELDS[name]
+        self._raw[name] = ChunkWriter(
+            os.path.join(self.path, f"{name}.bch"), len(fields),
+            codec=self.codec, chunk_samples=self.chunk_samples, compressor=self._compressor,
+        )
+        files = {}
+        packers = {}
+        rollups = {}
+        for res in self.resolutions:
+            files[res] = open(os.path.join(self.path, f"{name}.{res}s"), "ab")
+            packers[res] = struct.Struct("<dI" + "ddd" * len(fields))
+            rollups[res] = _Rollup(len(fields))
+        self._files[name] = files
+        self._packers[name] = packers
+        self._rollups[name] = rollups
+        return files
+
+    def append(self, sensor_id, t, values):
+        """Write one decoded sample; t is a unix timestamp in seconds"""
+        name = CHANNELS[sensor_id][0]
+        with self._lock:
+            if self.closed:
+                return
+            files = self._files.get(name) or self._open_channel(name)
+            packers = self._packers[name]
+            self._raw[name].append(t, values)
+
+            for res, rollup in self._rollups[name].items():
+                bucket = t - (t % res)
+                if rollup.bucket == bucket:
+                    rollup.add(values)
+                    continue
+                if rollup.bucket is not None:
+                    files[res].write(rollup.pack(packers[res]))
+                rollup.start(bucket, values)
+
+    def flush(self):
+        with self._lock:
+            if self.closed:
+                return
+            for files in self._files.values():
+                for f in files.values():
+                    f.flush()
+            for raw in self._raw.values():
+                raw.flush()
+
+    def close(self, **meta):
+        """Write the partially filled buckets and close all files; meta is merged into meta.json"""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            for name, files in self._files.items():
+                for res, rollup in self._rollups[name].items():
+                    if rollup.bucket is not None:
+                        files[res].write(rollup.pack(self._packers[name][res]))
+                for f in files.values():
+                    f.close()
+            try:
+                for raw in self._raw.values():
+                    raw.close()
+            finally:
+                self._compressor.close()
+            meta_path = os.path.join(self.path, "meta.json")
+            with open(meta_path) as f:
+                info = json.load(f)
+            info.update(meta)
+            info["closed"] = datetime.now().isoformat(timespec="seconds")
+            with open(meta_path, "w") as f:
+                json.dump(info, f, indent=2)
+
+
+class TimeSeriesStore:
+    """Partitioned store: one directory per device, one sub-directory per session"""
+
+    def __init__(self, root, resolutions=DEFAULT_RESOLUTIONS, codec=DEFAULT_CODEC):
+        self.root = root
+        self.resolutions = tuple(sorted(resolutions))
+        self.codec = codec
+
+    def open_session(self, device, session=None, **meta):
+        """Create a new session directory for `device` and return its writer"""
+        base = session or datetime.now().strftime("%Y%m%d-%H%M%S")
+        session, n = base, 1
+        while True:
+            # A reconnect within the same second must not reuse the previous session
+            path = os.path.join(self.root, _safe_name(device), _safe_name(session))
+            try:
+                os.makedirs(path)
+                break
+            except FileExistsError:
+                n += 1
+                session = f"{base}-{n}"
+        info = {
+            "device": device,
+            "session": session,
+            "opened": datetime.now().isoformat(timespec="seconds"),
+            "resolutions": list(self.resolutions),
+            "raw_format": f"bch/{self.codec}",
+        }
+        info.update(meta)
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(info, f, indent=2)
+        return SessionWriter(path, self.resolutions, codec=self.codec)
+
+    def devices(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def sessions(self, device):
+        path = os.path.join(self.root, _safe_name(device))
+        if not os.path.isdir(path):
+            return []
+        return sorted(
+            s for s in os.listdir(path) if os.path.isfile(os.path.join(path, s, "meta.json"))
+        )
+
+    def session_path(self, device, session):
+        return os.path.join(self.root, _safe_name(device), _safe_name(session))
+
+    def read_level(self, device, session, channel, resolution=0, t0=None, t1=None):
+        """
+        Records of one level (0 = raw) for one session. Rollups are
+        memory-mapped; raw chunks are decompressed, only those overlapping
+        [t0, t1) when a window is given.
+        """
+        fields = CHANNEL_FIELDS[channel]
+        base = os.path.join(self.session_path(device, session), channel)
+        if resolution == 0:
+            if os.path.exists(base + ".raw"):
+                return _read_records(base + ".raw", raw_dtype(fields))
+            return _read_chunks(base + ".bch", raw_dtype(fields), t0, t1)
+        return _read_records(f"{base}.{resolution}s", rollup_dtype(fields))
+
+    def _raw_count(self, device, session, channel, t0, t1):
+        base = os.path.join(self.session_path(device, session), channel)
+        if os.path.exists(base + ".bch"):
+            with ChunkReader(base + ".bch") as reader:
+                return reader.count(t0, t1)
+        rec = self.read_level(device, session, channel)
+        lo, hi = np.searchsorted(rec["t"], (t0, t1))
+        return hi - lo
+
+    @staticmethod
+    def _window(t, resolution, t0, t1):
+        """
+        Index range of records overlapping [t0, t1). Rollup records are keyed
+        by bucket start, so the bucket holding t0 starts up to one bucket earlier.
+        """
+        if resolution:
+            return np.searchsorted(t, t0 - resolution, side="right"), np.searchsorted(t, t1)
+        return np.searchsorted(t, (t0, t1))
+
+    def query(self, device, channel, t0, t1, max_points=2000, sessions=None):
+        """
+        Samples of `channel` with t0 <= t < t1 across the device sessions.
+        Returns (resolution, records): resolution 0 means raw samples,
+        otherwise rollup records of that many seconds, the finest level
+        that fits in max_points.
+        """
+        sessions = self.sessions(device) if sessions is None else sessions
+        raw_count = sum(self._raw_count(device, session, channel, t0, t1) for session in sessions)
+
+        resolution = 0
+        if raw_count > max_points:
+            resolution = self.resolutions[-1]
+            for res in self.resolutions:
+                if (t1 - t0) / res <= max_points:
+                    resolution = res
+                    break
+
+        parts = []
+        for session in sessions:
+            rec = self.read_level(device, session, channel, resolution, t0, t1)
+            if len(rec):
+                lo, hi = self._window(rec["t"], resolution, t0, t1)
+                if hi > lo:
+                    parts.append(np.array(rec[lo:hi]))
+        if not parts:
+            dtype = raw_dtype(CHANNEL_FIELDS[channel]) if resolution == 0 else rollup_dtype(CHANNEL_FIELDS[channel])
+            return resolution, np.empty(0, dtype=dtype)
+        return resolution, np.concatenate(parts)
@@ -0,0 +1,160 @@
+"""
+Watchdog for the asyncio BLE loop.
+
+A heartbeat coroutine sleeps `interval` seconds in a loop; how late each
+wake-up is becomes the scheduling lag, kept in a rolling window for
+percentiles. A separate thread watches the heartbeat: when it is late by
+more than `slow_ms`, it snapshots the loop thread's stack. The snapshot
+shows what blocked the loop. It is kept with the stall duration once the
+loop recovers.
+
+run_blocking() moves blocking calls (file reads, session closes) to the
+default executor while OFFLOAD_BLOCKING is on, so they never hold the loop.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque, namedtuple
+from datetime import datetime
+
+import numpy as np
+
+HEARTBEAT_INTERVAL = 0.05    # seconds
+SLOW_CALLBACK_MS = 100.0
+LAG_WINDOW = 1200            # heartbeats kept for percentiles (~1 min)
+MAX_STALLS = 50
+
+OFFLOAD_BLOCKING = True
+
+Stall = namedtuple("Stall", "when duration_ms stack")
+
+
+async def run_blocking(fn, *args):
+    """fn(*args) on the default executor when OFFLOAD_BLOCKING is set, inline otherwise"""
+    if not OFFLOAD_BLOCKING:
+        return fn(*args)
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+
+def set_offload(on):
+    global OFFLOAD_BLOCKING
+    OFFLOAD_BLOCKING = bool(on)
+
+
+class LoopWatchdog:
+    """
+    loop_thread is the thread running `loop`. on_update(stats) is called
+    about once a second from the watchdog thread.
+    """
+
+    def __init__(self, loop, loop_thread, log, interval=HEARTBEAT_INTERVAL, slow_ms=SLOW_CALLBACK_MS,
+                 on_update=None):
+        self.loop = loop
+        self.loop_thread = loop_thread
+        self.log = log
+        self.interval = interval
+        self.slow_ms = slow_ms
+        self.on_update = on_update
+
+        self.lags = deque(maxlen=LAG_WINDOW)
+        self.stalls = deque(maxlen=MAX_STALLS)
+        self.stall_count = 0
+        self.max_lag_ms = 0.0
+        self._beat = time.monotonic()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._future = None
+        self._thread = None
+
+    def start(self):
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._future = asyncio.run_coroutine_threadsafe(self._heartbeat(), self.loop)
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._future:
+            self._future.cancel()
+            self._future = None
+
+    async def _heartbeat(self):
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag_ms = max(0.0, (now - before - self.interval) * 1000.0)
+            with self._lock:
+                self._beat = now
+                self.lags.append(lag_ms)
+                if lag_ms > self.max_lag_ms:
+                    self.max_lag_ms = lag_ms
+
+    def _watch(self):
+        """Snapshot the loop thread's stack while the heartbeat is overdue"""
+        stalled_since = None
+        stack = None
+        last_update = time.monotonic()
+        tick = min(self.slow_ms / 1000.0 / 2, self.interval)
+        while not self._stop.wait(tick):
+            now = time.monotonic()
+            with self._lock:
+                overdue_ms = (now - self._beat - self.interval) * 1000.0
+
+            if overdue_ms > self.slow_ms and stalled_since is None:
+                stalled_since = self._beat + self.interval
+                frame = sys._current_frames().get(self.loop_thread.ident)
+                stack = "".join(traceback.format_stack(frame)) if frame else "(loop thread not running)"
+            elif overdue_ms <= self.slow_ms and stalled_since is not None:
+                duration_ms = (now - stalled_since) * 1000.0
+                stall = Stall(datetime.now().isoformat(timespec="milliseconds"), duration_ms, stack)
+                with self._lock:
+                    self.stalls.append(stall)
+                    self.stall_count += 1
+                self.log(f"⚠ BLE loop blocked for {duration_ms:.0f} ms in {self._culprit(stack)}")
+                stalled_since = None
+
+            if self.on_update and now - last_update >= 1.0:
+                last_update = now
+                self.on_update(self.stats())
+
+    @staticmethod
+    def _culprit(stack):
+        """Innermost frame of a formatted stack, for the one-line log"""
+        lines = [l.strip() for l in (stack or "").splitlines() if l.strip().startswith("File ")]
+        return lines[-1] if lines else "unknown code"
+
+    def stats(self):
+        with self._lock:
+            lags = np.fromiter(self.lags, dtype=float)
+            stalls = self.stall_count
+            max_lag = self.max_lag_ms
+        if not len(lags):
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "max": max_lag, "stalls": stalls}
+        p50, p95, p99 = np.percentile(lags, (50, 95, 99))
+        return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "max": max_lag, "stalls": stalls}
+
+    def report(self):
+        s = self.stats()
+        with self._lock:
+            stalls = list(self.stalls)
+        lines = [
+            f"BLE loop lag over the last {len(self.lags)} heartbeats: p50 {s['p50']:.1f} ms, "
+            f"p95 {s['p95']:.1f} ms, p99 {s['p99']:.1f} ms, max {s['max']:.1f} ms, "
+            f"{s['stalls']} stall(s) over {self.slow_ms:.0f} ms",
+        ]
+        for stall in stalls:
+            lines.append(f"--- {stall.when} blocked {stall.duration_ms:.0f} ms")
+            lines.append(stall.stack.rstrip())
+        return "\n".join(lines)
+
+    def dump_report(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"loop-{datetime.now():%Y%m%d-%H%M%S}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.report() + "\n")
+        return path
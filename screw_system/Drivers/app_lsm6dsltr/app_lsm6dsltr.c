@@ -47,8 +47,8 @@ HAL_StatusTypeDef LSM6DSL_Init(void)
     status = lsm6dsl_write_reg(LSM6DSL_REG_CTRL1_XL, 0x48);   // ODR=104 Hz, FS=±4g
     if (status != HAL_OK) return status;
 
-    // Gyroscope: 104 Hz, ±500 dps
-    status = lsm6dsl_write_reg(LSM6DSL_REG_CTRL2_G, 0x50);    // ODR=104 Hz, FS=±500 dps
+    // Gyroscope: 104 Hz, ±250 dps
+    status = lsm6dsl_write_reg(LSM6DSL_REG_CTRL2_G, 0x50);    // ODR=104 Hz, FS_G=00: ±250 dps
     if (status != HAL_OK) return status;
 
     // Block Data Update + auto-increment
@@ -81,6 +81,12 @@ typedef struct {
 #define RSSI_REQUEST_PREFIX      	0x40
 #define NOTIF_RSSI_RESPONSE     	0x40
 
+/* Link tuning requested by the desktop application */
+#define LINK_PARAM_REQUEST_PREFIX	0x50	/* [0x50, int_min, int_max, latency, timeout] */
+#define NOTIF_LINK_PARAM_RESPONSE	0x50
+#define PHY_REQUEST_PREFIX			0x51	/* [0x51, tx_phys, rx_phys] */
+#define NOTIF_PHY_RESPONSE			0x51
+
 /* Firmware version - change these numbers as needed */
 #define FW_VERSION_MAJOR            2
 #define FW_VERSION_MINOR            0
@@ -125,6 +131,10 @@ static void P2PS_Start_Sensor(uint8_t sensor_id);
 static void P2PS_Stop_Sensor(uint8_t sensor_id);
 static void P2PS_Send_Version_Response(void);
 static void P2PS_Send_rssi_Response(void);
+static void P2PS_Request_Link_Params(uint8_t interval_min, uint8_t interval_max,
+		uint8_t latency, uint8_t timeout_100ms);
+static void P2PS_Request_Phy(uint8_t tx_phys, uint8_t rx_phys);
+static void P2PS_Send_Link_Response(uint8_t prefix, uint8_t status);
 static void P2PS_Send_Sensor_Status(uint8_t sensor_id, uint8_t status);
 
 /* USER CODE END PFP */
@@ -199,6 +209,22 @@ void P2PS_STM_App_Notification(P2PS_STM_App_Notification_evt_t *pNotification)
 			APP_DBG_MSG("-- RSSI: Request received (0x40)\n\r");
 			P2PS_Send_rssi_Response();
 		}
+
+		else if (pNotification->DataTransfered.Length >= 5&&
+		pNotification->DataTransfered.pPayload[0] == LINK_PARAM_REQUEST_PREFIX) {
+			APP_DBG_MSG("-- LINK: Parameter request received (0x50)\n\r");
+			P2PS_Request_Link_Params(pNotification->DataTransfered.pPayload[1],
+					pNotification->DataTransfered.pPayload[2],
+					pNotification->DataTransfered.pPayload[3],
+					pNotification->DataTransfered.pPayload[4]);
+		}
+
+		else if (pNotification->DataTransfered.Length >= 3&&
+		pNotification->DataTransfered.pPayload[0] == PHY_REQUEST_PREFIX) {
+			APP_DBG_MSG("-- LINK: PHY request received (0x51)\n\r");
+			P2PS_Request_Phy(pNotification->DataTransfered.pPayload[1],
+					pNotification->DataTransfered.pPayload[2]);
+		}
 /* USER CODE END P2PS_STM_WRITE_EVT */
       break;
 
@@ -503,4 +529,49 @@ static void P2PS_Send_rssi_Response(void)
     APP_DBG_MSG("-- RSSI RESPONSE sent (value = %d dBm)\n\r", (int8_t)rssi_value);
 }
 
+static void P2PS_Request_Link_Params(uint8_t interval_min, uint8_t interval_max,
+		uint8_t latency, uint8_t timeout_100ms)
+{
+    tBleStatus ret = BLE_STATUS_FAILED;
+
+    if (P2P_Server_App_Context.ConnectionHandle != 0xFFFF && P2P_Server_App_Context.ConnectionHandle != 0)
+    {
+        /* Intervals in 1.25 ms units, timeout multiplier in 10 ms units */
+        ret = aci_l2cap_connection_parameter_update_req(P2P_Server_App_Context.ConnectionHandle,
+                                                        interval_min, interval_max,
+                                                        latency, (uint16_t)timeout_100ms * 10);
+    }
+
+    APP_DBG_MSG("-- LINK: interval %d-%d, latency %d, timeout %d ms, status=0x%02X\n\r",
+                interval_min, interval_max, latency, timeout_100ms * 100, ret);
+    P2PS_Send_Link_Response(NOTIF_LINK_PARAM_RESPONSE, ret);
+}
+
+static void P2PS_Request_Phy(uint8_t tx_phys, uint8_t rx_phys)
+{
+    tBleStatus ret = BLE_STATUS_FAILED;
+
+    if (P2P_Server_App_Context.ConnectionHandle != 0xFFFF && P2P_Server_App_Context.ConnectionHandle != 0)
+    {
+        ret = hci_le_set_phy(P2P_Server_App_Context.ConnectionHandle, 0, tx_phys, rx_phys, 0);
+    }
+
+    APP_DBG_MSG("-- LINK: PHY tx=0x%02X rx=0x%02X, status=0x%02X\n\r", tx_phys, rx_phys, ret);
+    P2PS_Send_Link_Response(NOTIF_PHY_RESPONSE, ret);
+}
+
+static void P2PS_Send_Link_Response(uint8_t prefix, uint8_t status)
+{
+    if (P2P_Server_App_Context.Notification_Status == 0)
+        return;
+
+    uint8_t payload[4];
+    payload[0] = prefix;
+    payload[1] = status;                /* HCI status, 0x00 = request accepted */
+    payload[2] = 0x00;
+    payload[3] = 0x00;
+
+    P2PS_STM_App_Update_Char(P2P_NOTIFY_CHAR_UUID, payload);
+}
+
 /* USER CODE END FD_LOCAL_FUNCTIONS*/
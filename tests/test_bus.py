@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+
+from bolt_bus import POLICY_BLOCK, POLICY_DROP_OLDEST, POLICY_EVERY_NTH, SampleBus, Sample, Subscriber
+from bolt_protocol import SENSOR_LSM6DSO, SENSOR_STRAIN_GAUGE
+
+
+class Gate:
+    """Consumer that holds its first batch until released, to fill the queue on purpose"""
+
+    def __init__(self):
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.batches = []
+
+    def __call__(self, batch):
+        self.batches.append(batch)
+        self.entered.set()
+        self.release.wait(5)
+
+    @property
+    def seqs(self):
+        return [s.seq for batch in self.batches for s in batch]
+
+
+@pytest.fixture
+def bus():
+    bus = SampleBus()
+    yield bus
+    bus.close()
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        Subscriber("x", lambda batch: None, policy="lossy")
+
+
+def test_drop_oldest_keeps_the_newest(bus):
+    gate = Gate()
+    bus.subscribe("slow", gate, policy=POLICY_DROP_OLDEST, maxsize=3)
+    bus.publish(SENSOR_STRAIN_GAUGE, (0,))
+    assert gate.entered.wait(2)
+    for i in range(1, 10):
+        bus.publish(SENSOR_STRAIN_GAUGE, (i,))
+    gate.release.set()
+    assert bus.drain("slow", timeout=2)
+
+    assert gate.seqs == [1, 8, 9, 10]
+    stats, = bus.stats()
+    assert (stats.delivered, stats.dropped, stats.high_water) == (4, 6, 3)
+
+
+def test_block_waits_and_loses_nothing(bus):
+    gate = Gate()
+    bus.subscribe("recorder", gate, policy=POLICY_BLOCK, maxsize=3)
+    bus.publish(SENSOR_STRAIN_GAUGE, (0,))
+    assert gate.entered.wait(2)
+
+    done = threading.Event()
+
+    def publish():
+        for i in range(1, 10):
+            bus.publish(SENSOR_STRAIN_GAUGE, (i,))
+        done.set()
+
+    threading.Thread(target=publish, daemon=True).start()
+    # The publisher is stuck on the full queue while the consumer is busy
+    assert not done.wait(0.2)
+    assert bus.stats()[0].queued == 3
+    gate.release.set()
+    assert done.wait(2)
+    assert bus.drain("recorder", timeout=2)
+
+    assert gate.seqs == list(range(1, 11))
+    assert bus.stats()[0].dropped == 0
+
+
+def test_every_nth_per_sensor(bus):
+    received = []
+    bus.subscribe("gui", received.extend, policy=POLICY_EVERY_NTH, every=3)
+    for i in range(9):
+        bus.publish(SENSOR_STRAIN_GAUGE, (i,))
+        bus.publish(SENSOR_LSM6DSO, (i,) * 6)
+    assert bus.drain("gui", timeout=2)
+    by_sensor = {}
+    for sample in received:
+        by_sensor.setdefault(sample.sensor_id, []).append(sample.seq)
+    assert by_sensor == {SENSOR_STRAIN_GAUGE: [3, 6, 9], SENSOR_LSM6DSO: [3, 6, 9]}
+
+
+def test_sensor_filter_and_forward(bus):
+    received = []
+    bus.subscribe("imu", received.extend, sensors=(SENSOR_LSM6DSO,))
+    bus.forward([Sample(1.0, SENSOR_STRAIN_GAUGE, 5, (1,)), Sample(1.0, SENSOR_LSM6DSO, 7, (0,) * 6)])
+    assert bus.drain(timeout=2)
+    # forward() keeps the sequence numbers of already numbered samples
+    assert [(s.sensor_id, s.seq) for s in received] == [(SENSOR_LSM6DSO, 7)]
+
+
+def test_consumer_errors_are_counted_not_fatal():
+    errors = []
+    bus = SampleBus(on_error=lambda name, e: errors.append((name, str(e))))
+    received = []
+
+    def flaky(batch):
+        if not received:
+            received.append(None)
+            raise RuntimeError("boom")
+        received.extend(batch)
+
+    bus.subscribe("flaky", flaky)
+    bus.publish(SENSOR_STRAIN_GAUGE, (1,))
+    assert bus.drain(timeout=2)
+    bus.publish(SENSOR_STRAIN_GAUGE, (2,))
+    assert bus.drain(timeout=2)
+    bus.close()
+    assert errors == [("flaky", "boom")]
+    assert bus.stats() == []
+    assert received[-1].values == (2,)
+
+
+def test_drain_times_out_on_a_stuck_consumer(bus):
+    gate = Gate()
+    bus.subscribe("stuck", gate)
+    bus.publish(SENSOR_STRAIN_GAUGE, (0,))
+    assert gate.entered.wait(2)
+    started = time.monotonic()
+    assert not bus.drain("stuck", timeout=0.1)
+    assert time.monotonic() - started < 1.0
+    gate.release.set()
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+from bolt_bus import Sample
+from bolt_calibration import CalibrationRoutine, CalibrationStore, DEFAULT_PROFILE, STEPS, UnitConverter
+from bolt_protocol import SENSOR_LSM6DSO, SENSOR_STTSH22H, SENSOR_STRAIN_GAUGE
+
+DEVICE = "AA:BB:CC:DD:EE:FF"
+ONE_G = 8197   # LSM6DSL counts at ±4 g, 0.122 mg/LSB
+
+
+@pytest.fixture
+def calibrations(tmp_path):
+    return CalibrationStore(str(tmp_path / "calibration.json"))
+
+
+def test_default_profile_matches_firmware(calibrations):
+    units = UnitConverter(calibrations)
+    imu = units.convert(SENSOR_LSM6DSO, np.array([0.0]), [[0, 0, ONE_G, 1000, 0, -1000]])
+    assert imu[0, 2] == pytest.approx(1.0, abs=1e-3)
+    assert imu[0, 3] == pytest.approx(8.75)      # ±250 dps, 8.75 mdps/LSB
+    assert imu[0, 5] == pytest.approx(-8.75)
+    # STTS22H arrives in whole °C
+    temp = units.convert(SENSOR_STTSH22H, np.array([0.0]), [[25]])
+    assert temp[0, 0] == 25.0
+    assert units.units(SENSOR_STRAIN_GAUGE) == ("counts",)
+
+
+def test_firmware_entry_overrides_any_firmware(calibrations):
+    base = dict(DEFAULT_PROFILE, strain=dict(DEFAULT_PROFILE["strain"], offset=100.0))
+    calibrations.save(DEVICE, base)
+    calibrations.save(DEVICE, {"strain": {"offset": 200.0}}, firmware="1.2.0")
+    assert calibrations.profile(DEVICE)["strain"]["offset"] == 100.0
+    assert calibrations.profile(DEVICE, "1.2.0")["strain"]["offset"] == 200.0
+    assert calibrations.profile(DEVICE, "1.2.0")["strain"]["gain"] == 1.0
+    # Survives a reload from disk
+    assert CalibrationStore(calibrations.path).profile(DEVICE, "1.2.0")["strain"]["offset"] == 200.0
+
+
+def test_push_compensates_strain_with_the_newest_temperature(calibrations):
+    profile = dict(DEFAULT_PROFILE, strain=dict(DEFAULT_PROFILE["strain"], offset=1000.0, gain=2.0,
+                                                unit="µε", temp_coeff=5.0, temp_ref=25.0))
+    calibrations.save(DEVICE, profile)
+    out = []
+    units = UnitConverter(calibrations, forward=out.extend)
+    units.set_device(DEVICE)
+    units.push([Sample(1.0, SENSOR_STRAIN_GAUGE, 0, (1500,)), Sample(0.5, SENSOR_STTSH22H, 0, (27,))])
+
+    assert [s.sensor_id for s in out] == [SENSOR_STTSH22H, SENSOR_STRAIN_GAUGE]
+    # (1500 - 1000) * 2 = 1000 µε, minus 5 µε/°C * (27 - 25) °C
+    assert out[1].values == pytest.approx((990.0,))
+    assert units.units(SENSOR_STRAIN_GAUGE) == ("µε",)
+
+
+def _feed(routine, sensor_id, rows, t0=0.0, rate=10.0):
+    routine.collect([Sample(t0 + i / rate, sensor_id, i, tuple(row)) for i, row in enumerate(rows)])
+
+
+def test_guided_routine_derives_a_profile():
+    rng = np.random.default_rng(1)
+    routine = CalibrationRoutine(DEFAULT_PROFILE)
+    assert [step.key for step in STEPS] == ["imu-level", "temp-reference", "strain-zero", "strain-span",
+                                            "strain-drift"]
+
+    routine.begin()
+    imu = np.column_stack([np.full(50, 40), np.full(50, -20), np.full(50, ONE_G + 30), np.full((50, 3), 3)])
+    _feed(routine, SENSOR_LSM6DSO, imu + rng.integers(-2, 3, imu.shape))
+    routine.finish()
+    assert routine.profile["lsm6dso"]["offset"][:3] == pytest.approx([40, -20, 30], abs=1)
+
+    routine.begin(reference=24.0)
+    _feed(routine, SENSOR_STTSH22H, [[25]] * 20)
+    routine.finish()
+    assert routine.profile["stt22h"]["offset"] == 1.0
+
+    routine.begin()
+    _feed(routine, SENSOR_STRAIN_GAUGE, [[1200]] * 20)
+    _feed(routine, SENSOR_STTSH22H, [[25]] * 20)
+    routine.finish()
+    assert routine.profile["strain"]["offset"] == 1200.0
+    assert routine.profile["strain"]["temp_ref"] == 24.0
+
+    routine.begin(reference=500.0)
+    _feed(routine, SENSOR_STRAIN_GAUGE, [[3200]] * 20)
+    routine.finish()
+    assert routine.profile["strain"]["gain"] == pytest.approx(0.25)
+    assert routine.profile["strain"]["unit"] == "µε"
+
+    # 4 °C warm-up with 3 counts (0.75 µε) of drift per °C
+    routine.begin()
+    temps = np.repeat(np.arange(25, 30), 10)
+    _feed(routine, SENSOR_STTSH22H, temps[:, None])
+    _feed(routine, SENSOR_STRAIN_GAUGE, (1200 + 3 * (temps - 25))[:, None])
+    routine.finish()
+    assert routine.profile["strain"]["temp_coeff"] == pytest.approx(0.75, abs=0.01)
+    assert routine.done
+
+
+def test_step_needs_samples_and_reference():
+    routine = CalibrationRoutine(DEFAULT_PROFILE)
+    routine.begin()
+    _feed(routine, SENSOR_LSM6DSO, [[0, 0, ONE_G, 0, 0, 0]] * 2)
+    with pytest.raises(ValueError):
+        routine.finish()
+    assert routine.step.key == "imu-level"
+
+    routine.skip()
+    with pytest.raises(ValueError):
+        routine.begin()          # temperature step needs the thermometer reading
+    assert routine.results == ["Level IMU: skipped"]
+
+
+def test_level_step_rejects_wrong_orientation():
+    routine = CalibrationRoutine(DEFAULT_PROFILE)
+    routine.begin()
+    _feed(routine, SENSOR_LSM6DSO, [[ONE_G, 0, 0, 0, 0, 0]] * 10)
+    with pytest.raises(ValueError):
+        routine.finish()
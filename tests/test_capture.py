@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from bolt_bus import Sample
+from bolt_capture import CaptureManager, Trigger, load_capture_config
+from bolt_protocol import SENSOR_LSM6DSO, SENSOR_STRAIN_GAUGE
+from bolt_store import TimeSeriesStore
+
+DEFAULTS = [
+    Trigger("strain", SENSOR_STRAIN_GAUGE, 0, 3000, "above"),
+    Trigger("accel-spike", SENSOR_LSM6DSO, "magnitude", 8000, "delta"),
+]
+
+
+def test_missing_file_is_created_from_the_defaults(tmp_path):
+    path = tmp_path / "capture_triggers.json"
+    triggers, pre_ms, post_ms = load_capture_config(str(path), DEFAULTS, 2000, 3000)
+    assert (triggers, pre_ms, post_ms) == (DEFAULTS, 2000, 3000)
+    assert json.loads(path.read_text())["triggers"][0] == {
+        "name": "strain", "sensor_id": SENSOR_STRAIN_GAUGE, "field": 0, "level": 3000, "mode": "above"}
+
+
+def test_edited_file_replaces_the_defaults(tmp_path):
+    path = tmp_path / "capture_triggers.json"
+    path.write_text(json.dumps({"pre_ms": 500, "triggers": [
+        {"name": "low-strain", "sensor_id": SENSOR_STRAIN_GAUGE, "field": 0, "level": 800, "mode": "below"}]}))
+    triggers, pre_ms, post_ms = load_capture_config(str(path), DEFAULTS, 2000, 3000)
+    assert triggers == [Trigger("low-strain", SENSOR_STRAIN_GAUGE, 0, 800, "below")]
+    assert (pre_ms, post_ms) == (500, 3000)
+
+
+@pytest.mark.parametrize("entry", [
+    {"name": "x", "sensor_id": SENSOR_STRAIN_GAUGE, "field": 0, "level": 1, "mode": "sideways"},
+    {"name": "x", "sensor_id": 42, "field": 0, "level": 1, "mode": "above"},
+    {"name": "x", "sensor_id": SENSOR_STRAIN_GAUGE, "field": 0, "level": "high", "mode": "above"},
+    {"name": "x", "sensor_id": SENSOR_STRAIN_GAUGE, "level": 1, "mode": "above"},
+])
+def test_bad_entries_are_rejected(tmp_path, entry):
+    path = tmp_path / "capture_triggers.json"
+    path.write_text(json.dumps({"triggers": [entry]}))
+    with pytest.raises(ValueError):
+        load_capture_config(str(path), DEFAULTS)
+
+
+def test_configured_trigger_saves_the_window(tmp_path):
+    store = TimeSeriesStore(str(tmp_path))
+    capture = CaptureManager(store, DEFAULTS, log=lambda *_: None)
+    capture.configure([Trigger("low-strain", SENSOR_STRAIN_GAUGE, 0, 800, "below")], pre_ms=1000, post_ms=1000)
+    capture.set_tags(device="dev")
+    capture.enable()
+    samples = [Sample(100.0 + i / 10, SENSOR_STRAIN_GAUGE, i, (1200 if i != 30 else 500,)) for i in range(60)]
+    capture.push(samples)
+
+    assert capture.count == 1
+    session, = store.sessions("dev")
+    _, rec = store.query("dev", "strain", 0, 1e12, sessions=[session])
+    # 1 s before and after the trigger at t = 103.0
+    assert rec["t"][0] == pytest.approx(102.0) and rec["t"][-1] == pytest.approx(104.0)
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pytest
+
+from bolt_chunks import ChunkCompressor, ChunkReader, ChunkWriter, decode_chunk, encode_chunk, CODECS
+
+
+def _samples(n, n_fields=3, seed=0):
+    rng = np.random.default_rng(seed)
+    t = 1.7e9 + np.arange(n) * 0.1 + rng.uniform(0, 0.01, n)
+    values = rng.integers(-32768, 32768, (n, n_fields))
+    return t, values
+
+
+@pytest.mark.parametrize("codec", sorted(CODECS))
+def test_chunk_round_trip(codec):
+    t, values = _samples(500)
+    payload = encode_chunk(t, values, CODECS[codec])
+    t_out, v_out = decode_chunk(payload, len(t), values.shape[1], CODECS[codec])
+    assert np.allclose(t_out, t, atol=1e-6)
+    assert np.array_equal(v_out, values)
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_file_round_trip_and_window(tmp_path, threaded):
+    path = str(tmp_path / "strain.bch")
+    t, values = _samples(1000)
+    compressor = ChunkCompressor() if threaded else None
+    writer = ChunkWriter(path, 3, chunk_samples=128, compressor=compressor)
+    for row in zip(t, values):
+        writer.append(*row)
+    writer.close()
+    if compressor:
+        compressor.close()
+
+    with ChunkReader(path) as reader:
+        assert len(reader) == 1000
+        assert len(reader.index) == 8
+        t_out, v_out = reader.read()
+        assert np.array_equal(v_out, values)
+        # Half-open window in the middle, across chunk boundaries
+        t_win, v_win = reader.read(t[200], t[700])
+        assert np.allclose(t_win, t[200:700], atol=1e-6)
+        assert np.array_equal(v_win, values[200:700])
+
+
+def test_unfinished_file_without_footer(tmp_path):
+    path = str(tmp_path / "strain.bch")
+    t, values = _samples(300)
+    writer = ChunkWriter(path, 3, chunk_samples=128)
+    for row in zip(t, values):
+        writer.append(*row)
+
+    # Two full chunks are on disk, the open one and the index are not
+    with ChunkReader(path) as reader:
+        assert [entry[3] for entry in reader.index] == [128, 128]
+        assert np.array_equal(reader.read()[1], values[:256])
+
+    # A chunk torn by a crash is ignored
+    size = os.path.getsize(path)
+    with open(path, "r+b") as f:
+        f.truncate(size - 10)
+    with ChunkReader(path) as reader:
+        assert [entry[3] for entry in reader.index] == [128]
+
+
+def test_open_chunk_is_written_after_max_chunk_age(tmp_path):
+    path = str(tmp_path / "strain.bch")
+    writer = ChunkWriter(path, 1, chunk_samples=4096, max_chunk_age=30.0)
+    for i in range(400):
+        writer.append(1000.0 + i * 0.1, [i])       # 40 s of samples at 10 Hz
+    with ChunkReader(path) as reader:
+        assert [entry[3] for entry in reader.index] == [301]
+
+    # flush() writes an open chunk that is old by the wall clock, e.g. an idle stream
+    writer.flush()
+    with ChunkReader(path) as reader:
+        assert [entry[3] for entry in reader.index] == [301, 99]
+    writer.close()
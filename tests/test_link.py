@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import pytest
+
+from bolt_link import BURST_RECOVER_POLLS, LinkManager, LinkStats
+from bolt_protocol import SENSOR_ALL, SENSOR_DATA_RATE_HZ, SENSOR_STRAIN_GAUGE, SENSOR_STTSH22H
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def make_manager(active, clock=time.monotonic):
+    return LinkManager(lambda *_: None, lambda: active, clock=clock)
+
+
+def stats(loss):
+    return LinkStats(rssi=-60, profile=None, phy=None, notif_rate=0.0, byte_rate=0.0, loss=loss, errors=0)
+
+
+def run(manager, losses):
+    """Profile after each poll, as _tune applies it"""
+    profiles = []
+    for loss in losses:
+        manager.profile = manager._choose_profile(stats(loss))
+        profiles.append(manager.profile)
+    return profiles
+
+
+def test_idle_without_active_sensors():
+    assert run(make_manager(set()), [0.0, 0.5]) == ["idle", "idle"]
+
+
+def test_streaming_escalates_to_burst_on_loss():
+    assert run(make_manager({SENSOR_ALL}), [0.0, 0.05, 0.2]) == ["streaming", "streaming", "burst"]
+
+
+def test_burst_recovers_after_clean_polls():
+    manager = make_manager({SENSOR_STRAIN_GAUGE})
+    profiles = run(manager, [0.2] + [0.0] * BURST_RECOVER_POLLS)
+    assert profiles == ["burst"] * BURST_RECOVER_POLLS + ["streaming"]
+
+
+def test_burst_hysteresis():
+    manager = make_manager({SENSOR_STRAIN_GAUGE})
+    # Loss between the recover and burst thresholds keeps burst and restarts the count
+    profiles = run(manager, [0.2, 0.0, 0.05, 0.0, 0.0, 0.0])
+    assert profiles == ["burst", "burst", "burst", "burst", "burst", "streaming"]
+    # A loss spike while recovering starts over as well
+    profiles = run(manager, [0.2, 0.0, 0.0, 0.3, 0.0, 0.0, 0.0])
+    assert profiles[-1] == "streaming" and profiles[-2] == "burst"
+
+
+def test_loss_counts_a_new_sensor_from_its_first_sample(clock):
+    manager = make_manager({SENSOR_STRAIN_GAUGE}, clock)
+    clock.now += 3.0
+    for _ in range(int(2 * SENSOR_DATA_RATE_HZ) + 1):
+        manager.on_sample(SENSOR_STRAIN_GAUGE)
+    clock.now += 2.0
+    # Started 3 s into the window, delivered everything since
+    assert manager._window_stats().loss == pytest.approx(0.0)
+
+
+def test_loss_of_a_stalled_sensor(clock):
+    active = {SENSOR_STRAIN_GAUGE, SENSOR_STTSH22H}
+    manager = make_manager(active, clock)
+    for _ in range(int(5 * SENSOR_DATA_RATE_HZ)):
+        manager.on_sample(SENSOR_STRAIN_GAUGE)
+        manager.on_sample(SENSOR_STTSH22H)
+        clock.now += 1.0 / SENSOR_DATA_RATE_HZ
+    assert manager._window_stats().loss == pytest.approx(0.0, abs=0.05)
+
+    # Temperature stops delivering for a whole window
+    for _ in range(int(5 * SENSOR_DATA_RATE_HZ)):
+        manager.on_sample(SENSOR_STRAIN_GAUGE)
+        clock.now += 1.0 / SENSOR_DATA_RATE_HZ
+    assert manager._window_stats().loss == pytest.approx(0.5, abs=0.05)
+
+
+def test_tune_writes_only_profile_changes():
+    manager = make_manager({SENSOR_STRAIN_GAUGE})
+    writes = []
+
+    async def write(payload):
+        writes.append(payload)
+        return True
+
+    manager._write = write
+    asyncio.run(manager._tune(stats(0.0)))
+    asyncio.run(manager._tune(stats(0.0)))
+    # One link parameter request and one PHY request
+    assert manager.profile == "streaming"
+    assert len(writes) == 2
@@ -0,0 +1,46 @@
+from collections import Counter
+
+from bolt_profile import StageHistogram, StageProfiler, write_folded
+
+
+def test_disabled_profiler_records_nothing():
+    profiler = StageProfiler(enabled=False)
+    t0 = profiler.start()
+    profiler.stop("decode", t0)
+    assert t0 == 0
+    assert profiler.totals("decode") == (0, 0)
+    assert "(no samples)" in profiler.report()
+
+
+def test_stage_totals_and_report():
+    profiler = StageProfiler(enabled=True)
+    for _ in range(5):
+        profiler.stop("decode", profiler.start())
+    profiler.stop("custom", profiler.start())
+    count, total = profiler.totals("decode")
+    assert count == 5 and total >= 0
+
+    lines = profiler.report().splitlines()
+    # Known stages first, then the rest by name
+    assert [line.split()[0] for line in lines[2:]] == ["decode", "custom"]
+    profiler.reset()
+    assert profiler.totals("decode") == (0, 0)
+
+
+def test_histogram_percentiles():
+    hist = StageHistogram()
+    for ns in [1000] * 90 + [1_000_000] * 10:
+        hist.add(ns)
+    # Bucket upper bounds: 1000 ns falls in [512, 1024), 1 ms in [2**19, 2**20)
+    assert hist.percentile(50) == 1024
+    assert hist.percentile(90) == 1024
+    assert hist.percentile(99) == 1_000_000   # capped at the observed max
+    assert (hist.count, hist.max) == (100, 1_000_000)
+    assert StageHistogram().percentile(50) == 0
+
+
+def test_folded_stacks_file(tmp_path):
+    counts = Counter({"MainThread;a.py:main;a.py:loop": 7, "bus-recorder;bolt_bus.py:_run": 3})
+    path = write_folded(counts, str(tmp_path))
+    with open(path, encoding="utf-8") as f:
+        assert f.read().splitlines() == ["MainThread;a.py:main;a.py:loop 7", "bus-recorder;bolt_bus.py:_run 3"]
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from bolt_protocol import STRAIN_ADC_MAX
+from bolt_report import TIGHTEN_HIGH, TIGHTEN_LOW, build_report, tightening_peaks
+
+
+def test_default_levels_fit_the_adc():
+    assert 0 <= TIGHTEN_LOW < TIGHTEN_HIGH <= STRAIN_ADC_MAX
+
+
+def test_empty_and_idle():
+    assert len(tightening_peaks([])) == 0
+    assert len(tightening_peaks([1200] * 50)) == 0
+
+
+def test_one_peak_per_episode():
+    strain = [1200, 3100, 3400, 3200, 1200, 1200, 3050, 3300, 1200]
+    assert tightening_peaks(strain).tolist() == [3400, 3300]
+
+
+def test_chatter_between_levels_is_one_episode():
+    # Dips to 2800 stay above the low level and must not split the tightening
+    strain = [1200, 3100, 2800, 3350, 2800, 3200, 1200]
+    assert tightening_peaks(strain).tolist() == [3350]
+
+
+def test_dip_below_low_splits():
+    strain = [1200, 3100, 2600, 3350, 1200]
+    assert tightening_peaks(strain).tolist() == [3100, 3350]
+
+
+def test_between_levels_without_crossing_high():
+    assert len(tightening_peaks([1200, 2900, TIGHTEN_HIGH, 2900, 1200])) == 0
+
+
+def test_episode_running_to_the_end():
+    assert tightening_peaks([1200, 3100, 3500]).tolist() == [3500]
+    assert tightening_peaks([3600, 3100]).tolist() == [3600]
+
+
+def test_custom_levels():
+    strain = np.array([100, 600, 450, 700, 300, 650, 100])
+    assert tightening_peaks(strain, high=500, low=400).tolist() == [700, 650]
+
+
+@pytest.mark.parametrize("high, low", [(40000, 36000), (3000, 3000), (3000, -1)])
+def test_build_report_rejects_levels_outside_the_adc(tmp_path, high, low):
+    with pytest.raises(ValueError):
+        build_report(str(tmp_path / "store"), str(tmp_path / "out"), high=high, low=low, log=lambda *_: None)
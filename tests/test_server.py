@@ -0,0 +1,188 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import socket
+import struct
+
+import pytest
+
+from bolt_bus import Sample
+from bolt_protocol import SENSOR_LSM6DSO, SENSOR_STTSH22H, SENSOR_STRAIN_GAUGE
+from bolt_server import MAX_MESSAGE_SIZE, StreamServer, decode_frame, encode_frames
+
+DEVICE = "AA:BB:CC:DD:EE:FF"
+SAMPLES = [
+    Sample(100.0, SENSOR_STRAIN_GAUGE, 7, (1200,)),
+    Sample(100.05, SENSOR_LSM6DSO, 3, (1, -2, 8197, 100, -100, 0)),
+    Sample(100.1, SENSOR_STRAIN_GAUGE, 8, (4095,)),
+    Sample(100.2, SENSOR_STTSH22H, 1, (-5,)),
+]
+
+
+def test_frames_round_trip():
+    frames = {decode_frame(frame)[1]: decode_frame(frame) for frame in encode_frames(DEVICE, SAMPLES)}
+    assert set(frames) == {SENSOR_LSM6DSO, SENSOR_STTSH22H, SENSOR_STRAIN_GAUGE}
+
+    device, _, records = frames[SENSOR_STRAIN_GAUGE]
+    assert device == DEVICE
+    assert [(seq, values) for _, seq, values in records] == [(7, (1200,)), (8, (4095,))]
+    assert [t for t, _, _ in records] == pytest.approx([100.0, 100.1], abs=1e-6)
+    assert frames[SENSOR_LSM6DSO][2][0][2] == (1, -2, 8197, 100, -100, 0)
+    assert frames[SENSOR_STTSH22H][2][0][2] == (-5,)
+
+
+def test_decode_rejects_foreign_frames():
+    frame = bytearray(encode_frames(DEVICE, SAMPLES[:1])[0])
+    frame[0:2] = b"XX"
+    with pytest.raises(ValueError):
+        decode_frame(bytes(frame))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _start(**kwargs):
+    log = []
+    tcp_port, ws_port = _free_port(), _free_port()
+    server = StreamServer(log.append, asyncio.get_running_loop(), host="127.0.0.1", port=tcp_port,
+                          ws_port=ws_port, **kwargs)
+    await server.start()
+    return server, log, tcp_port, ws_port
+
+
+async def _wait_for_clients(server, n=1):
+    for _ in range(100):
+        if len(server._clients) >= n:
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("client did not connect")
+
+
+def test_tcp_length_prefixed_frames():
+    async def scenario():
+        server, _, port, _ = await _start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(json.dumps({"sensors": [SENSOR_STRAIN_GAUGE]}).encode() + b"\n")
+        await _wait_for_clients(server)
+        await asyncio.sleep(0.05)
+        server.device = DEVICE
+        server.publish(SAMPLES)
+
+        length, = struct.unpack("<I", await asyncio.wait_for(reader.readexactly(4), 2))
+        device, sensor_id, records = decode_frame(await reader.readexactly(length))
+        writer.close()
+        await server.stop()
+        return device, sensor_id, [values for _, _, values in records]
+
+    assert asyncio.run(scenario()) == (DEVICE, SENSOR_STRAIN_GAUGE, [(1200,), (4095,)])
+
+
+def test_tcp_oversized_line_closes_the_client():
+    async def scenario():
+        server, log, port, _ = await _start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"x" * (MAX_MESSAGE_SIZE + 1024) + b"\n")
+        closed = await asyncio.wait_for(reader.read(), 2)
+        writer.close()
+        await server.stop()
+        return closed, log
+
+    closed, log = asyncio.run(scenario())
+    assert closed == b""
+    assert any("too long" in line for line in log)
+
+
+@pytest.mark.parametrize("allow", [False, True])
+def test_triggers_need_opt_in(allow):
+    fired = []
+
+    async def scenario():
+        server, _, port, _ = await _start(on_trigger=fired.append, allow_triggers=allow)
+        _, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b'{"trigger": "torque"}\n')
+        await writer.drain()
+        await _wait_for_clients(server)
+        await asyncio.sleep(0.1)
+        writer.close()
+        await server.stop()
+
+    asyncio.run(scenario())
+    assert fired == (["torque"] if allow else [])
+
+
+def _ws_frame(opcode, payload, length=None, fin=True):
+    """Masked client frame; `length` overrides the announced payload length"""
+    n = len(payload) if length is None else length
+    b0 = (0x80 if fin else 0) | opcode
+    if n < 126:
+        head = struct.pack("!BB", b0, 0x80 | n)
+    elif n < 1 << 16:
+        head = struct.pack("!BBH", b0, 0x80 | 126, n)
+    else:
+        head = struct.pack("!BBQ", b0, 0x80 | 127, n)
+    mask = os.urandom(4)
+    return head + mask + bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+
+async def _ws_connect(port):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    key = base64.b64encode(os.urandom(16))
+    writer.write(b"GET / HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                 b"Sec-WebSocket-Key: " + key + b"\r\nSec-WebSocket-Version: 13\r\n\r\n")
+    response = (await reader.readuntil(b"\r\n\r\n")).decode()
+    accept = base64.b64encode(hashlib.sha1(key + b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11").digest()).decode()
+    assert response.startswith("HTTP/1.1 101")
+    assert f"Sec-WebSocket-Accept: {accept}" in response
+    return reader, writer
+
+
+async def _ws_read(reader):
+    b0, b1 = await asyncio.wait_for(reader.readexactly(2), 2)
+    n = b1 & 0x7F
+    if n == 126:
+        n, = struct.unpack("!H", await reader.readexactly(2))
+    elif n == 127:
+        n, = struct.unpack("!Q", await reader.readexactly(8))
+    return b0 & 0x0F, await reader.readexactly(n)
+
+
+def test_websocket_binary_frames():
+    async def scenario():
+        server, _, _, port = await _start()
+        reader, writer = await _ws_connect(port)
+        subscribe = json.dumps({"sensors": [SENSOR_LSM6DSO]}).encode()
+        # Subscription split over a text frame and a continuation frame
+        writer.write(_ws_frame(0x1, subscribe[:5], fin=False))
+        writer.write(_ws_frame(0x0, subscribe[5:]))
+        await _wait_for_clients(server)
+        await asyncio.sleep(0.05)
+        server.device = DEVICE
+        server.publish(SAMPLES)
+        opcode, payload = await _ws_read(reader)
+        writer.close()
+        await server.stop()
+        return opcode, decode_frame(payload)
+
+    opcode, (device, sensor_id, records) = asyncio.run(scenario())
+    assert opcode == 0x2
+    assert (device, sensor_id) == (DEVICE, SENSOR_LSM6DSO)
+    assert records[0][2] == (1, -2, 8197, 100, -100, 0)
+
+
+def test_websocket_oversized_message_closes_with_1009():
+    async def scenario():
+        server, _, _, port = await _start()
+        reader, writer = await _ws_connect(port)
+        # Only the header is sent, the announced length alone must close the client
+        writer.write(_ws_frame(0x1, b"", length=MAX_MESSAGE_SIZE + 1))
+        opcode, payload = await _ws_read(reader)
+        writer.close()
+        await server.stop()
+        return opcode, payload
+
+    assert asyncio.run(scenario()) == (0x8, struct.pack("!H", 1009))
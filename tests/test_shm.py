@@ -0,0 +1,108 @@
+import os
+import subprocess
+import sys
+import uuid
+
+import numpy as np
+import pytest
+
+from bolt_bus import Sample
+from bolt_protocol import SENSOR_LSM6DSO, SENSOR_STRAIN_GAUGE
+from bolt_shm import PID_OFFSET, PID_STRUCT, SampleReader, SharedMemoryPublisher
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="POSIX shared memory lifetime")
+
+
+@pytest.fixture
+def name():
+    return f"bolt_test_{uuid.uuid4().hex[:8]}"
+
+
+@pytest.fixture
+def publisher(name):
+    publisher = SharedMemoryPublisher(name=name, capacity=8)
+    yield publisher
+    publisher.close()
+
+
+def _batch(start, n):
+    return [Sample(float(i), SENSOR_STRAIN_GAUGE, i, (i,)) for i in range(start, start + n)]
+
+
+def test_records_and_header(publisher, name):
+    publisher.set_device("AA:BB")
+    publisher.write_batch([Sample(1.5, SENSOR_LSM6DSO, 9, (1, -2, 3, -4, 5, -6))])
+    with SampleReader(name, from_oldest=True) as reader:
+        block = reader.read()
+        assert reader.device == "AA:BB"
+        assert block["seq"].tolist() == [1]
+        assert block["t"][0] == 1.5
+        assert (block["sensor_seq"][0], block["sensor_id"][0], block["n"][0]) == (9, SENSOR_LSM6DSO, 6)
+        assert block["values"][0].tolist() == [1, -2, 3, -4, 5, -6]
+
+
+def test_writer_wraps_around(publisher, name):
+    with SampleReader(name) as reader:
+        publisher.write_batch(_batch(1, 6))
+        assert reader.read()["sensor_seq"].tolist() == [1, 2, 3, 4, 5, 6]
+        # Crosses the end of the ring: two contiguous reads
+        publisher.write_batch(_batch(7, 5))
+        first = reader.read().copy()
+        second = reader.read().copy()
+        assert first["sensor_seq"].tolist() == [7, 8]
+        assert second["sensor_seq"].tolist() == [9, 10, 11]
+        assert second["seq"].tolist() == [9, 10, 11]
+        assert reader.lost == 0 and len(reader.read()) == 0
+
+
+def test_lapped_reader_skips_and_counts(publisher, name):
+    with SampleReader(name) as reader:
+        publisher.write_batch(_batch(1, 20))
+        block = np.concatenate([reader.read().copy(), reader.read().copy()])
+        # Only the newest `capacity` records are still in the ring
+        assert block["seq"].tolist() == list(range(13, 21))
+        assert reader.lost == 12
+
+
+def test_lapped_detects_overwritten_view(publisher, name):
+    with SampleReader(name) as reader:
+        publisher.write_batch(_batch(1, 4))
+        view = reader.read()
+        assert not reader.lapped(view)
+        publisher.write_batch(_batch(5, 4))
+        assert not reader.lapped(view)
+        # seq 9 lands in the view's first slot
+        publisher.write_batch(_batch(9, 1))
+        assert reader.lapped(view)
+        del view
+
+
+def test_batch_larger_than_the_ring(publisher, name):
+    publisher.write_batch(_batch(1, 30))
+    with SampleReader(name, from_oldest=True) as reader:
+        block = np.concatenate([reader.read().copy(), reader.read().copy()])
+        assert block["sensor_seq"].tolist() == list(range(23, 31))
+        assert reader.next_seq == 31
+
+
+def test_second_publisher_is_refused_while_the_owner_lives(publisher, name):
+    with pytest.raises(FileExistsError):
+        SharedMemoryPublisher(name=name, capacity=8)
+    # The owner's ring is untouched
+    publisher.write_batch(_batch(1, 1))
+    with SampleReader(name, from_oldest=True) as reader:
+        assert reader.read()["sensor_seq"].tolist() == [1]
+
+
+def test_stale_block_is_replaced(publisher, name):
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    PID_STRUCT.pack_into(publisher.shm.buf, PID_OFFSET, dead.pid)
+
+    replacement = SharedMemoryPublisher(name=name, capacity=4)
+    try:
+        with SampleReader(name) as reader:
+            assert reader.capacity == 4
+        assert PID_STRUCT.unpack_from(replacement.shm.buf, PID_OFFSET)[0] == os.getpid()
+    finally:
+        replacement.close()
@@ -0,0 +1,86 @@
+import threading
+
+from bolt_state import StateStore, WidgetBinder
+
+
+class FakeWidget:
+    def __init__(self):
+        self.calls = []
+
+    def config(self, **options):
+        self.calls.append(options)
+
+
+class FakeScheduler:
+    """Stands in for root.after: collects callbacks until run()"""
+
+    def __init__(self):
+        self.pending = []
+
+    def __call__(self, ms, callback):
+        self.pending.append(callback)
+
+    def run(self):
+        pending, self.pending = self.pending, []
+        for callback in pending:
+            callback()
+
+
+def test_set_notifies_only_on_change():
+    store = StateStore(status="idle", rssi=None)
+    calls = []
+    store.subscribe(lambda: calls.append(store.snapshot()))
+    store.set(status="idle")
+    assert calls == []
+    store.set(status="streaming", rssi=-60)
+    assert calls == [{"status": "streaming", "rssi": -60}]
+    assert store.take_changes() == ({"status", "rssi"}, {"status": "streaming", "rssi": -60})
+    assert store.take_changes()[0] == set()
+
+
+def test_multi_key_set_is_atomic():
+    store = StateStore(a=0, b=0)
+    seen = []
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            state = store.snapshot()
+            seen.append(state["a"] == state["b"])
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for i in range(2000):
+        store.set(a=i, b=i)
+    stop.set()
+    thread.join()
+    assert all(seen)
+
+
+def test_binder_coalesces_and_applies_only_the_diff():
+    label, button = FakeWidget(), FakeWidget()
+    store = StateStore(status="idle", connected=False)
+    schedule = FakeScheduler()
+
+    def render(state):
+        return {label: {"text": f"Status: {state['status']}"},
+                button: {"state": "normal" if state["connected"] else "disabled"}}
+
+    binder = WidgetBinder(schedule, store, render)
+    binder.request_frame()
+    schedule.run()
+    assert label.calls == [{"text": "Status: idle"}] and button.calls == [{"state": "disabled"}]
+
+    # Several updates between frames: one frame, one config per widget option that changed
+    store.set(status="connecting")
+    store.set(status="streaming")
+    store.set(connected=False)
+    assert len(schedule.pending) == 1
+    schedule.run()
+    assert label.calls[1:] == [{"text": "Status: streaming"}]
+    assert button.calls[1:] == []
+
+    # Nothing changed: a requested frame touches no widget
+    binder.request_frame()
+    schedule.run()
+    assert len(label.calls) == 2 and len(button.calls) == 1
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from bolt_protocol import SENSOR_STRAIN_GAUGE
+from bolt_store import TimeSeriesStore
+
+DEVICE = "AA:BB:CC:DD:EE:FF"
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), resolutions=(1, 60))
+    writer = store.open_session(DEVICE, session="s1")
+    for t in range(3600):
+        writer.append(SENSOR_STRAIN_GAUGE, float(t), (t % 100,))
+    writer.close()
+    return store
+
+
+def test_raw_query_is_half_open(store):
+    resolution, rec = store.query(DEVICE, "strain", 100.0, 110.0)
+    assert resolution == 0
+    assert rec["t"].tolist() == [float(t) for t in range(100, 110)]
+
+
+def test_rollup_query_includes_bucket_holding_t0(store):
+    resolution, rec = store.query(DEVICE, "strain", 970.0, 1100.0, max_points=5)
+    assert resolution == 60
+    # 970 falls in the bucket starting at 960, 1100 in the one at 1080
+    assert rec["t"].tolist() == [960.0, 1020.0, 1080.0]
+    assert rec["n"].tolist() == [60, 60, 60]
+
+
+def test_rollup_query_on_bucket_boundary(store):
+    _, rec = store.query(DEVICE, "strain", 960.0, 1080.0, max_points=5)
+    assert rec["t"].tolist() == [960.0, 1020.0]
+
+
+def test_rollup_levels_match_raw(store):
+    _, rec = store.query(DEVICE, "strain", 0.0, 120.0, max_points=5)
+    assert np.allclose(rec["raw_mean"], [np.mean(np.arange(60) % 100), np.mean(np.arange(60, 120) % 100)])
+    assert rec["raw_max"].tolist() == [59.0, 99.0]
+
+
+def test_reopened_session_gets_a_new_directory(tmp_path):
+    store = TimeSeriesStore(str(tmp_path))
+    first = store.open_session(DEVICE, session="20260101-120000")
+    second = store.open_session(DEVICE, session="20260101-120000")
+    first.close()
+    second.close()
+    assert first.path != second.path
+    assert store.sessions(DEVICE) == ["20260101-120000", "20260101-120000-2"]